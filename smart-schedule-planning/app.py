@@ -1,5 +1,9 @@
-from flask import Flask, render_template, session, redirect, url_for
+from flask import Flask, render_template, session, redirect, url_for, jsonify, g
+from flask.helpers import get_debug_flag
+from werkzeug.serving import is_running_from_reloader
 from datetime import datetime
+import atexit
+import click
 import os
 
 # Импорт контроллеров
@@ -9,7 +13,20 @@ from src.controllers.calendar_controller import calendar_bp
 from src.controllers.planning_controller import planning_bp
 from src.controllers.report_controller import report_bp
 from src.controllers.settings_controller import settings_bp
+from src.controllers.api_controller import api_bp
+from src.controllers.notification_controller import notification_bp
 from src.utils.filters import register_filters
+from src.services.deadline_scheduler import deadline_scheduler
+from src.services.retention_service import retention_service
+from src.services.delivery_pipeline import delivery_pipeline
+from src.services.digest_service import digest_service
+from src.services.export_jobs import export_job_service
+from src.services.bulk_export import bulk_export_service
+from src.services.task_archive_service import task_archive_service
+from src.services.snapshot_service import snapshot_service
+from src.services.write_ahead_log import write_ahead_log
+from src.repositories import task_repository, message_repository, user_repository
+from src.services.notification_service import restore_sent_reminders
 
 
 # После создания app
@@ -26,6 +43,97 @@ app.register_blueprint(calendar_bp)
 app.register_blueprint(planning_bp)
 app.register_blueprint(report_bp)
 app.register_blueprint(settings_bp)
+app.register_blueprint(api_bp)
+app.register_blueprint(notification_bp)
+
+def _start_services():
+    # Журнал изменений пишется с нового сегмента после восстановления данных
+    write_ahead_log.start()
+    # Сообщения с готовым текстом из старых снимков переводятся на шаблоны (после
+    # запуска журнала - чтобы перевод попал в него)
+    migrated = message_repository.migrate_legacy_text()
+    if migrated:
+        print(f"Сообщений переведено на шаблоны: {migrated}")
+    # Уже разосланные напоминания не повторяются, остальные планируются заново
+    restore_sent_reminders(message_repository.get_all())
+    deadline_scheduler.schedule_all(task_repository.get_all())
+    # Асинхронная доставка уведомлений (входящие, почта, вебхуки)
+    delivery_pipeline.start()
+    # Фоновая отправка напоминаний о дедлайнах
+    deadline_scheduler.start()
+    # Ежедневные сводки напоминаний
+    digest_service.start()
+    # Фоновое уплотнение уведомлений в архив
+    retention_service.start()
+    # Очередь фоновых выгрузок iCal/CSV
+    export_job_service.start()
+    # Фоновый перенос давно завершенных задач в архив
+    task_archive_service.start()
+
+def _uses_reloader() -> bool:
+    # Отладочный сервер с перезапуском: python app.py (app.run(debug=True) ниже),
+    # run.py и flask run --debug - последние сообщают об отладке через FLASK_DEBUG.
+    # app.debug не годится: при python app.py он включается уже после импорта
+    return __name__ == '__main__' or get_debug_flag()
+
+def _is_serving_process() -> bool:
+    # Отладочный сервер с перезапуском импортирует app дважды; данные, журнал
+    # и фоновые службы нужны только дочернему процессу, который отвечает на запросы
+    return is_running_from_reloader() or not _uses_reloader()
+
+# Данные из снимка и журнала изменений прошлого запуска грузятся в фоне,
+# фоновые службы стартуют после них
+if _is_serving_process():
+    if snapshot_service.enabled:
+        snapshot_service.restore_in_background(
+            on_ready=_start_services,
+            replay=write_ahead_log.replay if write_ahead_log.enabled else None
+        )
+    else:
+        _start_services()
+
+@app.before_request
+def wait_for_snapshot():
+    # Пока идет загрузка снимка, запросы ждут ее, а не видят пустые репозитории
+    if not snapshot_service.wait_ready():
+        response = jsonify({'success': False, 'error': 'Данные загружаются, повторите запрос позже'})
+        return response, 503, {'Retry-After': '5'}
+    # Данные не загрузились: работать с пустыми репозиториями нельзя
+    if snapshot_service.failed:
+        response = jsonify({'success': False,
+                            'error': f'Данные не загружены: {snapshot_service.last_error}. '
+                                     'Требуется вмешательство администратора'})
+        return response, 503
+
+@app.before_request
+def load_current_user():
+    # Пользователь сессии разрешается один раз на запрос; подзапросы пакета
+    # (/api/batch) получают его от внешнего запроса уже готовым
+    if 'current_user' not in g:
+        g.current_user = user_repository.get_by_id(session['user_id']) if 'user_id' in session else None
+
+@app.after_request
+def commit_changes(response):
+    # Ответ уходит после того, как изменения запроса записаны в журнал (WAL_FSYNC=always);
+    # g.wal_upto - изменения, сделанные запросом в других потоках (параллельный batch)
+    write_ahead_log.commit(upto=g.get('wal_upto', 0))
+    return response
+
+def _save_snapshot_on_exit():
+    # При отладочном перезапуске данные живут в дочернем процессе, родитель снимок не пишет
+    if not _is_serving_process():
+        return
+    # Новые напоминания больше не создаются, а принятые конвейером сообщения
+    # доставляются во входящие до записи последнего снимка
+    deadline_scheduler.stop()
+    digest_service.stop()
+    delivery_pipeline.stop()
+    if write_ahead_log.running:
+        write_ahead_log.stop(checkpoint=True)
+    else:
+        snapshot_service.save_on_exit()
+
+atexit.register(_save_snapshot_on_exit)
 
 @app.route('/')
 def index():
@@ -38,11 +146,11 @@ def dashboard():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    from src.repositories import user_repository
     from src.services.task_service import TaskService
+    from src.utils.serialization import serialize_many
     from datetime import datetime, timedelta  # Добавьте этот импорт!
     
-    user = user_repository.get_by_id(session['user_id'])
+    user = g.current_user
     if not user:
         session.clear()
         print('Сессия устарела. Пожалуйста, войдите снова.', 'error')
@@ -59,24 +167,15 @@ def dashboard():
         'new': len([t for t in tasks if t.status.value == 'новая'])
     }
     
-    # Ближайшие задачи (следующие 7 дней)
+    # Ближайшие задачи (следующие 7 дней) - читаем диапазон из индекса дедлайнов
     now = datetime.now()
-    week_later = now + timedelta(days=7)
-    
-    upcoming_tasks = []
-    for task in tasks:
-        if task.deadline and task.deadline <= week_later:
-            task_dict = task.to_dict()
-            upcoming_tasks.append(task_dict)
-    
-    # Сортируем по дедлайну
-    upcoming_tasks.sort(key=lambda x: x['deadline'] if x['deadline'] else '9999-12-31')
+    upcoming_tasks = serialize_many(task_service.get_upcoming_tasks(user.id, days=7, limit=5))
     
     return render_template('dashboard.html', 
                          user_name=session.get('user_name'),
                          user_email=session.get('user_email'),
                          stats=stats,
-                         upcoming_tasks=upcoming_tasks[:5],
+                         upcoming_tasks=upcoming_tasks,
                          current_date=now.strftime('%d %B %Y'))
 
 
@@ -96,7 +195,12 @@ def reports():
 def notifications():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
-    return render_template('notifications.html')
+    
+    user = g.current_user
+    if not user:
+        session.clear()
+        return redirect(url_for('auth.login'))
+    return render_template('notifications.html', user=user)
 
 @app.route('/settings')
 def settings():
@@ -114,5 +218,29 @@ def data_export():
 def inject_current_year():
     return {'current_year': datetime.now().year}
 
+@app.cli.command('bulk-export')
+@click.option('--start-date', type=click.DateTime(), default=None, help='Начало периода выгрузки')
+@click.option('--end-date', type=click.DateTime(), default=None, help='Конец периода выгрузки')
+@click.option('--workers', type=click.IntRange(min=1), default=None, help='Число процессов выгрузки')
+def bulk_export_command(start_date, end_date, workers):
+    """Массовая выгрузка календарей всех пользователей в zip-архив.
+
+    Данные загружаются из снимка и журнала изменений так же, как при запуске
+    сервера, и при выходе сохраняются - запускать при остановленном сервере.
+    """
+    snapshot_service.wait_ready(timeout=None)
+    if snapshot_service.failed:
+        raise click.ClickException(f'Данные не загружены: {snapshot_service.last_error}')
+
+    report = bulk_export_service.run(start_date or datetime.min, end_date or datetime.max, workers)
+    click.echo(f'Архив: {report.path}')
+    click.echo(f'Пользователей: {report.users}, {report.bytes} байт за {report.seconds:.2f} с '
+               f'(слияние частей {report.merge_seconds:.2f} с)')
+    for stats in report.workers:
+        click.echo(f'  процесс {stats.worker}: {stats.users} польз., '
+                   f'{stats.users_per_second:.1f} польз./с, {stats.megabytes_per_second:.2f} МБ/с')
+        for error in stats.errors:
+            click.echo(f"    пользователь {error['user_id']}: {error['error']}", err=True)
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
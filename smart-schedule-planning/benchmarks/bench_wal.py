@@ -0,0 +1,134 @@
+# benchmarks/bench_wal.py
+"""Накладные расходы журнала изменений на запись и скорость его повтора.
+
+Запуск из корня проекта:
+
+    python benchmarks/bench_wal.py --ops 2000 --threads 1 8
+
+Для каждой политики fsync (и без журнала) потоки добавляют задачи в
+репозиторий и вызывают commit, как это делает приложение перед ответом;
+печатаются задержка операции (p50/p99), пропускная способность и число
+fsync - видно, сколько операций делят одну запись при групповой фиксации.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.domain.entities import Task, TaskPriority, TaskStatus  # noqa: E402
+from src.repositories import task_repository  # noqa: E402
+from src.services.snapshot_service import SnapshotService  # noqa: E402
+from src.services.write_ahead_log import FSYNC_POLICIES, WriteAheadLog  # noqa: E402
+
+
+def _task(number: int) -> Task:
+    now = datetime.now()
+    return Task(0, f'Задача {number}', 'описание', now + timedelta(days=1), now, now + timedelta(hours=1),
+                60, TaskPriority.MEDIUM, TaskStatus.NEW, now, now, 1 + number % 100,
+                assigned_users=[1 + number % 100])
+
+
+def _percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def run_writes(policy: Optional[str], threads: int, ops: int, directory: str) -> dict:
+    wal = None
+    if policy:
+        wal = WriteAheadLog(directory=os.path.join(directory, f'wal-{policy}-{threads}'), policy=policy,
+                            snapshots=SnapshotService(os.path.join(directory, 'snapshot.bin')))
+        wal.start()
+
+    latencies: List[List[float]] = [[] for _ in range(threads)]
+
+    def worker(index: int) -> None:
+        for number in range(ops):
+            started = time.perf_counter()
+            task_repository.add(_task(number))
+            if wal:
+                wal.commit()
+            latencies[index].append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    fsyncs = 0
+    if wal:
+        fsyncs = wal.fsyncs
+        wal.stop()
+    flat = [value for values in latencies for value in values]
+    return {
+        'policy': policy or 'без журнала',
+        'threads': threads,
+        'ops_per_second': len(flat) / elapsed,
+        'p50_us': _percentile(flat, 0.5) * 1e6,
+        'p99_us': _percentile(flat, 0.99) * 1e6,
+        'fsyncs': fsyncs
+    }
+
+
+def run_replay(records: int, directory: str) -> dict:
+    """Записать records изменений задач и замерить их повтор"""
+    path = os.path.join(directory, 'wal-replay')
+    wal = WriteAheadLog(directory=path, policy='off',
+                        snapshots=SnapshotService(os.path.join(directory, 'snapshot.bin')))
+    wal.start()
+    tasks = task_repository.add_many([_task(number) for number in range(records // 2)])
+    for task in tasks:
+        task.title += ' (изм.)'
+        task_repository.update(task)
+    wal.stop()
+    size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+    started = time.perf_counter()
+    loaded = {}
+    WriteAheadLog(directory=path, snapshots=wal.snapshots).replay(loaded, {})
+    elapsed = time.perf_counter() - started
+    return {
+        'records': records,
+        'megabytes': size / (1024 * 1024),
+        'seconds': elapsed,
+        'records_per_second': records / elapsed,
+        'entities': len(loaded['tasks'][0])
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=2000, help='операций на поток')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--replay', type=int, default=200000, help='записей для замера повтора')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench-wal-')
+    try:
+        print(f"{'политика':<14}{'потоки':>8}{'оп/с':>12}{'p50, мкс':>12}{'p99, мкс':>12}{'fsync':>8}")
+        for threads in args.threads:
+            for policy in (None, *FSYNC_POLICIES):
+                result = run_writes(policy, threads, args.ops, directory)
+                print(f"{result['policy']:<14}{result['threads']:>8}{result['ops_per_second']:>12.0f}"
+                      f"{result['p50_us']:>12.1f}{result['p99_us']:>12.1f}{result['fsyncs']:>8}")
+
+        result = run_replay(args.replay, directory)
+        print(f"\nПовтор: {result['records']} записей ({result['megabytes']:.1f} МБ) за "
+              f"{result['seconds']:.2f} с - {result['records_per_second']:.0f} записей/с, "
+              f"{result['entities']} задач")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,9 @@
+import os
+
+# Режим отладки нужен уже при импорте app: с перезапуском данные и фоновые
+# службы поднимаются только в дочернем процессе сервера
+os.environ['FLASK_DEBUG'] = '1'
+
 from app import app
 
 if __name__ == '__main__':
@@ -0,0 +1,113 @@
+# src/controllers/api_controller.py
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+from flask import Blueprint, request, session, jsonify, current_app, g
+from werkzeug.exceptions import HTTPException
+from src.repositories import user_repository
+from src.services.write_ahead_log import write_ahead_log
+
+api_bp = Blueprint('api', __name__, url_prefix='/api')
+
+# Ограничения пакетного запроса
+MAX_BATCH_SIZE = 20
+MAX_BATCH_WORKERS = 4
+ALLOWED_METHODS = ('GET', 'POST')
+
+
+def _dispatch(app, user, sub_session, sub_request: Dict[str, Any]) -> Dict[str, Any]:
+    """Выполнить один подзапрос к существующему JSON-маршруту.
+
+    Подзапрос проходит те же хуки before_request/after_request, что и обычный
+    запрос (ожидание загрузки данных, фиксация журнала), в своем контексте
+    приложения с уже разрешенным пользователем в g.current_user.
+    """
+    if not isinstance(sub_request, dict):
+        return {'status': 400, 'body': {'success': False, 'error': 'Некорректный подзапрос'}}
+
+    method = str(sub_request.get('method', 'GET')).upper()
+    path = sub_request.get('path')
+    result = {'id': sub_request.get('id', path)}
+
+    if not isinstance(path, str) or not path.startswith('/'):
+        return {**result, 'status': 400, 'body': {'success': False, 'error': 'Некорректный путь'}}
+    if method not in ALLOWED_METHODS:
+        return {**result, 'status': 405, 'body': {'success': False, 'error': 'Метод не поддерживается'}}
+
+    kwargs = {'method': method}
+    if sub_request.get('body') is not None:
+        kwargs['json'] = sub_request['body']
+
+    ctx = app.test_request_context(path, **kwargs)
+    # Сессия уже разобрана во внешнем запросе - подзапрос получает ее копию
+    ctx.session = sub_session
+    with app.app_context(), ctx:
+        g.current_user = user
+        try:
+            if request.url_rule is not None and request.url_rule.endpoint == 'api.batch':
+                return {**result, 'status': 400, 'body': {'success': False, 'error': 'Вложенный batch запрещен'}}
+            rv = app.preprocess_request()
+            if rv is None:
+                rv = app.dispatch_request()
+            response = app.process_response(app.make_response(rv))
+        except HTTPException as e:
+            return {**result, 'status': e.code, 'body': {'success': False, 'error': e.description}}
+        except Exception as e:
+            return {**result, 'status': 500, 'body': {'success': False, 'error': str(e)}}
+
+        # Потоковые и не-JSON ответы (страницы, редиректы) в пакет не включаем
+        if response.is_streamed or not response.is_json:
+            response.close()
+            return {**result, 'status': response.status_code, 'body': None}
+
+        return {**result, 'status': response.status_code, 'body': response.get_json()}
+
+
+@api_bp.route('/batch', methods=['POST'])
+def batch():
+    """Выполнить несколько JSON-запросов за один HTTP-запрос"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+
+    # Пользователь разрешается один раз на весь пакет (load_current_user)
+    user = g.get('current_user') or user_repository.get_by_id(session['user_id'])
+    if not user:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+
+    data = request.get_json(silent=True) or {}
+    sub_requests = data.get('requests')
+
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return jsonify({'success': False, 'error': 'Нужен непустой список requests'}), 400
+    if len(sub_requests) > MAX_BATCH_SIZE:
+        return jsonify({'success': False, 'error': f'Не более {MAX_BATCH_SIZE} подзапросов'}), 400
+
+    app = current_app._get_current_object()
+    outer_session = session._get_current_object()
+    # У каждого подзапроса своя копия сессии: потоки пула не делят один объект
+    sub_sessions = [app.session_interface.session_class(outer_session) for _ in sub_requests]
+
+    # Номера записей журнала, сделанных подзапросами в потоках пула
+    journal_marks = []
+
+    def run(index):
+        try:
+            return _dispatch(app, user, sub_sessions[index], sub_requests[index])
+        finally:
+            journal_marks.append(write_ahead_log.last_record())
+
+    if data.get('parallel') and len(sub_requests) > 1:
+        with ThreadPoolExecutor(max_workers=min(MAX_BATCH_WORKERS, len(sub_requests))) as pool:
+            responses = list(pool.map(run, range(len(sub_requests))))
+    else:
+        responses = [run(index) for index in range(len(sub_requests))]
+
+    # Изменения сессии подзапросами переносятся во внешнюю сессию в порядке пакета
+    for sub_session in sub_sessions:
+        if sub_session.modified:
+            outer_session.clear()
+            outer_session.update(sub_session)
+
+    # Ответ на пакет уходит после фиксации изменений всех подзапросов (см. commit_changes)
+    g.wal_upto = max(journal_marks, default=0)
+    return jsonify({'success': True, 'responses': responses})
@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, sessio
 from datetime import datetime, timedelta
 from src.services.calendar_service import CalendarService
 from src.repositories import task_repository, event_repository, user_repository
+from src.utils.serialization import requested_fields
 
 calendar_bp = Blueprint('calendar', __name__, url_prefix='/calendar')
 
@@ -74,7 +75,7 @@ def day_view(date_str):
     
     try:
         date = datetime.fromisoformat(date_str)
-        data = calendar_service.get_day_view(user_id, date)
+        data = calendar_service.get_day_view(user_id, date, requested_fields('task', 'event'))
         return jsonify({'success': True, **data})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
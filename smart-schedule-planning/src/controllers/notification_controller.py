@@ -0,0 +1,173 @@
+# src/controllers/notification_controller.py
+from flask import Blueprint, request, session, jsonify, Response, stream_with_context
+from src.repositories import message_repository
+from src.utils.event_bus import notification_bus, TooManySubscribers
+from src.services.retention_service import retention_service
+from src.services.delivery_pipeline import delivery_pipeline
+from src.services.notification_service import NotificationService
+from src.domain.entities import UserRole
+from src.utils.pagination import parse_page_size
+from src.utils.serialization import json_response, EntityList, requested_fields, serialization_cache
+
+notification_bp = Blueprint('notification', __name__, url_prefix='/api/notifications')
+
+notification_service = NotificationService()
+
+# Период пустых комментариев, чтобы прокси не закрывали простаивающее подключение
+STREAM_HEARTBEAT_SECONDS = 20
+# Сколько последних уведомлений отдать при первом подключении (без Last-Event-ID)
+STREAM_BACKLOG = 50
+
+
+def _sse_event(message) -> bytes:
+    return b'id: %d\nevent: notification\ndata: %s\n\n' % (message.id, serialization_cache.to_json(message))
+
+
+def _notification_stream(subscription, user_id: int, last_id: int):
+    """Поток SSE: досылка пропущенного из входящих, затем события шины"""
+    try:
+        yield b'retry: 5000\n\n'
+        
+        # Подписка оформлена до досылки, поэтому между ними ничего не теряется;
+        # повторы отсекаются по ID
+        limit = None if last_id else STREAM_BACKLOG
+        for message in message_repository.get_user_messages_after(user_id, last_id, limit):
+            last_id = message.id
+            yield _sse_event(message)
+        
+        while True:
+            messages = subscription.wait(STREAM_HEARTBEAT_SECONDS)
+            if subscription.reset_overflow():
+                # Клиент не успевал читать и буфер отбросил события - берем их из входящих
+                messages = message_repository.get_user_messages_after(user_id, last_id)
+            if not messages:
+                yield b': ping\n\n'
+                continue
+            for message in messages:
+                if message.id <= last_id:
+                    continue
+                last_id = message.id
+                yield _sse_event(message)
+    finally:
+        subscription.close()
+
+
+@notification_bp.route('/')
+def notification_list():
+    """Страница уведомлений: ?cursor=&limit=&type=<MessageType>&unread=1"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    user_id = session['user_id']
+    
+    try:
+        page = notification_service.get_notifications_page(
+            user_id,
+            cursor=request.args.get('cursor'),
+            limit=parse_page_size(request.args.get('limit')),
+            message_type=request.args.get('type'),
+            unread_only=request.args.get('unread') in ('1', 'true')
+        )
+        return json_response({
+            'success': True,
+            'notifications': EntityList(page['notifications'], requested_fields('message')),
+            'next_cursor': page['next_cursor']
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@notification_bp.route('/unread-count')
+def unread_count():
+    """Число непрочитанных для значка в меню (O(1) - счетчик репозитория)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    return jsonify({'success': True, 'count': notification_service.get_unread_count(session['user_id'])})
+
+@notification_bp.route('/<int:message_id>/read', methods=['POST'])
+def mark_read(message_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    if not notification_service.mark_as_read(session['user_id'], message_id):
+        return jsonify({'success': False, 'error': 'Уведомление не найдено'}), 404
+    return jsonify({'success': True})
+
+@notification_bp.route('/read-all', methods=['POST'])
+def mark_all_read():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    return jsonify({'success': True, 'count': notification_service.mark_all_as_read(session['user_id'])})
+
+@notification_bp.route('/<int:message_id>', methods=['DELETE'])
+def delete_notification(message_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    if not notification_service.delete_notification(session['user_id'], message_id):
+        return jsonify({'success': False, 'error': 'Уведомление не найдено'}), 404
+    return jsonify({'success': True})
+
+@notification_bp.route('/stream')
+def stream():
+    """Новые уведомления в реальном времени (Server-Sent Events).
+    
+    Подключение держит поток сервера, число потоков ограничено (SSE_MAX_STREAMS);
+    сверх предела - 503, клиент переподключается или опрашивает /api/notifications.
+    """
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    user_id = session['user_id']
+    
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Некорректный Last-Event-ID'}), 400
+    
+    try:
+        subscription = notification_bus.subscribe(user_id)
+    except TooManySubscribers as e:
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': '30'}
+    
+    response = Response(stream_with_context(_notification_stream(subscription, user_id, last_id)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Если клиент отключился до начала потока, генератор не запустится
+    response.call_on_close(subscription.close)
+    return response
+
+@notification_bp.route('/archive')
+def archive():
+    """История уведомлений из архива (от новых к старым)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    user_id = session['user_id']
+    
+    try:
+        messages, next_cursor = retention_service.get_archive_page(
+            user_id,
+            cursor=request.args.get('cursor'),
+            limit=parse_page_size(request.args.get('limit'))
+        )
+        return json_response({
+            'success': True,
+            'notifications': EntityList(messages, requested_fields('message')),
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+@notification_bp.route('/delivery-metrics')
+def delivery_metrics():
+    """Метрики конвейера доставки по получателям (только для администратора)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    if session.get('user_role') != UserRole.ADMIN.value:
+        return jsonify({'success': False, 'error': 'Недостаточно прав'}), 403
+    
+    return jsonify({'success': True, 'sinks': delivery_pipeline.metrics()})
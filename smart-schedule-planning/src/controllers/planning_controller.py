@@ -4,12 +4,20 @@ from datetime import datetime, timedelta
 from src.services.planning_service import PlanningService
 # Импортируем ЕДИНЫЕ экземпляры репозиториев
 from src.repositories import task_repository, user_repository, group_repository
+from src.utils.serialization import (json_response, EntityList, FIELD_GETTERS, entity_kind, requested_fields,
+                                     serialize)
 
 planning_bp = Blueprint('planning', __name__, url_prefix='/planning')
 
 # Создаем экземпляр сервиса БЕЗ аргументов
 planning_service = PlanningService()
 
+
+def _serialized(result, fields):
+    """Сущности из результата сервиса - через serialize с проекцией ?fields="""
+    return {key: serialize(value, fields) if entity_kind(value) in FIELD_GETTERS else value
+            for key, value in result.items()}
+
 @planning_bp.route('/collaborative')
 def collaborative():
     if 'user_id' not in session:
@@ -76,6 +84,7 @@ def create_group():
     user_id = session['user_id']
     
     try:
+        fields = requested_fields('group', 'schedule')
         name = request.json.get('name')
         description = request.json.get('description', '')
         is_public = request.json.get('is_public', False)
@@ -88,7 +97,7 @@ def create_group():
             user_id, name, description, is_public, max_members
         )
         
-        return jsonify({'success': True, **result})
+        return json_response({'success': True, **_serialized(result, fields)})
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
@@ -102,14 +111,14 @@ def join_group():
     user_id = session['user_id']
     
     try:
-        group_id = request.json.get('group_id', type=int)
+        group_id = int(request.json.get('group_id') or 0)
         
         if not group_id:
             return jsonify({'success': False, 'error': 'ID группы обязателен'}), 400
         
         result = planning_service.join_group(user_id, group_id)
         
-        return jsonify({'success': True, **result})
+        return json_response({'success': True, **_serialized(result, requested_fields('group', 'user'))})
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
@@ -123,14 +132,14 @@ def leave_group():
     user_id = session['user_id']
     
     try:
-        group_id = request.json.get('group_id', type=int)
+        group_id = int(request.json.get('group_id') or 0)
         
         if not group_id:
             return jsonify({'success': False, 'error': 'ID группы обязателен'}), 400
         
         result = planning_service.leave_group(user_id, group_id)
         
-        return jsonify({'success': True, **result})
+        return json_response({'success': True, **_serialized(result, requested_fields('group'))})
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
@@ -145,7 +154,7 @@ def my_groups():
     
     try:
         groups = planning_service.get_user_groups(user_id)
-        return jsonify({'success': True, 'groups': groups})
+        return json_response({'success': True, 'groups': EntityList(groups, requested_fields('group'))})
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
@@ -191,10 +200,11 @@ def group_tasks(group_id):
         if group.schedule:
             tasks = task_repository.get_schedule_tasks(group.schedule.id)
         
-        return jsonify({
+        fields = requested_fields('group', 'task')
+        return json_response({
             'success': True,
-            'group': group.to_dict(),
-            'tasks': [task.to_dict() for task in tasks]
+            'group': serialize(group, fields),
+            'tasks': EntityList(tasks, fields)
         })
     
     except Exception as e:
@@ -209,6 +219,7 @@ def api_create_group():
     user_id = session['user_id']
     
     try:
+        fields = requested_fields('group', 'schedule')
         data = request.get_json()
         name = data.get('name')
         description = data.get('description', '')
@@ -217,7 +228,7 @@ def api_create_group():
             return jsonify({'success': False, 'error': 'Название группы обязательно'}), 400
         
         result = planning_service.create_group(user_id, name, description)
-        return jsonify({'success': True, **result})
+        return json_response({'success': True, **_serialized(result, fields)})
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
@@ -232,9 +243,9 @@ def api_my_groups():
     
     try:
         groups = group_repository.get_user_groups(user_id)
-        return jsonify({
+        return json_response({
             'success': True, 
-            'groups': [group.to_dict() for group in groups]
+            'groups': EntityList(groups, requested_fields('group'))
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
\ No newline at end of file
@@ -2,6 +2,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
 from datetime import datetime, timedelta
 from src.services.calendar_service import CalendarService
+from src.services.task_archive_service import task_archive_service
 # Импортируем ЕДИНЫЕ экземпляры репозиториев
 from src.repositories import task_repository, event_repository, user_repository
 
@@ -36,6 +37,10 @@ def productivity():
         completed = sum(1 for t in tasks if t.status.value == 'завершена')
         in_progress = sum(1 for t in tasks if t.status.value == 'в работе')
         new_tasks = sum(1 for t in tasks if t.status.value == 'новая')
+        # Давно завершенные задачи лежат в архиве
+        archived = task_archive_service.count_tasks(user_id)
+        completed += archived
+        total = len(tasks) + archived
         
         response = {
             'success': True,
@@ -44,11 +49,12 @@ def productivity():
                 'end': end_date.isoformat()
             },
             'stats': {
-                'total': len(tasks),
+                'total': total,
                 'completed': completed,
                 'in_progress': in_progress,
                 'new': new_tasks,
-                'completion_rate': round((completed / len(tasks)) * 100, 1) if tasks else 0
+                'archived': archived,
+                'completion_rate': round((completed / total) * 100, 1) if total else 0
             },
             'occupancy_data': data
         }
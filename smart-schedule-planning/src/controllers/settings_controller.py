@@ -1,10 +1,20 @@
 # src/controllers/settings_controller.py
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, session, flash, jsonify, send_file
 from src.services.user_service import UserService
 from src.services.integration_service import IntegrationService
+from src.services.export_jobs import ExportQuotaExceeded, export_job_service
+from src.services.bulk_export import bulk_export_service
+from src.services.snapshot_service import snapshot_service
+from src.services.write_ahead_log import write_ahead_log
+from src.domain.entities import UserRole
 # Импортируем ЕДИНЫЕ экземпляры репозиториев
 from src.repositories import user_repository, group_repository, task_repository, event_repository
-from datetime import datetime, timedelta
+from src.utils.serialization import json_response, requested_fields, serialize
+from src.utils.streaming import file_download, stream_download, stream_response, uploaded_lines, wants_gzip
+from src.utils.validators import to_local_naive
+from werkzeug.http import is_resource_modified
+from datetime import datetime, timedelta, timezone
+import os
 settings_bp = Blueprint('settings', __name__, url_prefix='/settings')
 
 
@@ -32,6 +42,7 @@ def update_profile():
     password = request.json.get('password')
     
     try:
+        fields = requested_fields('user')
         updates = {}
         if name: updates['name'] = name
         if email: updates['email'] = email
@@ -43,52 +54,300 @@ def update_profile():
         session['user_name'] = user.name
         session['user_email'] = user.email
         
-        return jsonify({'success': True, 'user': user.to_dict()})
+        return json_response({'success': True, 'user': serialize(user, fields)})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
-@settings_bp.route('/export/ical', methods=['POST'])
-def export_ical():
+@settings_bp.route('/notifications', methods=['POST'])
+def update_notification_settings():
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Не авторизован'}), 401
     
     user_id = session['user_id']
-    start_str = request.json.get('start_date')
-    end_str = request.json.get('end_date')
+    data = request.json or {}
     
     try:
-        start_date = datetime.fromisoformat(start_str) if start_str else datetime.now() - timedelta(days=30)
-        end_date = datetime.fromisoformat(end_str) if end_str else datetime.now() + timedelta(days=30)
-        
-        ical_content = integration_service.export_to_ical(user_id, start_date, end_date)
+        updates = {}
+        if 'digest' in data:
+            updates['notification_digest'] = bool(data['digest'])
         
+        user = user_service.update_profile(user_id, **updates)
+        return jsonify({'success': True, 'digest': user.notification_digest})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+def _range_bound(value, default: datetime) -> datetime:
+    if not value:
+        return default
+    try:
+        moment = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"Некорректная дата: {str(value)[:30]}")
+    # Даты с часовым поясом - в локальное время: в репозиториях все времена наивные
+    return to_local_naive(moment)
+
+def _export_range(params) -> tuple:
+    """Диапазон выгрузки из параметров запроса (по умолчанию +-30 дней, all=1 - без диапазона).
+    
+    Проверяется до начала ответа: потоковая выгрузка не должна обрываться
+    на середине из-за некорректного диапазона.
+    """
+    if str(params.get('all', '')).lower() in ('1', 'true'):
+        return None, None
+    start_date = _range_bound(params.get('start_date'), datetime.now() - timedelta(days=30))
+    end_date = _range_bound(params.get('end_date'), datetime.now() + timedelta(days=30))
+    if start_date > end_date:
+        raise ValueError("Начало диапазона позже его конца")
+    return start_date, end_date
+
+def _enqueue_export(export_format: str):
+    """Поставить выгрузку в фоновую очередь; ответ 202 с заданием для опроса.
+    
+    gzip: true - сохранить файл сжатым (.gz) для API-клиентов; при скачивании
+    без этого флага сжимается только передача (Content-Encoding).
+    """
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    params = request.get_json(silent=True) or {}
+    try:
+        start_date, end_date = _export_range(params)
+        job = export_job_service.submit(
+            session['user_id'], export_format, start_date, end_date,
+            gzip=str(params.get('gzip', '')).lower() in ('1', 'true')
+        )
         return jsonify({
             'success': True,
-            'content': ical_content,
-            'filename': f'schedule_{datetime.now().strftime("%Y%m%d_%H%M%S")}.ics'
-        })
+            'job': job.to_dict(),
+            'status_url': url_for('settings.export_job_status', job_id=job.id),
+            'download_url': url_for('settings.export_job_download', job_id=job.id)
+        }), 202
+    except ExportQuotaExceeded as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@settings_bp.route('/export/ical', methods=['POST'])
+def export_ical():
+    return _enqueue_export('ical')
+
+@settings_bp.route('/export/ical/download')
+def download_ical():
+    """Потоковая выгрузка .ics (?start_date=&end_date=; gzip=0 - не сжимать передачу)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    user_id = session['user_id']
+    
+    try:
+        start_date, end_date = _export_range(request.args)
+        if start_date is None:
+            raise ValueError("Для iCalendar нужен диапазон дат")
+        
+        chunks = integration_service.iter_ical(user_id, start_date, end_date)
+        return stream_download(
+            chunks,
+            mimetype='text/calendar',
+            filename=f'schedule_{datetime.now().strftime("%Y%m%d_%H%M%S")}.ics',
+            gzip=wants_gzip()
+        )
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
 @settings_bp.route('/export/csv', methods=['POST'])
 def export_csv():
+    return _enqueue_export('csv')
+
+@settings_bp.route('/export/jobs')
+def export_jobs():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    jobs = export_job_service.get_user_jobs(session['user_id'])
+    return jsonify({'success': True, 'jobs': [job.to_dict() for job in jobs]})
+
+@settings_bp.route('/export/jobs/<int:job_id>')
+def export_job_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    job = export_job_service.get_job(session['user_id'], job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Выгрузка не найдена'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@settings_bp.route('/export/jobs/<int:job_id>/download')
+def export_job_download(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    user_id = session['user_id']
+    path = export_job_service.artifact_path(user_id, job_id)
+    if not path:
+        return jsonify({'success': False, 'error': 'Файл не готов или срок его хранения истек'}), 404
+    
+    job = export_job_service.get_job(user_id, job_id)
+    if job.gzip:
+        # Файл .gz заказан явно (только через API) - отдается как есть
+        response = send_file(path, mimetype=job.mimetype, as_attachment=True, download_name=job.filename)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    return file_download(path, job.mimetype, job.filename)
+
+@settings_bp.route('/export/jobs/<int:job_id>', methods=['DELETE'])
+def export_job_cancel(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    if not export_job_service.cancel(session['user_id'], job_id):
+        return jsonify({'success': False, 'error': 'Выгрузка не найдена'}), 404
+    return jsonify({'success': True})
+
+@settings_bp.route('/export/csv/download')
+def download_csv():
+    """Потоковая выгрузка .csv (?start_date=&end_date=&all=1; gzip=0 - не сжимать передачу)"""
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Не авторизован'}), 401
     
     user_id = session['user_id']
-    start_str = request.json.get('start_date')
-    end_str = request.json.get('end_date')
     
     try:
-        start_date = datetime.fromisoformat(start_str) if start_str else datetime.now() - timedelta(days=30)
-        end_date = datetime.fromisoformat(end_str) if end_str else datetime.now() + timedelta(days=30)
-        
-        csv_content = integration_service.export_to_csv(user_id, start_date, end_date)
+        # all=1 - все задачи пользователя, без диапазона дат
+        start_date, end_date = _export_range(request.args)
         
+        chunks = integration_service.iter_csv(user_id, start_date, end_date)
+        return stream_download(
+            chunks,
+            mimetype='text/csv',
+            filename=f'tasks_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
+            gzip=wants_gzip()
+        )
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@settings_bp.route('/import/ical', methods=['POST'])
+def import_ical():
+    """Импорт .ics: файл в поле file или в теле запроса, читается потоково"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    try:
+        result = integration_service.import_ical(session['user_id'], uploaded_lines())
+        return jsonify({'success': True, **result.to_dict()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@settings_bp.route('/import/csv', methods=['POST'])
+def import_csv():
+    """Импорт задач из .csv в формате выгрузки, файл читается потоково"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    try:
+        result = integration_service.import_csv(session['user_id'], uploaded_lines())
+        return jsonify({'success': True, **result.to_dict()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@settings_bp.route('/feed', methods=['POST'])
+def calendar_feed_link():
+    """Ссылка подписки на календарь (?reset=1 - выпустить новую, старая перестанет работать)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    try:
+        token = user_service.get_feed_token(session['user_id'], reset=request.args.get('reset') in ('1', 'true'))
+        url = url_for('settings.calendar_feed', token=token, _external=True)
         return jsonify({
             'success': True,
-            'content': csv_content,
-            'filename': f'tasks_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+            'url': url,
+            'webcal_url': 'webcal://' + url.split('://', 1)[1]
         })
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 400
\ No newline at end of file
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@settings_bp.route('/feed/<token>.ics')
+def calendar_feed(token):
+    """Лента .ics для календарных клиентов: доступ по токену, без сессии.
+    
+    Неизмененный календарь отдается ответом 304 по ETag/Last-Modified,
+    не строя его заново.
+    """
+    user = user_repository.get_by_feed_token(token)
+    if not user:
+        return jsonify({'success': False, 'error': 'Календарь не найден'}), 404
+    
+    etag, last_modified = integration_service.feed_state(user.id)
+    # Заголовки HTTP - в UTC, время в приложении - локальное
+    last_modified = last_modified.astimezone(timezone.utc).replace(microsecond=0)
+    
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = stream_response(integration_service.iter_feed(user.id), mimetype='text/calendar')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@settings_bp.route('/admin/bulk-export', methods=['GET', 'POST'])
+def admin_bulk_export():
+    """Массовая выгрузка календарей всех пользователей (только для администратора).
+    
+    POST запускает выгрузку в фоне ({start_date, end_date, workers} - необязательны),
+    GET возвращает состояние и отчет с пропускной способностью процессов.
+    """
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    if session.get('user_role') != UserRole.ADMIN.value:
+        return jsonify({'success': False, 'error': 'Недостаточно прав'}), 403
+    
+    if request.method == 'GET':
+        return jsonify({'success': True, **bulk_export_service.status()})
+    
+    params = request.get_json(silent=True) or {}
+    try:
+        start_date = datetime.fromisoformat(params['start_date']) if params.get('start_date') else datetime.min
+        end_date = datetime.fromisoformat(params['end_date']) if params.get('end_date') else datetime.max
+        workers = int(params['workers']) if params.get('workers') else None
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if not bulk_export_service.start(start_date, end_date, workers):
+        return jsonify({'success': False, 'error': 'Выгрузка уже выполняется'}), 409
+    return jsonify({'success': True, 'running': True}), 202
+
+@settings_bp.route('/admin/bulk-export/download')
+def admin_bulk_export_download():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    if session.get('user_role') != UserRole.ADMIN.value:
+        return jsonify({'success': False, 'error': 'Недостаточно прав'}), 403
+    
+    report = bulk_export_service.last_report
+    if not report or not os.path.exists(report.path):
+        return jsonify({'success': False, 'error': 'Архив не найден'}), 404
+    return send_file(os.path.abspath(report.path), mimetype='application/zip',
+                     as_attachment=True, download_name=os.path.basename(report.path))
+
+@settings_bp.route('/admin/snapshot', methods=['GET', 'POST'])
+def admin_snapshot():
+    """Снимок данных: POST записывает его сейчас (и уплотняет журнал), GET - сведения о последнем"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    if session.get('user_role') != UserRole.ADMIN.value:
+        return jsonify({'success': False, 'error': 'Недостаточно прав'}), 403
+    
+    if request.method == 'GET':
+        info = snapshot_service.last_snapshot
+        return jsonify({'success': True, 'enabled': snapshot_service.enabled,
+                        'ready': snapshot_service.ready, 'failed': snapshot_service.failed,
+                        'error': snapshot_service.last_error,
+                        'snapshot': info.to_dict() if info else None,
+                        'wal': write_ahead_log.status()})
+    
+    try:
+        info = write_ahead_log.checkpoint() if write_ahead_log.running else snapshot_service.save()
+        return jsonify({'success': True, 'snapshot': info.to_dict()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
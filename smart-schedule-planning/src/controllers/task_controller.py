@@ -4,7 +4,11 @@ from datetime import datetime, timedelta
 from src.services.task_service import TaskService
 from src.services.schedule_service import ScheduleService
 from src.services.planning_service import PlanningService
+from src.services.deadline_scheduler import deadline_scheduler
+from src.services.task_archive_service import task_archive_service
 from src.repositories import task_repository, user_repository, schedule_repository, group_repository
+from src.utils.pagination import parse_page_size
+from src.utils.serialization import serialize, serialize_many, json_response, EntityList, requested_fields
 
 task_bp = Blueprint('task', __name__, url_prefix='/tasks')
 
@@ -23,16 +27,49 @@ def task_list():
     
     user_id = session['user_id']
     status_filter = request.args.get('status')
+    sort = request.args.get('sort', 'deadline')
+    order = request.args.get('order', 'asc')
     
     try:
-        tasks = task_service.get_user_tasks(user_id, status_filter)
+        # Рендерим только первую страницу, остальное подгружается через /tasks/api/list
+        page = task_service.get_tasks_page(user_id, sort=sort, status=status_filter,
+                                           limit=parse_page_size(request.args.get('limit')),
+                                           descending=(order == 'desc'))
         return render_template('tasks.html', 
-                             tasks=[task.to_dict() for task in tasks],
-                             status_filter=status_filter)
+                             tasks=serialize_many(page['tasks']),
+                             next_cursor=page['next_cursor'],
+                             status_filter=status_filter,
+                             sort=sort,
+                             order=order)
     except Exception as e:
         flash(str(e), 'error')
         return redirect(url_for('dashboard'))
 
+@task_bp.route('/api/list')
+def api_task_list():
+    """Страница задач в JSON (keyset-пагинация)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    user_id = session['user_id']
+    
+    try:
+        page = task_service.get_tasks_page(
+            user_id,
+            sort=request.args.get('sort', 'deadline'),
+            cursor=request.args.get('cursor'),
+            limit=parse_page_size(request.args.get('limit')),
+            status=request.args.get('status'),
+            descending=(request.args.get('order', 'asc') == 'desc')
+        )
+        return json_response({
+            'success': True,
+            'tasks': EntityList(page['tasks'], requested_fields('task')),
+            'next_cursor': page['next_cursor']
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
 @task_bp.route('/create', methods=['GET', 'POST'])
 def create_task():
     """Создание новой задачи"""
@@ -203,7 +240,7 @@ def complete_task(task_id):
     
     try:
         task = task_service.complete_task(task_id)
-        return jsonify({'success': True, 'task': task.to_dict()})
+        return json_response({'success': True, 'task': serialize(task, requested_fields('task'))})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
@@ -216,7 +253,7 @@ def start_task(task_id):
     try:
         updates = {'start_time': datetime.now(), 'status': 'в работе'}
         task = task_service.update_task(task_id, **updates)
-        return jsonify({'success': True, 'task': task.to_dict()})
+        return json_response({'success': True, 'task': serialize(task, requested_fields('task'))})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
@@ -229,6 +266,7 @@ def delete_task(task_id):
     try:
         success = task_repository.delete(task_id)
         if success:
+            deadline_scheduler.cancel(task_id)
             flash('Задача успешно удалена', 'success')
         else:
             flash('Задача не найдена', 'error')
@@ -249,17 +287,8 @@ def upcoming_tasks():
     try:
         tasks = task_service.get_user_tasks(user_id)
         
-        # Ближайшие задачи (с дедлайном в ближайшие 7 дней)
-        now = datetime.now()
-        week_later = now + timedelta(days=7)
-        upcoming = []
-        
-        for task in tasks:
-            if task.deadline and task.deadline <= week_later:
-                upcoming.append(task.to_dict())
-        
-        # Сортируем по дедлайну
-        upcoming.sort(key=lambda x: x['deadline'] if x['deadline'] else '9999-12-31')
+        # 5 ближайших задач (с дедлайном в ближайшие 7 дней) из индекса дедлайнов
+        upcoming = task_service.get_upcoming_tasks(user_id, days=7, limit=5)
         
         # Статистика
         stats = {
@@ -269,9 +298,9 @@ def upcoming_tasks():
             'new': len([t for t in tasks if t.status.value == 'новая'])
         }
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'tasks': upcoming[:5],  # Берем 5 ближайших
+            'tasks': EntityList(upcoming, requested_fields('task')),
             'stats': stats
         })
     
@@ -289,17 +318,21 @@ def task_stats():
     user_id = session['user_id']
     try:
         tasks = task_service.get_user_tasks(user_id)
+        # В архиве только завершенные задачи, их счетчики не требуют чтения архива
+        archived = task_archive_service.count_by_priority(user_id)
+        archived_total = sum(archived.values())
         
         stats = {
-            'total': len(tasks),
-            'completed': len([t for t in tasks if t.status.value == 'завершена']),
+            'total': len(tasks) + archived_total,
+            'completed': len([t for t in tasks if t.status.value == 'завершена']) + archived_total,
             'in_progress': len([t for t in tasks if t.status.value == 'в работе']),
             'new': len([t for t in tasks if t.status.value == 'новая']),
+            'archived': archived_total,
             
             'by_priority': {
-                'высокий': len([t for t in tasks if t.priority.value == 'высокий']),
-                'средний': len([t for t in tasks if t.priority.value == 'средний']),
-                'низкий': len([t for t in tasks if t.priority.value == 'низкий'])
+                'высокий': len([t for t in tasks if t.priority.value == 'высокий']) + archived['высокий'],
+                'средний': len([t for t in tasks if t.priority.value == 'средний']) + archived['средний'],
+                'низкий': len([t for t in tasks if t.priority.value == 'низкий']) + archived['низкий']
             }
         }
         
@@ -308,6 +341,28 @@ def task_stats():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
     
+@task_bp.route('/archive')
+def task_archive():
+    """Завершенные задачи из архива (от последних перенесенных к первым)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Не авторизован'}), 401
+    
+    user_id = session['user_id']
+    
+    try:
+        tasks, next_cursor = task_archive_service.get_archive_page(
+            user_id,
+            cursor=request.args.get('cursor'),
+            limit=parse_page_size(request.args.get('limit'))
+        )
+        return json_response({
+            'success': True,
+            'tasks': EntityList(tasks, requested_fields('task')),
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
 @task_bp.route('/suggest-time', methods=['POST'])
 def suggest_time():
     """Получить предложения по времени для задачи"""
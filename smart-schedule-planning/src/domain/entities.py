@@ -1,7 +1,8 @@
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from enum import Enum
+from src.domain.message_templates import render_message
 
 class UserRole(Enum):
     PARTICIPANT = "участник"
@@ -24,6 +25,7 @@ class MessageType(Enum):
     SCHEDULE_CHANGE = "изменение_расписания"
     GROUP_INVITE = "приглашение_в_группу"
     SYSTEM = "системное"
+    DIGEST = "сводка"
 
 @dataclass
 class User:
@@ -35,6 +37,8 @@ class User:
     created_at: datetime
     updated_at: datetime
     groups: List['Group'] = field(default_factory=list)
+    notification_digest: bool = False  # напоминания приходят одной ежедневной сводкой
+    feed_token: Optional[str] = None  # секрет в адресе подписки на календарь (.ics)
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -43,7 +47,8 @@ class User:
             'email': self.email,
             'role': self.role.value,
             'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'updated_at': self.updated_at.isoformat(),
+            'notification_digest': self.notification_digest
         }
 @dataclass
 class Group:
@@ -107,6 +112,8 @@ class Task:
     creator_id: int
     schedule_id: Optional[int] = None
     assigned_users: List[int] = field(default_factory=list)
+    external_uid: Optional[str] = None  # UID из импортированного календаря
+    version: int = 0  # увеличивается репозиторием при каждом изменении
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -137,6 +144,8 @@ class Event:
     is_shared: bool
     created_at: datetime
     participants: List[int] = field(default_factory=list)
+    external_uid: Optional[str] = None  # UID из импортированного календаря
+    version: int = 0  # увеличивается репозиторием при каждом изменении
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -154,13 +163,19 @@ class Event:
 @dataclass
 class Message:
     id: int
-    text: str
+    template_id: str  # текст хранится как шаблон + параметры (см. message_templates)
+    template_params: Tuple[Any, ...]
     sent_at: datetime
     message_type: MessageType
     user_id: int
     is_read: bool = False
     related_entity_id: Optional[int] = None
     related_entity_type: Optional[str] = None
+    version: int = 0  # увеличивается репозиторием при каждом изменении
+    
+    @property
+    def text(self) -> str:
+        return render_message(self.template_id, self.template_params)
     
     def to_dict(self) -> Dict[str, Any]:
         return {
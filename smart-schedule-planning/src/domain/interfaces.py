@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Tuple
 from datetime import datetime
 
 # Интерфейсы репозиториев
@@ -12,10 +12,22 @@ class IUserRepository(ABC):
     def get_by_id(self, user_id: int) -> Optional['User']:
         pass
     
+    @abstractmethod
+    def dump(self) -> Tuple[List['User'], int]:
+        pass
+    
+    @abstractmethod
+    def restore(self, users: List['User'], next_id: int) -> None:
+        pass
+    
     @abstractmethod
     def get_by_email(self, email: str) -> Optional['User']:
         pass
     
+    @abstractmethod
+    def get_by_feed_token(self, token: str) -> Optional['User']:
+        pass
+    
     @abstractmethod
     def get_all(self) -> List['User']:
         pass
@@ -37,6 +49,14 @@ class IGroupRepository(ABC):
     def get_by_id(self, group_id: int) -> Optional['Group']:
         pass
     
+    @abstractmethod
+    def dump(self) -> Tuple[List['Group'], int]:
+        pass
+    
+    @abstractmethod
+    def restore(self, groups: List['Group'], next_id: int) -> None:
+        pass
+    
     @abstractmethod
     def get_all(self) -> List['Group']:
         pass
@@ -62,6 +82,14 @@ class IScheduleRepository(ABC):
     def get_by_id(self, schedule_id: int) -> Optional['Schedule']:
         pass
     
+    @abstractmethod
+    def dump(self) -> Tuple[List['Schedule'], int]:
+        pass
+    
+    @abstractmethod
+    def restore(self, schedules: List['Schedule'], next_id: int) -> None:
+        pass
+    
     @abstractmethod
     def get_user_schedules(self, user_id: int) -> List['Schedule']:
         pass
@@ -83,14 +111,52 @@ class ITaskRepository(ABC):
     def add(self, task: 'Task') -> 'Task':
         pass
     
+    @abstractmethod
+    def add_many(self, tasks: List['Task']) -> List['Task']:
+        pass
+    
+    @abstractmethod
+    def get_by_external_uid(self, user_id: int, external_uid: str) -> Optional['Task']:
+        pass
+    
     @abstractmethod
     def get_by_id(self, task_id: int) -> Optional['Task']:
         pass
     
+    @abstractmethod
+    def dump(self) -> Tuple[List['Task'], int]:
+        pass
+    
+    @abstractmethod
+    def restore(self, tasks: List['Task'], next_id: int) -> None:
+        pass
+    
+    @abstractmethod
+    def get_many(self, task_ids: List[int]) -> Dict[int, 'Task']:
+        pass
+    
+    @abstractmethod
+    def get_all(self) -> List['Task']:
+        pass
+    
     @abstractmethod
     def get_user_tasks(self, user_id: int) -> List['Task']:
         pass
     
+    @abstractmethod
+    def get_upcoming(self, user_id: int, until: datetime, limit: int) -> List['Task']:
+        pass
+    
+    @abstractmethod
+    def get_deadlines_between(self, user_id: int, start: datetime, end: datetime) -> List['Task']:
+        pass
+    
+    @abstractmethod
+    def get_user_tasks_page(self, user_id: int, sort: str = 'deadline', limit: int = 20,
+                            after: Optional[tuple] = None, descending: bool = False,
+                            status: Optional['TaskStatus'] = None) -> tuple:
+        pass
+    
     @abstractmethod
     def get_schedule_tasks(self, schedule_id: int) -> List['Task']:
         pass
@@ -99,10 +165,22 @@ class ITaskRepository(ABC):
     def get_by_date_range(self, start_date: datetime, end_date: datetime) -> List['Task']:
         pass
     
+    @abstractmethod
+    def iter_user_tasks(self, user_id: int) -> Iterator['Task']:
+        pass
+    
+    @abstractmethod
+    def iter_user_tasks_in_range(self, user_id: int, start: datetime, end: datetime) -> Iterator['Task']:
+        pass
+    
     @abstractmethod
     def update(self, task: 'Task') -> 'Task':
         pass
     
+    @abstractmethod
+    def remove_many(self, task_ids: List[int]) -> int:
+        pass
+    
     @abstractmethod
     def delete(self, task_id: int) -> bool:
         pass
@@ -112,14 +190,34 @@ class IEventRepository(ABC):
     def add(self, event: 'Event') -> 'Event':
         pass
     
+    @abstractmethod
+    def add_many(self, events: List['Event']) -> List['Event']:
+        pass
+    
+    @abstractmethod
+    def get_by_external_uid(self, user_id: int, external_uid: str) -> Optional['Event']:
+        pass
+    
     @abstractmethod
     def get_by_id(self, event_id: int) -> Optional['Event']:
         pass
     
+    @abstractmethod
+    def dump(self) -> Tuple[List['Event'], int]:
+        pass
+    
+    @abstractmethod
+    def restore(self, events: List['Event'], next_id: int) -> None:
+        pass
+    
     @abstractmethod
     def get_user_events(self, user_id: int) -> List['Event']:
         pass
     
+    @abstractmethod
+    def iter_user_events_in_range(self, user_id: int, start: datetime, end: datetime) -> Iterator['Event']:
+        pass
+    
     @abstractmethod
     def get_shared_events(self) -> List['Event']:
         pass
@@ -137,22 +235,58 @@ class IMessageRepository(ABC):
     def add(self, message: 'Message') -> 'Message':
         pass
     
+    @abstractmethod
+    def add_many(self, messages: List['Message']) -> List['Message']:
+        pass
+    
     @abstractmethod
     def get_by_id(self, message_id: int) -> Optional['Message']:
         pass
     
+    @abstractmethod
+    def dump(self) -> Tuple[List['Message'], int]:
+        pass
+    
+    @abstractmethod
+    def restore(self, messages: List['Message'], next_id: int) -> None:
+        pass
+    
     @abstractmethod
     def get_user_messages(self, user_id: int) -> List['Message']:
         pass
     
+    @abstractmethod
+    def get_user_messages_after(self, user_id: int, after_id: int,
+                                limit: Optional[int] = None) -> List['Message']:
+        pass
+    
+    @abstractmethod
+    def get_user_messages_page(self, user_id: int, limit: int = 20, before: Optional[tuple] = None,
+                               message_type: Optional['MessageType'] = None,
+                               unread_only: bool = False) -> tuple:
+        pass
+    
     @abstractmethod
     def get_unread_messages(self, user_id: int) -> List['Message']:
         pass
     
+    @abstractmethod
+    def count_unread(self, user_id: int) -> int:
+        pass
+    
+    @abstractmethod
+    def mark_all_as_read(self, user_id: int) -> int:
+        pass
+    
     @abstractmethod
     def mark_as_read(self, message_id: int) -> bool:
         pass
     
+    @abstractmethod
+    def mark_related_as_read(self, entity_type: str, entity_id: int,
+                             message_type: Optional['MessageType'] = None) -> int:
+        pass
+    
     @abstractmethod
     def delete(self, message_id: int) -> bool:
         pass
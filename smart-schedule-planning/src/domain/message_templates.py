@@ -0,0 +1,41 @@
+# src/domain/message_templates.py
+import re
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+# Шаблоны текстов уведомлений: сообщения хранят только ID шаблона и параметры
+MESSAGE_TEMPLATES: Dict[str, str] = {
+    'raw': "{0}",
+    'task_reminder': "Напоминание: задача '{0}' через {1} часа(ов)",
+    'deadline_today': "СРОЧНО: дедлайн задачи '{0}' сегодня!",
+    'deadline_urgent': "СРОЧНО: дедлайн задачи '{0}' через {1} час!",
+    'schedule_change': "Изменения в расписании #{0}",
+    'daily_digest': "Сводка: дедлайнов в ближайшие {0} ч - {1}: {2}",
+    'export_ready': "Выгрузка {0} готова, файл доступен {1} мин",
+}
+
+# Разбор старых готовых текстов обратно в (шаблон, параметры) для миграции
+_LEGACY_PATTERNS: Tuple[Tuple[str, 're.Pattern', Tuple[type, ...]], ...] = (
+    ('task_reminder', re.compile(r"^Напоминание: задача '(.*)' через (\d+) часа\(ов\)$", re.S), (str, int)),
+    ('deadline_today', re.compile(r"^СРОЧНО: дедлайн задачи '(.*)' сегодня!$", re.S), (str,)),
+    ('deadline_urgent', re.compile(r"^СРОЧНО: дедлайн задачи '(.*)' через (\d+) час!$", re.S), (str, int)),
+    ('schedule_change', re.compile(r"^Изменения в расписании #(\d+)$"), (int,)),
+)
+
+
+@lru_cache(maxsize=8192)
+def render_message(template_id: str, params: Tuple[Any, ...]) -> str:
+    """Текст сообщения по шаблону (кэшируется: одинаковые рассылки рендерятся один раз)"""
+    template = MESSAGE_TEMPLATES.get(template_id)
+    if template is None:
+        return ' '.join(str(param) for param in params)
+    return template.format(*params)
+
+
+def parse_legacy_text(text: str) -> Tuple[str, Tuple[Any, ...]]:
+    """Подобрать шаблон для готового текста; неизвестный текст остается 'raw'"""
+    for template_id, pattern, types in _LEGACY_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            return template_id, tuple(cast(value) for cast, value in zip(types, match.groups()))
+    return 'raw', (text,)
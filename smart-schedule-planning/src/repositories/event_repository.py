@@ -1,20 +1,102 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Tuple
 from datetime import datetime
 from src.domain.interfaces import IEventRepository
 from src.domain.entities import Event
+from src.repositories.indexes import ChangeTracker, IntervalIndex
+from src.repositories.journal import mutation_journal
+from src.utils.ical import ical_fragments
+from src.utils.serialization import serialization_cache
+
+
+def _interval(event: Event):
+    return (event.start_time, event.end_time)
+
+
+def _event_owners(event: Event) -> List[int]:
+    return [event.owner_id] + list(event.participants)
+
 
 class EventRepository(IEventRepository):
     def __init__(self):
         self._events: Dict[int, Event] = {}
         self._next_id = 1
+        # События пользователя по времени начала (календарь, экспорт)
+        self._start_index = IntervalIndex(_interval)
+        # Импортированные события: (владелец, внешний UID) -> ID события
+        self._by_external_uid: Dict[Tuple[int, str], int] = {}
+        # Отметки изменений событий пользователя (подписка на календарь)
+        self._changes = ChangeTracker()
+    
+    def _reindex(self, event: Event) -> None:
+        owners = _event_owners(event)
+        self._changes.touch(self._start_index.owners_of(event.id) + tuple(owners))
+        self._start_index.put(event.id, owners, event)
+    
+    def _unindex(self, event_id: int) -> None:
+        self._changes.touch(self._start_index.owners_of(event_id))
+        self._start_index.discard(event_id)
     
     def add(self, event: Event) -> Event:
         event.id = self._next_id
         event.created_at = datetime.now()
         self._events[event.id] = event
         self._next_id += 1
+        self._reindex(event)
+        if event.external_uid:
+            self._by_external_uid[(event.owner_id, event.external_uid)] = event.id
+        mutation_journal.put('events', event)
         return event
     
+    def add_many(self, events: List[Event]) -> List[Event]:
+        """Добавить пачку событий (импорт) с общей меткой времени"""
+        now = datetime.now()
+        added: List[Event] = []
+        try:
+            for event in events:
+                event.id = self._next_id
+                event.created_at = now
+                self._events[event.id] = event
+                self._next_id += 1
+                added.append(event)
+                self._reindex(event)
+                if event.external_uid:
+                    self._by_external_uid[(event.owner_id, event.external_uid)] = event.id
+        except Exception:
+            # Пачка добавляется целиком или не добавляется совсем
+            for event in added:
+                self._events.pop(event.id, None)
+                if event.external_uid:
+                    self._by_external_uid.pop((event.owner_id, event.external_uid), None)
+                self._unindex(event.id)
+            raise
+        mutation_journal.put_many('events', events)
+        return events
+    
+    def build_indexes(self) -> None:
+        """Достроить отложенный после восстановления индекс"""
+        self._start_index.ensure_built()
+    
+    def dump(self) -> Tuple[List[Event], int]:
+        """Все события и следующий ID (для снимка)"""
+        return list(self._events.values()), self._next_id
+    
+    def restore(self, events: List[Event], next_id: int) -> None:
+        """Заменить содержимое событиями из снимка; индексы строятся заново"""
+        self._events = {event.id: event for event in events}
+        self._next_id = max(next_id, max(self._events, default=0) + 1)
+        self._start_index.rebuild(events, _event_owners)
+        self._by_external_uid = {(event.owner_id, event.external_uid): event.id
+                                 for event in events if event.external_uid}
+        self._changes.reset()
+    
+    def get_by_external_uid(self, user_id: int, external_uid: str) -> Optional[Event]:
+        event_id = self._by_external_uid.get((user_id, external_uid))
+        return self._events.get(event_id) if event_id else None
+    
+    def change_mark(self, user_id: int) -> Tuple[int, Optional[datetime]]:
+        """Номер и время последнего изменения событий пользователя"""
+        return self._changes.mark(user_id)
+    
     def get_by_id(self, event_id: int) -> Optional[Event]:
         return self._events.get(event_id)
     
@@ -22,16 +104,32 @@ class EventRepository(IEventRepository):
         return [event for event in self._events.values() 
                 if event.owner_id == user_id or user_id in event.participants]
     
+    def iter_user_events_in_range(self, user_id: int, start: datetime, end: datetime) -> Iterator[Event]:
+        """События пользователя, пересекающиеся с [start, end], по времени начала"""
+        for event_id in self._start_index.overlapping(user_id, start, end):
+            event = self._events.get(event_id)
+            if event and event.end_time >= start:
+                yield event
+    
     def get_shared_events(self) -> List[Event]:
         return [event for event in self._events.values() if event.is_shared]
     
     def update(self, event: Event) -> Event:
         if event.id in self._events:
+            event.version += 1
             self._events[event.id] = event
+            self._reindex(event)
+            mutation_journal.put('events', event)
         return event
     
     def delete(self, event_id: int) -> bool:
         if event_id in self._events:
-            del self._events[event_id]
+            event = self._events.pop(event_id)
+            if event.external_uid:
+                self._by_external_uid.pop((event.owner_id, event.external_uid), None)
+            self._unindex(event_id)
+            serialization_cache.invalidate('event', event_id)
+            ical_fragments.invalidate('event', event_id)
+            mutation_journal.delete('events', event_id)
             return True
         return False
@@ -1,7 +1,8 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from src.domain.interfaces import IGroupRepository
 from src.domain.entities import Group
+from src.repositories.journal import mutation_journal
 
 class GroupRepository(IGroupRepository):
     def __init__(self):
@@ -13,8 +14,18 @@ class GroupRepository(IGroupRepository):
         group.created_at = datetime.now()
         self._groups[group.id] = group
         self._next_id += 1
+        mutation_journal.put('groups', group)
         return group
     
+    def dump(self) -> Tuple[List[Group], int]:
+        """Все группы и следующий ID (для снимка)"""
+        return list(self._groups.values()), self._next_id
+    
+    def restore(self, groups: List[Group], next_id: int) -> None:
+        """Заменить содержимое группами из снимка"""
+        self._groups = {group.id: group for group in groups}
+        self._next_id = max(next_id, max(self._groups, default=0) + 1)
+    
     def get_by_id(self, group_id: int) -> Optional[Group]:
         return self._groups.get(group_id)
     
@@ -29,10 +40,12 @@ class GroupRepository(IGroupRepository):
     def update(self, group: Group) -> Group:
         if group.id in self._groups:
             self._groups[group.id] = group
+            mutation_journal.put('groups', group)
         return group
     
     def delete(self, group_id: int) -> bool:
         if group_id in self._groups:
             del self._groups[group_id]
+            mutation_journal.delete('groups', group_id)
             return True
         return False
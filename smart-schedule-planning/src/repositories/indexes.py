@@ -0,0 +1,285 @@
+# src/repositories/indexes.py
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+import gc
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Ключ, который больше любого идентификатора сущности (для границ диапазона)
+MAX_ID = float('inf')
+
+# Размер среза, которым scan копирует раздел индекса
+_SCAN_CHUNK = 64
+
+
+@contextmanager
+def gc_paused():
+    """Отключить сборщик мусора на время массового создания объектов без циклов.
+
+    Иначе при каждом пороге аллокаций он заново обходит уже созданные объекты,
+    и загрузка миллионов записей замедляется в разы.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class SortedIndex:
+    """Отсортированный индекс сущностей, разбитый по владельцам (пользователям).
+
+    Для каждого владельца хранится отсортированный список кортежей
+    ``(*key_func(entity), entity_id)``, поэтому идентификатор всегда служит
+    стабильным разрешением равных ключей. Вставка и удаление - O(log n) на поиск
+    позиции, выборка диапазона - O(log n + k).
+    """
+
+    def __init__(self, key_func: Callable[[Any], Optional[Tuple]]):
+        # key_func возвращает кортеж ключа или None, если сущность не индексируется
+        self._key_func = key_func
+        self._partitions: Dict[int, List[Tuple]] = {}
+        self._entries: Dict[int, Tuple[Tuple, Tuple[int, ...]]] = {}
+        # Отложенная массовая загрузка (см. rebuild) и блокировка ее построения
+        self._pending: Optional[Tuple[List[Any], Callable[[Any], Iterable]]] = None
+        self._build_lock = threading.Lock()
+
+    def put(self, entity_id: int, owners: Iterable[int], entity: Any) -> None:
+        """Добавить или переиндексировать сущность"""
+        self.discard(entity_id)
+
+        key = self._key_func(entity)
+        if key is None:
+            return
+
+        entry = tuple(key) + (entity_id,)
+        owners = tuple(dict.fromkeys(owners))
+        for owner in owners:
+            insort(self._partitions.setdefault(owner, []), entry)
+        self._entries[entity_id] = (entry, owners)
+
+    def rebuild(self, entities: Iterable[Any], owners_func: Callable[[Any], Iterable]) -> None:
+        """Построить индекс заново из сущностей (с полем id) и функции их владельцев.
+
+        Построение откладывается до первого обращения к индексу: после
+        восстановления из снимка редко используемые индексы не замедляют
+        запуск. Разделы собираются целиком и сортируются один раз - это
+        быстрее поштучной вставки.
+        """
+        with self._build_lock:
+            self._partitions = {}
+            self._entries = {}
+            self._pending = (list(entities), owners_func)
+
+    def ensure_built(self) -> None:
+        """Достроить отложенный индекс сейчас (например, перед fork)"""
+        self._ensure_built()
+
+    def _ensure_built(self) -> None:
+        if self._pending is None:
+            return
+        with self._build_lock:
+            if self._pending is None:
+                return
+            entities, owners_func = self._pending
+            with gc_paused():
+                self._build(entities, owners_func)
+            self._pending = None
+
+    def _build(self, entities: List[Any], owners_func: Callable[[Any], Iterable]) -> None:
+        partitions: Dict[int, List[Tuple]] = {}
+        entries: Dict[int, Tuple[Tuple, Tuple[int, ...]]] = {}
+        key_func = self._key_func
+        for entity in entities:
+            key = key_func(entity)
+            if key is None:
+                continue
+            entity_id = entity.id
+            entry = tuple(key) + (entity_id,)
+            owners = tuple(dict.fromkeys(owners_func(entity)))
+            for owner in owners:
+                partition = partitions.get(owner)
+                if partition is None:
+                    partitions[owner] = [entry]
+                else:
+                    partition.append(entry)
+            entries[entity_id] = (entry, owners)
+        for partition in partitions.values():
+            partition.sort()
+        self._partitions = partitions
+        self._entries = entries
+
+    def discard(self, entity_id: int) -> None:
+        """Удалить сущность из индекса"""
+        self._ensure_built()
+        indexed = self._entries.pop(entity_id, None)
+        if indexed is None:
+            return
+
+        entry, owners = indexed
+        for owner in owners:
+            partition = self._partitions.get(owner)
+            if not partition:
+                continue
+            pos = bisect_left(partition, entry)
+            if pos < len(partition) and partition[pos] == entry:
+                del partition[pos]
+            if not partition:
+                del self._partitions[owner]
+
+    def key_of(self, entity_id: int) -> Optional[Tuple]:
+        """Ключ сущности в индексе (вместе с ID) или None"""
+        self._ensure_built()
+        indexed = self._entries.get(entity_id)
+        return indexed[0] if indexed else None
+
+    def owners_of(self, entity_id: int) -> Tuple[int, ...]:
+        """Владельцы, в разделах которых сейчас лежит сущность"""
+        self._ensure_built()
+        indexed = self._entries.get(entity_id)
+        return indexed[1] if indexed else ()
+
+    def count(self, owner: int) -> int:
+        self._ensure_built()
+        return len(self._partitions.get(owner, ()))
+
+    def scan(self, owner: int, after: Optional[Tuple] = None,
+             before: Optional[Tuple] = None, reverse: bool = False) -> Iterator[int]:
+        """ID сущностей владельца с ключом строго между after и before.
+
+        Границы - кортежи ключа (с ID или без него); при reverse=True обход идет
+        от больших ключей к меньшим.
+        """
+        self._ensure_built()
+        partition = self._partitions.get(owner)
+        if not partition:
+            return
+
+        lo = bisect_right(partition, after) if after is not None else 0
+        hi = bisect_left(partition, before) if before is not None else len(partition)
+
+        # Копируем раздел небольшими срезами: обход обычно прерывается рано,
+        # а копия защищает от изменений списка между yield
+        while lo < hi:
+            if reverse:
+                window = partition[max(lo, hi - _SCAN_CHUNK):hi]
+                hi -= len(window)
+                window.reverse()
+            else:
+                window = partition[lo:min(hi, lo + _SCAN_CHUNK)]
+                lo += len(window)
+            if not window:
+                return
+            for entry in window:
+                yield entry[-1]
+
+    def take(self, owner: int, limit: int, after: Optional[Tuple] = None,
+             before: Optional[Tuple] = None, reverse: bool = False) -> List[int]:
+        """Первые limit ID из диапазона без копирования всего раздела"""
+        self._ensure_built()
+        partition = self._partitions.get(owner)
+        if not partition or limit <= 0:
+            return []
+
+        lo = bisect_right(partition, after) if after is not None else 0
+        hi = bisect_left(partition, before) if before is not None else len(partition)
+        if lo >= hi:
+            return []
+
+        if reverse:
+            window = partition[max(lo, hi - limit):hi]
+            window.reverse()
+        else:
+            window = partition[lo:min(hi, lo + limit)]
+        return [entry[-1] for entry in window]
+
+
+class IntervalIndex(SortedIndex):
+    """Индекс интервалов (начало, конец) по времени начала.
+
+    Для каждого владельца хранится наибольшая длительность интервала, поэтому
+    выборка пересекающихся с [start, end] начинается со start минус эта
+    длительность, а не с начала всей истории владельца. Длительность - верхняя
+    граница: при удалении она не уменьшается, точной становится при перестроении.
+    """
+
+    def __init__(self, interval_func: Callable[[Any], Optional[Tuple[datetime, datetime]]]):
+        # interval_func возвращает (начало, конец) или None, если сущность не индексируется
+        super().__init__(self._start_key)
+        self._interval_func = interval_func
+        self._max_span: Dict[int, timedelta] = {}
+
+    def _start_key(self, entity: Any) -> Optional[Tuple]:
+        interval = self._interval_func(entity)
+        return (interval[0],) if interval else None
+
+    def _widen(self, owners: Iterable[int], entity: Any) -> None:
+        start, end = self._interval_func(entity)
+        span = max(end - start, timedelta(0))
+        for owner in owners:
+            if span > self._max_span.get(owner, timedelta(-1)):
+                self._max_span[owner] = span
+
+    def put(self, entity_id: int, owners: Iterable[int], entity: Any) -> None:
+        super().put(entity_id, owners, entity)
+        indexed = self._entries.get(entity_id)
+        if indexed is not None:
+            self._widen(indexed[1], entity)
+
+    def _build(self, entities: List[Any], owners_func: Callable[[Any], Iterable]) -> None:
+        super()._build(entities, owners_func)
+        self._max_span = {}
+        for entity in entities:
+            indexed = self._entries.get(entity.id)
+            if indexed is not None:
+                self._widen(indexed[1], entity)
+
+    def overlapping(self, owner: int, start: datetime, end: datetime) -> Iterator[int]:
+        """ID сущностей, которые могут пересекаться с [start, end], по времени начала.
+
+        Кандидаты ограничены с обеих сторон; точную проверку конца интервала
+        делает вызывающий код.
+        """
+        self._ensure_built()
+        span = self._max_span.get(owner)
+        if span is None:
+            return
+        # Для start около datetime.min (весь период) нижней границы нет
+        after = (start - span,) if start - datetime.min > span else None
+        yield from self.scan(owner, after=after, before=(end, MAX_ID))
+
+
+class ChangeTracker:
+    """Отметки последнего изменения данных по владельцам.
+
+    Отметка - (номер изменения, время). Номер растет при каждом изменении,
+    поэтому по отметке можно понять, менялись ли данные пользователя с
+    прошлого запроса (ETag, Last-Modified).
+    """
+
+    def __init__(self):
+        # Счетчик начинается с текущего времени в микросекундах: после перезапуска
+        # (и восстановления из снимка) номера не повторяют выданные раньше
+        self._counter = time.time_ns() // 1000
+        self._marks: Dict[Any, Tuple[int, datetime]] = {}
+        # Отметка владельцев, которых нет в _marks (после reset)
+        self._default: Tuple[int, Optional[datetime]] = (0, None)
+
+    def touch(self, owners: Iterable[Any]) -> None:
+        self._counter += 1
+        mark = (self._counter, datetime.now())
+        for owner in owners:
+            self._marks[owner] = mark
+
+    def reset(self) -> None:
+        """Считать измененными данные всех владельцев сразу (массовая загрузка)"""
+        self._counter += 1
+        self._default = (self._counter, datetime.now())
+        self._marks = {}
+
+    def mark(self, owner: Any) -> Tuple[int, Optional[datetime]]:
+        return self._marks.get(owner, self._default)
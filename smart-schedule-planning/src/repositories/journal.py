@@ -0,0 +1,48 @@
+# src/repositories/journal.py
+from typing import Any, Callable, Iterable, Optional
+
+# Получатель изменений: (раздел, ID сущности, сущность или None при удалении)
+JournalWriter = Callable[[str, int, Optional[Any]], None]
+
+
+class MutationJournal:
+    """Точка, через которую репозитории сообщают о своих изменениях.
+
+    Репозитории не знают, кто слушает: пока получатель не подключен (тесты,
+    скрипты, загрузка снимка), вызовы ничего не делают. Журнал предзаписи
+    подключается сюда после восстановления данных.
+    """
+
+    def __init__(self):
+        self._writer: Optional[JournalWriter] = None
+
+    @property
+    def active(self) -> bool:
+        return self._writer is not None
+
+    def attach(self, writer: JournalWriter) -> None:
+        self._writer = writer
+
+    def detach(self) -> None:
+        self._writer = None
+
+    def put(self, section: str, entity: Any) -> None:
+        """Сущность добавлена или изменена (записывается ее полное состояние)"""
+        writer = self._writer
+        if writer is not None:
+            writer(section, entity.id, entity)
+
+    def put_many(self, section: str, entities: Iterable[Any]) -> None:
+        writer = self._writer
+        if writer is not None:
+            for entity in entities:
+                writer(section, entity.id, entity)
+
+    def delete(self, section: str, entity_id: int) -> None:
+        writer = self._writer
+        if writer is not None:
+            writer(section, entity_id, None)
+
+
+# Единый журнал изменений всех репозиториев
+mutation_journal = MutationJournal()
@@ -1,39 +1,288 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 from datetime import datetime
+import threading
 from src.domain.interfaces import IMessageRepository
 from src.domain.entities import Message, MessageType
+from src.domain.message_templates import parse_legacy_text
+from src.utils.serialization import serialization_cache
+from src.utils.event_bus import notification_bus
+from src.repositories.indexes import SortedIndex
+from src.repositories.journal import mutation_journal
+
+# Раздел индекса с непрочитанными сообщениями пользователя: (ID пользователя, UNREAD)
+UNREAD = 'unread'
+
+
+def _sent_key(message: Message):
+    return (message.sent_at,)
+
+
+def _message_owners(message: Message) -> List[Any]:
+    # Разделы: все входящие, входящие по типу и непрочитанные
+    owners: List[Any] = [message.user_id, (message.user_id, message.message_type)]
+    if not message.is_read:
+        owners.append((message.user_id, UNREAD))
+    return owners
 
 class MessageRepository(IMessageRepository):
     def __init__(self):
         self._messages: Dict[int, Message] = {}
         self._next_id = 1
+        # Входящие пользователя: ID сообщений в порядке отправки
+        self._by_user: Dict[int, Dict[int, None]] = {}
+        # Сообщения, относящиеся к сущности: (тип сущности, ID) -> ID сообщений
+        self._by_related: Dict[Tuple[str, int], Set[int]] = {}
+        # Входящие по (sent_at, ID) для keyset-пагинации, с разделами по типу и прочтению
+        self._sent_index = SortedIndex(_sent_key)
+        # Число непрочитанных у пользователя (для счетчика в меню)
+        self._unread_counts: Dict[int, int] = {}
+        # Сообщения пишутся и из фоновых потоков (планировщик напоминаний)
+        self._lock = threading.RLock()
+    
+    def _index(self, message: Message) -> None:
+        self._by_user.setdefault(message.user_id, {})[message.id] = None
+        self._sent_index.put(message.id, _message_owners(message), message)
+        if not message.is_read:
+            self._unread_counts[message.user_id] = self._unread_counts.get(message.user_id, 0) + 1
+        if message.related_entity_type and message.related_entity_id is not None:
+            key = (message.related_entity_type, message.related_entity_id)
+            self._by_related.setdefault(key, set()).add(message.id)
+    
+    def _unindex(self, message: Message) -> None:
+        self._sent_index.discard(message.id)
+        if not message.is_read:
+            self._decrement_unread(message.user_id)
+        inbox = self._by_user.get(message.user_id)
+        if inbox is not None:
+            inbox.pop(message.id, None)
+            if not inbox:
+                del self._by_user[message.user_id]
+        if message.related_entity_type and message.related_entity_id is not None:
+            key = (message.related_entity_type, message.related_entity_id)
+            related = self._by_related.get(key)
+            if related is not None:
+                related.discard(message.id)
+                if not related:
+                    del self._by_related[key]
+    
+    def _decrement_unread(self, user_id: int) -> None:
+        count = self._unread_counts.get(user_id, 0) - 1
+        if count > 0:
+            self._unread_counts[user_id] = count
+        else:
+            self._unread_counts.pop(user_id, None)
     
     def add(self, message: Message) -> Message:
-        message.id = self._next_id
-        message.sent_at = datetime.now()
-        self._messages[message.id] = message
-        self._next_id += 1
+        with self._lock:
+            message.id = self._next_id
+            message.sent_at = datetime.now()
+            self._messages[message.id] = message
+            self._next_id += 1
+            self._index(message)
+            mutation_journal.put('messages', message)
+            # Публикация под той же блокировкой, что и выдача ID: подписчики
+            # получают сообщения по возрастанию ID и отсекают повторы по нему
+            notification_bus.publish(message.user_id, message)
         return message
     
+    def add_many(self, messages: List[Message]) -> List[Message]:
+        """Добавить пачку сообщений: один захват блокировки и общая метка времени"""
+        sent_at = datetime.now()
+        with self._lock:
+            first_id = self._next_id
+            added: List[Message] = []
+            try:
+                for offset, message in enumerate(messages):
+                    message.id = first_id + offset
+                    message.sent_at = sent_at
+                    self._messages[message.id] = message
+                    added.append(message)
+                    self._index(message)
+            except Exception:
+                # Пачка добавляется целиком или не добавляется совсем: повтор
+                # доставки не должен размножить уже добавленные сообщения
+                for message in added:
+                    self._messages.pop(message.id, None)
+                    self._unindex(message)
+                raise
+            self._next_id += len(messages)
+            mutation_journal.put_many('messages', messages)
+            for message in messages:
+                notification_bus.publish(message.user_id, message)
+        return messages
+    
+    def dump(self) -> Tuple[List[Message], int]:
+        """Все сообщения и следующий ID (для снимка)"""
+        with self._lock:
+            return list(self._messages.values()), self._next_id
+    
+    def restore(self, messages: List[Message], next_id: int) -> None:
+        """Заменить содержимое сообщениями из снимка; индексы строятся заново"""
+        messages = sorted(messages, key=lambda message: message.id)
+        with self._lock:
+            self._messages = {message.id: message for message in messages}
+            self._next_id = max(next_id, max(self._messages, default=0) + 1)
+            by_user: Dict[int, Dict[int, None]] = {}
+            by_related: Dict[Tuple[str, int], Set[int]] = {}
+            unread_counts: Dict[int, int] = {}
+            for message in messages:
+                user_id = message.user_id
+                inbox = by_user.get(user_id)
+                if inbox is None:
+                    inbox = by_user[user_id] = {}
+                inbox[message.id] = None
+                if not message.is_read:
+                    unread_counts[user_id] = unread_counts.get(user_id, 0) + 1
+                if message.related_entity_type and message.related_entity_id is not None:
+                    key = (message.related_entity_type, message.related_entity_id)
+                    related = by_related.get(key)
+                    if related is None:
+                        by_related[key] = {message.id}
+                    else:
+                        related.add(message.id)
+            self._by_user = by_user
+            self._by_related = by_related
+            self._unread_counts = unread_counts
+            self._sent_index.rebuild(messages, _message_owners)
+    
     def get_by_id(self, message_id: int) -> Optional[Message]:
         return self._messages.get(message_id)
     
     def get_user_messages(self, user_id: int) -> List[Message]:
-        return [message for message in self._messages.values() 
-                if message.user_id == user_id]
+        with self._lock:
+            return [self._messages[message_id] for message_id in self._by_user.get(user_id, ())]
+    
+    def get_user_messages_after(self, user_id: int, after_id: int,
+                                limit: Optional[int] = None) -> List[Message]:
+        """Сообщения пользователя с ID больше after_id, по возрастанию ID.
+        
+        ID во входящих идут по возрастанию, поэтому обход идет с конца и
+        останавливается на первом старом сообщении. С limit - только последние.
+        """
+        result = []
+        with self._lock:
+            for message_id in reversed(self._by_user.get(user_id, {})):
+                if message_id <= after_id or (limit is not None and len(result) == limit):
+                    break
+                result.append(self._messages[message_id])
+        result.reverse()
+        return result
+    
+    def get_user_messages_page(self, user_id: int, limit: int = 20, before: Optional[Tuple] = None,
+                               message_type: Optional[MessageType] = None,
+                               unread_only: bool = False) -> Tuple[List[Message], Optional[Tuple]]:
+        """Страница входящих от новых к старым по keyset-курсору (sent_at, ID).
+        
+        before - ключ последнего сообщения предыдущей страницы. Фильтры читают
+        свой раздел индекса, а не все входящие. Возвращает сообщения и ключ
+        последнего из них, если дальше есть еще сообщения (иначе None).
+        """
+        if unread_only:
+            owner = (user_id, UNREAD)
+        elif message_type:
+            owner = (user_id, message_type)
+        else:
+            owner = user_id
+        
+        page = []
+        with self._lock:
+            for message_id in self._sent_index.scan(owner, before=before, reverse=True):
+                message = self._messages[message_id]
+                if message_type and message.message_type != message_type:
+                    continue
+                if len(page) == limit:
+                    return page, self._sent_index.key_of(page[-1].id)
+                page.append(message)
+        return page, None
     
     def get_unread_messages(self, user_id: int) -> List[Message]:
-        return [message for message in self._messages.values() 
-                if message.user_id == user_id and not message.is_read]
+        with self._lock:
+            return [self._messages[message_id]
+                    for message_id in self._sent_index.scan((user_id, UNREAD))]
+    
+    def count_unread(self, user_id: int) -> int:
+        return self._unread_counts.get(user_id, 0)
+    
+    def mark_all_as_read(self, user_id: int) -> int:
+        """Пометить прочитанными все входящие пользователя; возвращает их число"""
+        with self._lock:
+            message_ids = list(self._sent_index.scan((user_id, UNREAD)))
+            for message_id in message_ids:
+                self.mark_as_read(message_id)
+            return len(message_ids)
     
     def mark_as_read(self, message_id: int) -> bool:
-        if message_id in self._messages:
-            self._messages[message_id].is_read = True
-            return True
-        return False
+        with self._lock:
+            if message_id in self._messages:
+                message = self._messages[message_id]
+                if not message.is_read:
+                    message.is_read = True
+                    message.version += 1
+                    self._sent_index.put(message.id, _message_owners(message), message)
+                    self._decrement_unread(message.user_id)
+                    mutation_journal.put('messages', message)
+                return True
+            return False
+    
+    def mark_related_as_read(self, entity_type: str, entity_id: int,
+                             message_type: Optional[MessageType] = None) -> int:
+        """Пометить прочитанными сообщения о сущности; возвращает их число"""
+        with self._lock:
+            count = 0
+            for message_id in list(self._by_related.get((entity_type, entity_id), ())):
+                message = self._messages[message_id]
+                if message_type and message.message_type != message_type:
+                    continue
+                if not message.is_read:
+                    self.mark_as_read(message_id)
+                    count += 1
+            return count
+    
+    def get_all(self) -> List[Message]:
+        with self._lock:
+            return list(self._messages.values())
+    
+    def remove_many(self, message_ids: List[int]) -> int:
+        """Удалить пачку сообщений (например, перенесенных в архив)"""
+        removed = 0
+        with self._lock:
+            for message_id in message_ids:
+                message = self._messages.pop(message_id, None)
+                if message is None:
+                    continue
+                self._unindex(message)
+                serialization_cache.invalidate('message', message_id)
+                mutation_journal.delete('messages', message_id)
+                removed += 1
+        return removed
+    
+    def migrate_legacy_text(self) -> int:
+        """Перевести сообщения с готовым текстом ('raw') на шаблоны.
+        
+        Нужна для сообщений, записанных до перехода на шаблоны; возвращает
+        число переведенных сообщений.
+        """
+        migrated = 0
+        with self._lock:
+            for message in self._messages.values():
+                if message.template_id != 'raw' or not message.template_params:
+                    continue
+                template_id, params = parse_legacy_text(str(message.template_params[0]))
+                if template_id == 'raw':
+                    continue
+                message.template_id = template_id
+                message.template_params = params
+                message.version += 1
+                mutation_journal.put('messages', message)
+                migrated += 1
+        return migrated
     
     def delete(self, message_id: int) -> bool:
-        if message_id in self._messages:
-            del self._messages[message_id]
-            return True
-        return False
+        with self._lock:
+            if message_id in self._messages:
+                message = self._messages.pop(message_id)
+                self._unindex(message)
+                serialization_cache.invalidate('message', message_id)
+                mutation_journal.delete('messages', message_id)
+                return True
+            return False
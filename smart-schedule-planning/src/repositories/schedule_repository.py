@@ -1,7 +1,8 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from src.domain.interfaces import IScheduleRepository
 from src.domain.entities import Schedule
+from src.repositories.journal import mutation_journal
 
 class ScheduleRepository(IScheduleRepository):
     def __init__(self):
@@ -13,8 +14,18 @@ class ScheduleRepository(IScheduleRepository):
         schedule.created_at = datetime.now()
         self._schedules[schedule.id] = schedule
         self._next_id += 1
+        mutation_journal.put('schedules', schedule)
         return schedule
     
+    def dump(self) -> Tuple[List[Schedule], int]:
+        """Все расписания и следующий ID (для снимка)"""
+        return list(self._schedules.values()), self._next_id
+    
+    def restore(self, schedules: List[Schedule], next_id: int) -> None:
+        """Заменить содержимое расписаниями из снимка"""
+        self._schedules = {schedule.id: schedule for schedule in schedules}
+        self._next_id = max(next_id, max(self._schedules, default=0) + 1)
+    
     def get_by_id(self, schedule_id: int) -> Optional[Schedule]:
         return self._schedules.get(schedule_id)
     
@@ -31,10 +42,12 @@ class ScheduleRepository(IScheduleRepository):
     def update(self, schedule: Schedule) -> Schedule:
         if schedule.id in self._schedules:
             self._schedules[schedule.id] = schedule
+            mutation_journal.put('schedules', schedule)
         return schedule
     
     def delete(self, schedule_id: int) -> bool:
         if schedule_id in self._schedules:
             del self._schedules[schedule_id]
+            mutation_journal.delete('schedules', schedule_id)
             return True
         return False
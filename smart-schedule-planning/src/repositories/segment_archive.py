@@ -0,0 +1,192 @@
+# src/repositories/segment_archive.py
+import gzip
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+
+def _has_owner(value: Any, owner: int) -> bool:
+    # Поле владельца - один ID или список ID (у задачи их несколько)
+    return owner in value if isinstance(value, list) else value == owner
+
+
+@dataclass
+class SegmentInfo:
+    seq: int
+    path: str
+    count: int
+    owners: Set[int] = field(default_factory=set)
+    min_key: Optional[str] = None
+    max_key: Optional[str] = None
+    # Общий интервал времени записей (начало самого раннего, конец самого позднего)
+    span: Optional[Tuple[str, str]] = None
+
+
+class SegmentArchive:
+    """Append-only архив на диске из сжатых сегментов JSON Lines.
+
+    Каждый сегмент пишется один раз (во временный файл с атомарным
+    переименованием) и больше не меняется. Рядом лежит маленький файл
+    метаданных: владельцы записей, диапазон ключей и, если задан, общий
+    интервал времени записей, чтобы чтение пропускало сегменты без нужных
+    записей, не распаковывая их.
+    """
+
+    def __init__(self, directory: str, prefix: str):
+        self._directory = directory
+        self._prefix = prefix
+        self._segments: List[SegmentInfo] = []
+        self._lock = threading.Lock()
+        self._pattern = re.compile(rf'^{re.escape(prefix)}-(\d+)\.jsonl\.gz$')
+        self._load_manifest()
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self._directory, f'{self._prefix}-{seq:08d}.jsonl.gz')
+
+    def _load_manifest(self) -> None:
+        if not os.path.isdir(self._directory):
+            return
+
+        for name in sorted(os.listdir(self._directory)):
+            match = self._pattern.match(name)
+            if not match:
+                continue
+            path = os.path.join(self._directory, name)
+            meta_path = path + '.meta.json'
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                # Сегмент без метаданных (сбой при записи) - пропускаем
+                continue
+            self._segments.append(SegmentInfo(
+                seq=int(match.group(1)),
+                path=path,
+                count=meta['count'],
+                owners=set(meta['owners']),
+                min_key=meta.get('min_key'),
+                max_key=meta.get('max_key'),
+                span=tuple(meta['span']) if meta.get('span') else None,
+            ))
+        self._segments.sort(key=lambda info: info.seq)
+
+    def append_segment(self, records: List[Dict[str, Any]], owner_field: str, key_field: str,
+                       span_fields: Optional[Tuple[str, str]] = None) -> Optional[SegmentInfo]:
+        """Записать новый сегмент; записи сохраняются в переданном порядке.
+
+        span_fields - поля начала и конца интервала записи (ISO-строки): по ним
+        в метаданные пишется общий интервал сегмента для выборки по времени.
+        """
+        if not records:
+            return None
+
+        os.makedirs(self._directory, exist_ok=True)
+        with self._lock:
+            seq = self._segments[-1].seq + 1 if self._segments else 1
+            path = self._segment_path(seq)
+            # Резервируем номер, чтобы параллельная запись его не заняла
+            info = SegmentInfo(seq=seq, path=path, count=len(records))
+            self._segments.append(info)
+
+        try:
+            tmp_path = path + '.tmp'
+            with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+                    f.write('\n')
+                    owners = record[owner_field]
+                    if isinstance(owners, list):
+                        info.owners.update(owners)
+                    else:
+                        info.owners.add(owners)
+
+            keys = [str(record[key_field]) for record in records]
+            info.min_key = min(keys)
+            info.max_key = max(keys)
+            if span_fields:
+                starts = [record[span_fields[0]] for record in records if record[span_fields[0]]]
+                ends = [record[span_fields[1]] for record in records if record[span_fields[1]]]
+                if starts and ends:
+                    info.span = (min(starts), max(ends))
+            with open(path + '.meta.json.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'count': info.count, 'owners': sorted(info.owners),
+                           'min_key': info.min_key, 'max_key': info.max_key,
+                           'span': list(info.span) if info.span else None}, f)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp_path, path)
+            os.replace(path + '.meta.json.tmp', path + '.meta.json')
+        except Exception:
+            with self._lock:
+                self._segments.remove(info)
+            raise
+        return info
+
+    def segments(self, owner: Optional[int] = None, newest_first: bool = False,
+                 start: Optional[str] = None, end: Optional[str] = None) -> List[SegmentInfo]:
+        """Записанные сегменты владельца; с start/end - только те, чей интервал
+        времени пересекается с [start, end] (сегменты без интервала не отбрасываются)"""
+        with self._lock:
+            result = [info for info in self._segments
+                      if info.min_key is not None and (owner is None or owner in info.owners)
+                      and not (info.span and ((end is not None and info.span[0] > end)
+                                              or (start is not None and info.span[1] < start)))]
+        if newest_first:
+            result.reverse()
+        return result
+
+    def read_segment(self, info: SegmentInfo) -> List[Dict[str, Any]]:
+        with gzip.open(info.path, 'rt', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def iter_records(self, owner: Optional[int] = None, owner_field: Optional[str] = None,
+                     newest_first: bool = False) -> Iterator[Dict[str, Any]]:
+        """Обход записей архива с потоковой распаковкой сегментов"""
+        for info in self.segments(owner, newest_first):
+            if newest_first:
+                records = self.read_segment(info)
+                records.reverse()
+            else:
+                records = self.stream_segment(info)
+            for record in records:
+                if owner is None or _has_owner(record[owner_field], owner):
+                    yield record
+
+    def stream_segment(self, info: SegmentInfo) -> Iterator[Dict[str, Any]]:
+        with gzip.open(info.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def page(self, owner: int, owner_field: str, cursor: Optional[Tuple[int, int]],
+             limit: int) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
+        """Страница записей владельца от новых к старым.
+
+        Курсор - (номер сегмента, позиция в нем), с которого продолжать чтение.
+        """
+        result: List[Dict[str, Any]] = []
+        for info in self.segments(owner, newest_first=True):
+            if cursor and info.seq > cursor[0]:
+                continue
+
+            records = self.read_segment(info)
+            start = len(records) - 1
+            if cursor and info.seq == cursor[0]:
+                start = cursor[1]
+
+            for position in range(start, -1, -1):
+                record = records[position]
+                if not _has_owner(record[owner_field], owner):
+                    continue
+                if len(result) == limit:
+                    return result, (info.seq, position)
+                result.append(record)
+        return result, None
+
+    def total_count(self) -> int:
+        with self._lock:
+            return sum(info.count for info in self._segments)
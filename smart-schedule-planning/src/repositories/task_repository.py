@@ -1,12 +1,87 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Iterable, Iterator
 from datetime import datetime
 from src.domain.interfaces import ITaskRepository
 from src.domain.entities import Task, TaskPriority, TaskStatus
+from src.repositories.indexes import ChangeTracker, IntervalIndex, SortedIndex, MAX_ID
+from src.repositories.journal import mutation_journal
+from src.utils.ical import ical_fragments
+from src.utils.serialization import serialization_cache
+
+
+def _deadline_key(task: Task):
+    # Задачи без дедлайна идут в конце индекса
+    if task.deadline:
+        return (0, task.deadline)
+    return (1, datetime.max)
+
+
+def _created_key(task: Task):
+    return (task.created_at,)
+
+
+# Ранг приоритета: сначала самые важные задачи
+_PRIORITY_RANK = {TaskPriority.HIGH: 0, TaskPriority.MEDIUM: 1, TaskPriority.LOW: 2}
+
+
+def _priority_key(task: Task):
+    return (_PRIORITY_RANK.get(task.priority, 1),)
+
+
+def _interval(task: Task):
+    # В календарь попадают только задачи с заданным интервалом времени
+    if task.start_time and task.end_time:
+        return (task.start_time, task.end_time)
+    return None
+
+
+def _task_owners(task: Task) -> List[int]:
+    return [task.creator_id] + list(task.assigned_users)
+
+
+def _sort_owners(task: Task) -> List[Any]:
+    # Разделы индексов сортировки: все задачи пользователя и его задачи по
+    # статусу (ID пользователя, статус) - фильтр страницы читает только свой раздел
+    owners: List[Any] = _task_owners(task)
+    return owners + [(owner, task.status) for owner in owners]
+
+
+def _user_owners(owners: Iterable[Any]) -> Tuple[int, ...]:
+    return tuple(owner for owner in owners if not isinstance(owner, tuple))
+
 
 class TaskRepository(ITaskRepository):
     def __init__(self):
         self._tasks: Dict[int, Task] = {}
         self._next_id = 1
+        # Индексы задач пользователя по полям сортировки (ID - разрешение равных ключей)
+        self._deadline_index = SortedIndex(_deadline_key)
+        self._sort_indexes: Dict[str, SortedIndex] = {
+            'deadline': self._deadline_index,
+            'created_at': SortedIndex(_created_key),
+            'priority': SortedIndex(_priority_key),
+        }
+        # Задачи пользователя по времени начала (календарь, экспорт)
+        self._start_index = IntervalIndex(_interval)
+        # Импортированные задачи: (создатель, внешний UID) -> ID задачи
+        self._by_external_uid: Dict[Tuple[int, str], int] = {}
+        # Отметки изменений задач пользователя (подписка на календарь)
+        self._changes = ChangeTracker()
+    
+    def _reindex(self, task: Task) -> None:
+        owners = _task_owners(task)
+        # Прежние владельцы тоже видят изменение: задача могла у них пропасть
+        previous = _user_owners(self._sort_indexes['created_at'].owners_of(task.id))
+        self._changes.touch(previous + tuple(owners))
+        sort_owners = _sort_owners(task)
+        for index in self._sort_indexes.values():
+            index.put(task.id, sort_owners, task)
+        self._start_index.put(task.id, owners, task)
+    
+    def _unindex(self, task_id: int) -> None:
+        self._changes.touch(_user_owners(self._sort_indexes['created_at'].owners_of(task_id)))
+        for index in self._sort_indexes.values():
+            index.discard(task_id)
+        self._start_index.discard(task_id)
     
     def add(self, task: Task) -> Task:
         task.id = self._next_id
@@ -14,15 +89,138 @@ class TaskRepository(ITaskRepository):
         task.updated_at = datetime.now()
         self._tasks[task.id] = task
         self._next_id += 1
+        self._reindex(task)
+        if task.external_uid:
+            self._by_external_uid[(task.creator_id, task.external_uid)] = task.id
+        mutation_journal.put('tasks', task)
         return task
     
+    def add_many(self, tasks: List[Task]) -> List[Task]:
+        """Добавить пачку задач (импорт) с общей меткой времени"""
+        now = datetime.now()
+        added: List[Task] = []
+        try:
+            for task in tasks:
+                task.id = self._next_id
+                task.created_at = now
+                task.updated_at = now
+                self._tasks[task.id] = task
+                self._next_id += 1
+                added.append(task)
+                self._reindex(task)
+                if task.external_uid:
+                    self._by_external_uid[(task.creator_id, task.external_uid)] = task.id
+        except Exception:
+            # Пачка добавляется целиком или не добавляется совсем
+            for task in added:
+                self._tasks.pop(task.id, None)
+                if task.external_uid:
+                    self._by_external_uid.pop((task.creator_id, task.external_uid), None)
+                self._unindex(task.id)
+            raise
+        mutation_journal.put_many('tasks', tasks)
+        return tasks
+    
+    def build_indexes(self) -> None:
+        """Достроить все отложенные после восстановления индексы"""
+        for index in (self._deadline_index, self._start_index, *self._sort_indexes.values()):
+            index.ensure_built()
+    
+    def dump(self) -> Tuple[List[Task], int]:
+        """Все задачи и следующий ID (для снимка)"""
+        return list(self._tasks.values()), self._next_id
+    
+    def restore(self, tasks: List[Task], next_id: int) -> None:
+        """Заменить содержимое задачами из снимка; индексы строятся заново"""
+        self._tasks = {task.id: task for task in tasks}
+        self._next_id = max(next_id, max(self._tasks, default=0) + 1)
+        for index in self._sort_indexes.values():
+            index.rebuild(tasks, _sort_owners)
+        self._start_index.rebuild(tasks, _task_owners)
+        self._by_external_uid = {(task.creator_id, task.external_uid): task.id
+                                 for task in tasks if task.external_uid}
+        self._changes.reset()
+    
+    def get_by_external_uid(self, user_id: int, external_uid: str) -> Optional[Task]:
+        task_id = self._by_external_uid.get((user_id, external_uid))
+        return self._tasks.get(task_id) if task_id else None
+    
+    def change_mark(self, user_id: int) -> Tuple[int, Optional[datetime]]:
+        """Номер и время последнего изменения задач пользователя"""
+        return self._changes.mark(user_id)
+    
     def get_by_id(self, task_id: int) -> Optional[Task]:
         return self._tasks.get(task_id)
     
+    def get_many(self, task_ids: Iterable[int]) -> Dict[int, Task]:
+        """Задачи по списку ID за один проход (отсутствующие пропускаются)"""
+        tasks = self._tasks
+        return {task_id: tasks[task_id] for task_id in set(task_ids) if task_id in tasks}
+    
+    def get_all(self) -> List[Task]:
+        return list(self._tasks.values())
+    
     def get_user_tasks(self, user_id: int) -> List[Task]:
         return [task for task in self._tasks.values() 
                 if task.creator_id == user_id or user_id in task.assigned_users]
     
+    def get_upcoming(self, user_id: int, until: datetime, limit: int) -> List[Task]:
+        """Ближайшие по дедлайну задачи пользователя с дедлайном не позже until"""
+        task_ids = self._deadline_index.take(user_id, limit, before=(0, until, MAX_ID))
+        return [self._tasks[task_id] for task_id in task_ids]
+    
+    def get_deadlines_between(self, user_id: int, start: datetime, end: datetime) -> List[Task]:
+        """Задачи пользователя с дедлайном в [start, end] по возрастанию дедлайна"""
+        task_ids = self._deadline_index.scan(user_id, after=(0, start), before=(0, end, MAX_ID))
+        return [self._tasks[task_id] for task_id in task_ids]
+    
+    def iter_user_tasks(self, user_id: int) -> Iterator[Task]:
+        """Все задачи пользователя в порядке создания (генератор по индексу)"""
+        for task_id in self._sort_indexes['created_at'].scan(user_id):
+            task = self._tasks.get(task_id)
+            if task:
+                yield task
+    
+    def iter_user_tasks_in_range(self, user_id: int, start: datetime, end: datetime) -> Iterator[Task]:
+        """Задачи пользователя, пересекающиеся с [start, end], по времени начала.
+        
+        Генератор: обход индекса по времени начала от start минус самая длинная
+        задача пользователя до end, без выборки всех задач и всей истории.
+        """
+        for task_id in self._start_index.overlapping(user_id, start, end):
+            task = self._tasks.get(task_id)
+            if task and task.end_time >= start:
+                yield task
+    
+    def get_user_tasks_page(self, user_id: int, sort: str = 'deadline', limit: int = 20,
+                            after: Optional[Tuple] = None, descending: bool = False,
+                            status: Optional[TaskStatus] = None) -> Tuple[List[Task], Optional[Tuple]]:
+        """Страница задач пользователя по keyset-курсору.
+        
+        after - ключ последней задачи предыдущей страницы. Фильтр по статусу
+        читает раздел (пользователь, статус), а не все задачи пользователя.
+        Возвращает задачи и ключ последней из них, если дальше есть еще задачи
+        (иначе None).
+        """
+        index = self._sort_indexes.get(sort)
+        if index is None:
+            raise ValueError(f"Неизвестная сортировка: {sort}")
+        
+        owner = (user_id, status) if status else user_id
+        if descending:
+            task_ids = index.scan(owner, before=after, reverse=True)
+        else:
+            task_ids = index.scan(owner, after=after)
+        
+        page = []
+        for task_id in task_ids:
+            task = self._tasks[task_id]
+            if len(page) == limit:
+                return page, index.key_of(page[-1].id)
+            page.append(task)
+        
+        return page, None
+    
     def get_schedule_tasks(self, schedule_id: int) -> List[Task]:
         return [task for task in self._tasks.values() 
                 if task.schedule_id == schedule_id]
@@ -40,11 +238,28 @@ class TaskRepository(ITaskRepository):
     def update(self, task: Task) -> Task:
         if task.id in self._tasks:
             task.updated_at = datetime.now()
+            task.version += 1
             self._tasks[task.id] = task
+            self._reindex(task)
+            mutation_journal.put('tasks', task)
         return task
     
+    def remove_many(self, task_ids: List[int]) -> int:
+        """Удалить пачку задач (например, перенесенных в архив)"""
+        removed = 0
+        for task_id in task_ids:
+            if self.delete(task_id):
+                removed += 1
+        return removed
+    
     def delete(self, task_id: int) -> bool:
         if task_id in self._tasks:
-            del self._tasks[task_id]
+            task = self._tasks.pop(task_id)
+            if task.external_uid:
+                self._by_external_uid.pop((task.creator_id, task.external_uid), None)
+            self._unindex(task_id)
+            serialization_cache.invalidate('task', task_id)
+            ical_fragments.invalidate('task', task_id)
+            mutation_journal.delete('tasks', task_id)
             return True
         return False
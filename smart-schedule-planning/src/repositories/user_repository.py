@@ -1,14 +1,24 @@
 # src/repositories/user_repository.py
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from src.domain.interfaces import IUserRepository
 from src.domain.entities import User, UserRole
+from src.repositories.journal import mutation_journal
 from src.utils.validators import validate_email, validate_password
 
 class UserRepository(IUserRepository):
     def __init__(self):
         self._users: Dict[int, User] = {}
         self._next_id = 1
+        # Токен подписки на календарь -> ID пользователя
+        self._by_feed_token: Dict[str, int] = {}
+    
+    def _index_feed_token(self, user: User) -> None:
+        for token, user_id in list(self._by_feed_token.items()):
+            if user_id == user.id and token != user.feed_token:
+                del self._by_feed_token[token]
+        if user.feed_token:
+            self._by_feed_token[user.feed_token] = user.id
     
     def add(self, user: User) -> User:
         user.id = self._next_id
@@ -16,8 +26,20 @@ class UserRepository(IUserRepository):
         user.updated_at = datetime.now()
         self._users[user.id] = user
         self._next_id += 1
+        self._index_feed_token(user)
+        mutation_journal.put('users', user)
         return user
     
+    def dump(self) -> Tuple[List[User], int]:
+        """Все пользователи и следующий ID (для снимка)"""
+        return list(self._users.values()), self._next_id
+    
+    def restore(self, users: List[User], next_id: int) -> None:
+        """Заменить содержимое пользователями из снимка"""
+        self._users = {user.id: user for user in users}
+        self._next_id = max(next_id, max(self._users, default=0) + 1)
+        self._by_feed_token = {user.feed_token: user.id for user in users if user.feed_token}
+    
     def get_by_id(self, user_id: int) -> Optional[User]:
         return self._users.get(user_id)
     
@@ -27,6 +49,10 @@ class UserRepository(IUserRepository):
                 return user
         return None
     
+    def get_by_feed_token(self, token: str) -> Optional[User]:
+        user_id = self._by_feed_token.get(token)
+        return self._users.get(user_id) if user_id else None
+    
     def get_all(self) -> List[User]:
         return list(self._users.values())
     
@@ -34,10 +60,14 @@ class UserRepository(IUserRepository):
         if user.id in self._users:
             user.updated_at = datetime.now()
             self._users[user.id] = user
+            self._index_feed_token(user)
+            mutation_journal.put('users', user)
         return user
     
     def delete(self, user_id: int) -> bool:
         if user_id in self._users:
-            del self._users[user_id]
+            user = self._users.pop(user_id)
+            self._by_feed_token.pop(user.feed_token, None)
+            mutation_journal.delete('users', user_id)
             return True
         return False
\ No newline at end of file
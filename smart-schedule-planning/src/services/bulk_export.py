@@ -0,0 +1,234 @@
+# src/services/bulk_export.py
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from src.repositories import event_repository, task_repository, user_repository
+from src.services.integration_service import IntegrationService
+
+# Число процессов массовой выгрузки по умолчанию
+BULK_EXPORT_WORKERS = int(os.environ.get('BULK_EXPORT_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Каталог архивов массовой выгрузки
+BULK_EXPORT_DIR = os.environ.get('BULK_EXPORT_DIR', os.path.join('data', 'exports'))
+# Буфер копирования при слиянии частей архива
+COPY_BUFFER = 64 * 1024
+
+
+@dataclass
+class WorkerStats:
+    worker: int
+    pid: int
+    users: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def users_per_second(self) -> float:
+        return self.users / self.seconds if self.seconds else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes / self.seconds / (1024 * 1024) if self.seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['users_per_second'] = round(self.users_per_second, 1)
+        data['megabytes_per_second'] = round(self.megabytes_per_second, 2)
+        return data
+
+
+@dataclass
+class BulkExportReport:
+    path: str
+    started_at: datetime
+    workers: List[WorkerStats] = field(default_factory=list)
+    seconds: float = 0.0
+    merge_seconds: float = 0.0
+
+    @property
+    def users(self) -> int:
+        return sum(stats.users for stats in self.workers)
+
+    @property
+    def bytes(self) -> int:
+        return sum(stats.bytes for stats in self.workers)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'started_at': self.started_at.isoformat(),
+            'users': self.users,
+            'bytes': self.bytes,
+            'seconds': round(self.seconds, 3),
+            'merge_seconds': round(self.merge_seconds, 3),
+            'workers': [stats.to_dict() for stats in self.workers]
+        }
+
+
+def _export_shard(worker: int, user_ids: List[int], path: str,
+                  start_date: datetime, end_date: datetime) -> WorkerStats:
+    """Календари части пользователей в отдельный zip (выполняется в дочернем процессе).
+
+    Части пишутся без сжатия: сжимает одно итоговое слияние, и данные
+    не приходится распаковывать и сжимать повторно.
+    """
+    integration = IntegrationService()
+    stats = WorkerStats(worker=worker, pid=os.getpid())
+    started = time.perf_counter()
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as archive:
+        for user_id in user_ids:
+            try:
+                # Кэш VEVENT общий для потоков родителя - в копии процесса его не трогаем
+                chunks = integration.iter_ical(user_id, start_date, end_date, cache=False)
+                with archive.open(f'calendars/user_{user_id}.ics', 'w', force_zip64=True) as member:
+                    for chunk in chunks:
+                        data = chunk.encode('utf-8')
+                        member.write(data)
+                        stats.bytes += len(data)
+                stats.users += 1
+            except Exception as e:
+                stats.errors.append({'user_id': user_id, 'error': str(e)})
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def _fork_context() -> Optional[multiprocessing.context.BaseContext]:
+    # Данные живут в памяти процесса приложения: дочерние процессы получают
+    # их только через fork (копирование при записи).
+    #
+    # fork копирует только вызывающий поток, а журнал, планировщики, доставка
+    # и потоки SSE продолжают работать. Дочерний процесс поэтому не должен
+    # брать блокировки, которые эти потоки могли держать в момент fork:
+    # - кэш VEVENT обходится (iter_ical с cache=False);
+    # - отложенные индексы задач и событий достраиваются в родителе до fork
+    #   (_prepare_fork), и в копии _build_lock уже не нужен;
+    # - выгрузка только читает данные, поэтому журнал изменений в копии не пишется;
+    # - блокировка списка сегментов архива задач держится лишь на время
+    #   изменения списка; выгрузка и перенос в архив одновременно - допущение.
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def _prepare_fork() -> None:
+    # Индексы строятся под _build_lock: если построение идет в момент fork,
+    # копия процесса навсегда ждет блокировку, а иначе каждый процесс строил
+    # бы индексы заново
+    task_repository.build_indexes()
+    event_repository.build_indexes()
+
+
+class BulkExportService:
+    """Массовая выгрузка календарей всех пользователей в один zip-архив.
+
+    Пользователи делятся на части по числу процессов; каждый процесс пишет
+    свои календари потоково в отдельный архив, затем части по одному члену
+    копируются в итоговый архив - память не зависит от объема выгрузки.
+    Где fork недоступен, выгрузка идет в текущем процессе одной частью.
+    """
+
+    def __init__(self, workers: int = BULK_EXPORT_WORKERS, directory: str = BULK_EXPORT_DIR):
+        self.workers = max(1, workers)
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.last_report: Optional[BulkExportReport] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def run(self, start_date: datetime = datetime.min, end_date: datetime = datetime.max,
+            workers: Optional[int] = None) -> BulkExportReport:
+        """Выгрузить всех пользователей; возвращает отчет с пропускной способностью процессов"""
+        started_at = datetime.now()
+        started = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'bulk_export_{started_at.strftime("%Y%m%d_%H%M%S")}.zip')
+
+        user_ids = sorted(user.id for user in user_repository.get_all())
+        context = _fork_context()
+        workers = max(1, min(workers or self.workers, len(user_ids) or 1))
+        if context is None:
+            workers = 1
+        # Чередование ID выравнивает части, если старые пользователи "тяжелее" новых
+        shards = [user_ids[index::workers] for index in range(workers)]
+
+        shard_dir = tempfile.mkdtemp(prefix='bulk-export-', dir=self.directory)
+        shard_paths = [os.path.join(shard_dir, f'shard_{index}.zip') for index in range(workers)]
+        try:
+            if workers == 1:
+                stats = [_export_shard(0, shards[0], shard_paths[0], start_date, end_date)]
+            else:
+                _prepare_fork()
+                with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                    futures = [pool.submit(_export_shard, index, shards[index], shard_paths[index],
+                                           start_date, end_date)
+                               for index in range(workers)]
+                    stats = [future.result() for future in futures]
+
+            report = BulkExportReport(path=path, started_at=started_at, workers=stats)
+            merge_started = time.perf_counter()
+            self._merge(shard_paths, path, report)
+            report.merge_seconds = time.perf_counter() - merge_started
+        finally:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def _merge(self, shard_paths: List[str], path: str, report: BulkExportReport) -> None:
+        """Слить части в итоговый архив, копируя члены буфером фиксированного размера"""
+        partial = path + '.part'
+        with zipfile.ZipFile(partial, 'w', zipfile.ZIP_DEFLATED) as output:
+            for shard_path in shard_paths:
+                with zipfile.ZipFile(shard_path) as shard:
+                    for info in shard.infolist():
+                        with shard.open(info) as source, \
+                                output.open(info.filename, 'w', force_zip64=True) as target:
+                            shutil.copyfileobj(source, target, COPY_BUFFER)
+            manifest = report.to_dict()
+            manifest['path'] = os.path.basename(path)
+            output.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+        os.replace(partial, path)
+
+    def start(self, start_date: datetime = datetime.min, end_date: datetime = datetime.max,
+              workers: Optional[int] = None) -> bool:
+        """Запустить выгрузку в фоне; False, если предыдущая еще не закончилась"""
+        with self._lock:
+            if self.running:
+                return False
+            self.last_error = None
+            self._thread = threading.Thread(target=self._run_background, args=(start_date, end_date, workers),
+                                            name='bulk-export', daemon=True)
+            self._thread.start()
+            return True
+
+    def _run_background(self, start_date: datetime, end_date: datetime, workers: Optional[int]) -> None:
+        try:
+            self.last_report = self.run(start_date, end_date, workers)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Ошибка массовой выгрузки: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'error': self.last_error,
+            'report': self.last_report.to_dict() if self.last_report else None
+        }
+
+
+# Единый сервис массовой выгрузки
+bulk_export_service = BulkExportService()
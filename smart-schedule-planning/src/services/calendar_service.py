@@ -1,8 +1,9 @@
 # src/services/calendar_service.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta, date
 from calendar import monthrange
 from src.repositories import task_repository, event_repository, user_repository
+from src.utils.serialization import serialize
 
 class CalendarService:
     def __init__(self):
@@ -82,8 +83,9 @@ class CalendarService:
             'today': date.today().isoformat()
         }
     
-    def get_day_view(self, user_id: int, date_obj: datetime) -> Dict[str, Any]:
-        """Данные для просмотра дня"""
+    def get_day_view(self, user_id: int, date_obj: datetime,
+                     fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        """Данные для просмотра дня (fields - проекция полей задач и событий)"""
         tasks = task_repository.get_user_tasks(user_id)
         events = event_repository.get_user_events(user_id)
         
@@ -92,11 +94,11 @@ class CalendarService:
         
         for task in tasks:
             if task.start_time and task.start_time.date() == date_obj.date():
-                day_tasks.append(task.to_dict())
+                day_tasks.append(serialize(task, fields))
         
         for event in events:
             if event.start_time.date() == date_obj.date():
-                day_events.append(event.to_dict())
+                day_events.append(serialize(event, fields))
         
         return {
             'date': date_obj.isoformat(),
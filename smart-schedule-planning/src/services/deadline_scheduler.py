@@ -0,0 +1,202 @@
+# src/services/deadline_scheduler.py
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.domain.entities import Task, TaskStatus
+from src.services.delivery_pipeline import DeliveryQueueFull
+
+# Пороги напоминаний: (вид напоминания, часов до дедлайна)
+REMINDER_THRESHOLDS: Tuple[Tuple[str, int], ...] = (('deadline', 24), ('urgent', 1))
+
+# Максимальное время сна фонового потока (защита от перевода часов)
+MAX_SLEEP_SECONDS = 60
+# Через сколько повторить напоминание, не поставленное в переполненную очередь доставки
+RETRY_DELAY = timedelta(seconds=30)
+
+
+class DeadlineScheduler:
+    """Планировщик напоминаний о дедлайнах на min-куче.
+
+    В куче лежат записи (время срабатывания, поколение, ID задачи, вид, порог).
+    При перепланировании задачи ей выдается новое поколение, а старые записи
+    становятся устаревшими и отбрасываются при извлечении (ленивое удаление).
+    Вставка и извлечение - O(log n), фоновый поток спит до ближайшей записи.
+    """
+
+    def __init__(self, thresholds: Iterable[Tuple[str, int]] = REMINDER_THRESHOLDS,
+                 dispatch: Optional[Callable[[int, str, int], None]] = None):
+        self._thresholds = sorted(thresholds, key=lambda item: item[1], reverse=True)
+        self._dispatch = dispatch or _send_reminder
+        self._heap: List[Tuple[datetime, int, int, str, int]] = []
+        # task_id -> [текущее поколение, число живых записей в куче]
+        self._generations: Dict[int, List[int]] = {}
+        self._live = 0
+        self._seq = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def _reminder_times(self, task: Task, now: datetime) -> List[Tuple[datetime, str, int]]:
+        """Времена срабатывания напоминаний задачи.
+
+        Уже прошедшие пороги схлопываются в одно немедленное напоминание -
+        самое близкое к дедлайну, чтобы новая задача не получила их все сразу.
+        """
+        if task.status == TaskStatus.COMPLETED or not task.deadline or task.deadline <= now:
+            return []
+
+        result = []
+        passed = None
+        for kind, hours in self._thresholds:
+            fire_at = task.deadline - timedelta(hours=hours)
+            if fire_at > now:
+                result.append((fire_at, kind, hours))
+            else:
+                passed = (now, kind, hours)
+        if passed:
+            result.append(passed)
+        return result
+
+    def _forget(self, task_id: int) -> None:
+        state = self._generations.pop(task_id, None)
+        if state:
+            self._live -= state[1]
+
+    def schedule(self, task: Task, now: Optional[datetime] = None) -> None:
+        """(Пере)запланировать напоминания задачи, отменив прежние"""
+        now = now or datetime.now()
+        times = self._reminder_times(task, now)
+
+        with self._cond:
+            self._forget(task.id)
+            if not times:
+                return
+
+            generation = next(self._seq)
+            self._generations[task.id] = [generation, len(times)]
+            self._live += len(times)
+            for fire_at, kind, hours in times:
+                heapq.heappush(self._heap, (fire_at, generation, task.id, kind, hours))
+
+            self._compact()
+            self._cond.notify()
+
+    def schedule_all(self, tasks: Iterable[Task]) -> None:
+        for task in tasks:
+            self.schedule(task)
+
+    def cancel(self, task_id: int) -> None:
+        """Отменить все напоминания задачи"""
+        with self._cond:
+            self._forget(task_id)
+            self._compact()
+
+    def _compact(self) -> None:
+        # Пересобираем кучу, когда устаревших записей стало больше живых
+        if len(self._heap) > 2 * self._live + 64:
+            self._heap = [entry for entry in self._heap if self._is_live(entry)]
+            heapq.heapify(self._heap)
+
+    def _is_live(self, entry: Tuple[datetime, int, int, str, int]) -> bool:
+        state = self._generations.get(entry[2])
+        return state is not None and state[0] == entry[1]
+
+    def _pop_due(self, now: datetime) -> List[Tuple[int, str, int, int]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if not self._is_live(entry):
+                continue
+
+            state = self._generations[entry[2]]
+            state[1] -= 1
+            self._live -= 1
+            if state[1] == 0:
+                del self._generations[entry[2]]
+            due.append((entry[2], entry[3], entry[4], entry[1]))
+        return due
+
+    def _fire(self, due: List[Tuple[int, str, int, int]]) -> None:
+        for task_id, kind, hours, generation in due:
+            try:
+                self._dispatch(task_id, kind, hours)
+            except DeliveryQueueFull as e:
+                print(f"Напоминание для задачи {task_id} отложено: {e}")
+                self._retry(task_id, kind, hours, generation)
+            except Exception as e:
+                print(f"Ошибка отправки напоминания для задачи {task_id}: {e}")
+
+    def _retry(self, task_id: int, kind: str, hours: int, generation: int) -> None:
+        """Вернуть в кучу напоминание, которое не удалось отправить сейчас"""
+        with self._cond:
+            state = self._generations.get(task_id)
+            if state is None:
+                state = self._generations[task_id] = [generation, 0]
+            elif state[0] != generation:
+                # Задачу уже перепланировали - ее напоминания в куче новые
+                return
+            state[1] += 1
+            self._live += 1
+            heapq.heappush(self._heap, (datetime.now() + RETRY_DELAY, generation, task_id, kind, hours))
+            self._cond.notify()
+
+    def run_due(self, now: Optional[datetime] = None) -> int:
+        """Синхронно отправить все наступившие напоминания; возвращает их число"""
+        with self._cond:
+            due = self._pop_due(now or datetime.now())
+        self._fire(due)
+        return len(due)
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return self._live
+
+    def start(self) -> None:
+        """Запустить фоновый поток отправки напоминаний"""
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name='deadline-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                now = datetime.now()
+                due = self._pop_due(now)
+                if not due:
+                    timeout = MAX_SLEEP_SECONDS
+                    if self._heap:
+                        timeout = min(timeout, max(0.0, (self._heap[0][0] - now).total_seconds()))
+                    self._cond.wait(timeout)
+                    continue
+            self._fire(due)
+
+
+def _send_reminder(task_id: int, kind: str, hours: int) -> None:
+    """Отправка напоминания через сервис уведомлений"""
+    from src.services.notification_service import NotificationService
+
+    notification_service = NotificationService()
+    if kind == 'urgent':
+        notification_service.send_urgent_deadline_notification(task_id, hours)
+    else:
+        notification_service.send_deadline_notification(task_id)
+
+
+# Единый планировщик для всего приложения
+deadline_scheduler = DeadlineScheduler()
@@ -0,0 +1,346 @@
+# src/services/delivery_pipeline.py
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional
+
+from src.domain.entities import Message
+from src.repositories import message_repository, user_repository
+
+# Параметры очередей доставки
+QUEUE_SIZE = 10000
+BATCH_SIZE = 200
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+# Сколько submit ждет места в очереди, прежде чем отказать, и как часто проверяет
+SUBMIT_TIMEOUT_SECONDS = 2.0
+SUBMIT_POLL_SECONDS = 0.01
+
+
+class DeliveryQueueFull(Exception):
+    """Очередь доставки переполнена - вызывающему стоит повторить позже.
+
+    Ни одно сообщение из отклоненного вызова submit в очередь не попало.
+    """
+
+
+class PartialDelivery(Exception):
+    """Пачка доставлена не целиком: первые delivered сообщений уже у получателя"""
+
+    def __init__(self, delivered: int, error: Exception):
+        super().__init__(str(error))
+        self.delivered = delivered
+
+
+class NotificationSink(ABC):
+    """Получатель уведомлений (входящие, почта, вебхук...)"""
+
+    name = 'sink'
+
+    @abstractmethod
+    def deliver_batch(self, messages: List[Message]) -> None:
+        """Доставить пачку.
+
+        Исключение означает, что пачку нужно повторить; PartialDelivery -
+        что повторить нужно только сообщения после первых delivered.
+        """
+
+
+class InboxSink(NotificationSink):
+    """Входящие внутри приложения (репозиторий сообщений)"""
+
+    name = 'inbox'
+
+    def deliver_batch(self, messages: List[Message]) -> None:
+        # add_many добавляет пачку целиком или не добавляет совсем
+        message_repository.add_many(messages)
+
+
+class SmtpSink(NotificationSink):
+    """Отправка уведомлений по почте.
+
+    Для локальной проверки подходит отладочный SMTP-сервер:
+    python -m aiosmtpd -n -l localhost:1025
+    """
+
+    name = 'email'
+
+    def __init__(self, host: str, port: int = 25, sender: str = 'noreply@smartschedule.local',
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 use_tls: bool = False, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def deliver_batch(self, messages: List[Message]) -> None:
+        # Одно SMTP-соединение на всю пачку; уже ушедшие письма при повторе не отправляются
+        sent = 0
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+                if self.use_tls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password or '')
+                for message in messages:
+                    user = user_repository.get_by_id(message.user_id)
+                    if user and user.email:
+                        email = EmailMessage()
+                        email['From'] = self.sender
+                        email['To'] = user.email
+                        email['Subject'] = 'Умное расписание: уведомление'
+                        email.set_content(message.text)
+                        smtp.send_message(email)
+                    sent += 1
+        except Exception as e:
+            if sent:
+                raise PartialDelivery(sent, e) from e
+            raise
+
+
+class WebhookSink(NotificationSink):
+    """POST пачки уведомлений в JSON на внешний URL"""
+
+    name = 'webhook'
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver_batch(self, messages: List[Message]) -> None:
+        body = json.dumps({'notifications': [message.to_dict() for message in messages]},
+                          ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status >= 300:
+                raise RuntimeError(f"Вебхук ответил {response.status}")
+
+
+@dataclass
+class SinkMetrics:
+    delivered: int = 0
+    failed: int = 0
+    dropped: int = 0
+    retries: int = 0
+    batches: int = 0
+    busy_seconds: float = 0.0
+    last_error: Optional[str] = None
+
+    def to_dict(self, queued: int) -> Dict[str, Any]:
+        return {
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'retries': self.retries,
+            'batches': self.batches,
+            'queued': queued,
+            'throughput_per_second': round(self.delivered / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+            'last_error': self.last_error
+        }
+
+
+_STOP = object()
+
+
+class _SinkWorker:
+    """Очередь и поток доставки для одного получателя"""
+
+    def __init__(self, sink: NotificationSink, on_delivered=None):
+        self.sink = sink
+        self.queue: 'queue.Queue' = queue.Queue(maxsize=QUEUE_SIZE)
+        self.metrics = SinkMetrics()
+        self._on_delivered = on_delivered
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=f'delivery-{self.sink.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float) -> None:
+        if self._thread:
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _next_batch(self) -> Optional[List[Message]]:
+        item = self.queue.get()
+        if item is _STOP:
+            return None
+        batch = [item]
+        # Добираем все, что уже лежит в очереди, не дожидаясь новых элементов
+        while len(batch) < BATCH_SIZE:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self.queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self.deliver(batch)
+
+    def deliver(self, batch: List[Message]) -> bool:
+        """Доставить пачку с повторами и экспоненциальной задержкой.
+
+        Повторяются только недоставленные сообщения: после PartialDelivery
+        уже доставленная часть пачки засчитывается и больше не отправляется.
+        """
+        pending = batch
+        for attempt in range(MAX_RETRIES + 1):
+            started = time.monotonic()
+            try:
+                self.sink.deliver_batch(pending)
+            except Exception as e:
+                self.metrics.busy_seconds += time.monotonic() - started
+                self.metrics.last_error = str(e)
+                if isinstance(e, PartialDelivery) and e.delivered:
+                    self._delivered(pending[:e.delivered])
+                    pending = pending[e.delivered:]
+                    if not pending:
+                        return True
+                if attempt == MAX_RETRIES:
+                    self.metrics.failed += len(pending)
+                    return False
+                self.metrics.retries += 1
+                time.sleep(min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+                continue
+
+            self.metrics.busy_seconds += time.monotonic() - started
+            self._delivered(pending)
+            return True
+        return False
+
+    def _delivered(self, messages: List[Message]) -> None:
+        self.metrics.delivered += len(messages)
+        self.metrics.batches += 1
+        if self._on_delivered:
+            self._on_delivered(messages)
+
+
+class DeliveryPipeline:
+    """Асинхронная доставка уведомлений.
+
+    Сначала сообщения попадают во входящие (там им присваиваются ID), затем
+    уже сохраненные пачки раздаются внешним получателям. У каждого получателя
+    своя ограниченная очередь и поток, поэтому медленная почта не тормозит
+    входящие, а запрос, породивший уведомление, не ждет доставки.
+    """
+
+    def __init__(self, inbox: Optional[NotificationSink] = None,
+                 external_sinks: Optional[List[NotificationSink]] = None):
+        self._external = [_SinkWorker(sink) for sink in (external_sinks or [])]
+        self._inbox = _SinkWorker(inbox or InboxSink(), on_delivered=self._forward)
+        self._running = False
+        self._lock = threading.Lock()
+        # Отправители ставят сообщения в очередь входящих по одному: вызов submit
+        # проверяет место сразу для всех своих сообщений
+        self._submit_lock = threading.Lock()
+
+    @property
+    def workers(self) -> List[_SinkWorker]:
+        return [self._inbox] + self._external
+
+    def add_sink(self, sink: NotificationSink) -> None:
+        worker = _SinkWorker(sink)
+        with self._lock:
+            self._external.append(worker)
+            if self._running:
+                worker.start()
+
+    def _forward(self, batch: List[Message]) -> None:
+        for worker in self._external:
+            for message in batch:
+                try:
+                    worker.queue.put_nowait(message)
+                except queue.Full:
+                    # Внешний получатель не успевает - не блокируем входящие
+                    worker.metrics.dropped += 1
+
+    def submit(self, messages: List[Message]) -> List[Message]:
+        """Поставить сообщения в очередь доставки.
+
+        Сообщения ставятся все вместе или ни одно: если места для них нет
+        дольше SUBMIT_TIMEOUT_SECONDS, DeliveryQueueFull, и вызывающий может
+        повторить весь вызов, не размножив уже поставленные. Если конвейер
+        не запущен (CLI, скрипты), доставка выполняется сразу.
+        """
+        if not self._running:
+            if messages:
+                self._inbox.deliver(messages)
+            return messages
+
+        inbox = self._inbox.queue
+        deadline = time.monotonic() + SUBMIT_TIMEOUT_SECONDS
+        with self._submit_lock:
+            # Очередь входящих пополняет только submit под этой блокировкой,
+            # поэтому освободившееся место никто не займет до put_nowait ниже
+            while inbox.maxsize - inbox.qsize() < len(messages):
+                if len(messages) > inbox.maxsize or time.monotonic() >= deadline:
+                    self._inbox.metrics.dropped += len(messages)
+                    raise DeliveryQueueFull("Очередь уведомлений переполнена")
+                time.sleep(SUBMIT_POLL_SECONDS)
+            for message in messages:
+                inbox.put_nowait(message)
+        return messages
+
+    def start(self) -> None:
+        with self._lock:
+            if self._running:
+                return
+            for worker in self.workers:
+                worker.start()
+            self._running = True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Остановить потоки, доставив уже принятые сообщения"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._inbox.stop(timeout)
+            for worker in self._external:
+                worker.stop(timeout)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {worker.sink.name: worker.metrics.to_dict(worker.queue.qsize())
+                for worker in self.workers}
+
+
+def build_default_pipeline() -> DeliveryPipeline:
+    """Конвейер с получателями из окружения (SMTP_HOST, NOTIFY_WEBHOOK_URL)"""
+    sinks: List[NotificationSink] = []
+    if os.environ.get('SMTP_HOST'):
+        sinks.append(SmtpSink(
+            host=os.environ['SMTP_HOST'],
+            port=int(os.environ.get('SMTP_PORT', '1025')),
+            sender=os.environ.get('SMTP_SENDER', 'noreply@smartschedule.local'),
+            username=os.environ.get('SMTP_USERNAME'),
+            password=os.environ.get('SMTP_PASSWORD'),
+            use_tls=os.environ.get('SMTP_TLS') == '1'
+        ))
+    if os.environ.get('NOTIFY_WEBHOOK_URL'):
+        sinks.append(WebhookSink(os.environ['NOTIFY_WEBHOOK_URL']))
+    return DeliveryPipeline(external_sinks=sinks)
+
+
+# Единый конвейер доставки для всего приложения
+delivery_pipeline = build_default_pipeline()
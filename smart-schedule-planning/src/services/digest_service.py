@@ -0,0 +1,141 @@
+# src/services/digest_service.py
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from src.domain.entities import Message, MessageType, Task, TaskStatus, User
+from src.repositories import task_repository, user_repository
+from src.services.delivery_pipeline import DeliveryQueueFull, delivery_pipeline
+from src.utils.ttl_set import TTLSet
+
+# Окно сводки: дедлайны, которые наступят в ближайшие часы
+DIGEST_WINDOW = timedelta(hours=24)
+# Час ежедневной отправки сводки (по локальному времени сервера)
+DIGEST_HOUR = int(os.environ.get('DIGEST_HOUR', '8'))
+# Сколько задач перечислять в тексте сводки по названию
+MAX_DIGEST_TITLES = 10
+# Через сколько повторить рассылку, не поставленную в переполненную очередь доставки
+DIGEST_RETRY_SECONDS = 60.0
+
+
+class DigestService:
+    """Ежедневная сводка напоминаний для пользователей с включенным режимом сводки.
+
+    Вместо сообщения на каждую задачу и каждый порог пользователь получает одно
+    сообщение со всеми дедлайнами окна. Задачи берутся одним диапазонным
+    проходом по индексу дедлайнов пользователя. Срочные напоминания (за час)
+    по-прежнему приходят отдельно - их нельзя откладывать до следующей сводки.
+    """
+
+    def __init__(self, window: timedelta = DIGEST_WINDOW, hour: int = DIGEST_HOUR):
+        self.window = window
+        self.hour = hour
+        # Кому сводка за день уже ушла: (пользователь, дата)
+        self._sent = TTLSet(timedelta(days=2))
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def build_digest(self, user: User, now: datetime) -> Optional[Message]:
+        """Сообщение-сводка пользователя или None, если дедлайнов в окне нет"""
+        tasks = [task for task in task_repository.get_deadlines_between(user.id, now, now + self.window)
+                 if task.status != TaskStatus.COMPLETED]
+        if not tasks:
+            return None
+
+        titles = ', '.join(f"'{task.title}' (до {task.deadline.strftime('%H:%M')})"
+                           for task in tasks[:MAX_DIGEST_TITLES])
+        if len(tasks) > MAX_DIGEST_TITLES:
+            titles += f" и еще {len(tasks) - MAX_DIGEST_TITLES}"
+
+        return Message(
+            id=0,
+            template_id='daily_digest',
+            template_params=(int(self.window.total_seconds() // 3600), len(tasks), titles),
+            sent_at=now,
+            message_type=MessageType.DIGEST,
+            user_id=user.id,
+            is_read=False
+        )
+
+    def send_digests(self, now: Optional[datetime] = None) -> int:
+        """Разослать сводки всем подписанным пользователям; возвращает число сводок"""
+        now = now or datetime.now()
+        messages: List[Message] = []
+        claimed = []
+        for user in user_repository.get_all():
+            if not user.notification_digest:
+                continue
+            if not self._sent.add((user.id, now.date())):
+                continue
+            claimed.append((user.id, now.date()))
+            message = self.build_digest(user, now)
+            if message:
+                messages.append(message)
+
+        if messages:
+            try:
+                delivery_pipeline.submit(messages)
+            except DeliveryQueueFull:
+                # Ни одна сводка не ушла - при повторе их нужно собрать заново
+                for key in claimed:
+                    self._sent.discard(key)
+                raise
+        return len(messages)
+
+    def covers(self, task: Task, now: datetime) -> bool:
+        """Попадает ли дедлайн задачи в сводку - уже отправленную или будущую.
+
+        Дедлайн после ближайшей рассылки войдет в одну из следующих сводок.
+        Более ранний дедлайн был только в последней отправленной сводке -
+        и только если задача с этим дедлайном уже существовала в момент ее
+        рассылки; задачи, созданные или перенесенные позже, сводка не видела.
+        """
+        upcoming = self.next_run(now)
+        if task.deadline >= upcoming:
+            return True
+        previous = upcoming - timedelta(days=1)
+        return task.deadline >= previous and task.updated_at <= previous
+
+    def next_run(self, now: datetime) -> datetime:
+        run_at = now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        return run_at
+
+    def start(self) -> None:
+        """Запустить ежедневную рассылку сводок"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='daily-digest', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        retry = False
+        while True:
+            now = datetime.now()
+            # Спим не дольше часа, чтобы пережить перевод часов
+            delay = DIGEST_RETRY_SECONDS if retry else min(3600.0, (self.next_run(now) - now).total_seconds())
+            if self._stop_event.wait(delay):
+                return
+            if retry or datetime.now().hour == self.hour:
+                retry = False
+                try:
+                    self.send_digests()
+                except DeliveryQueueFull as e:
+                    # Очередь доставки переполнена: сводки за сегодня отправятся чуть позже
+                    retry = True
+                    print(f"Рассылка сводок отложена: {e}")
+                except Exception as e:
+                    print(f"Ошибка рассылки сводок: {e}")
+
+
+# Единый сервис сводок для всего приложения
+digest_service = DigestService()
@@ -0,0 +1,280 @@
+# src/services/export_jobs.py
+import gzip
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.domain.entities import Message, MessageType
+from src.services.delivery_pipeline import delivery_pipeline
+from src.services.integration_service import IntegrationService
+
+# Сколько выгрузок формируется одновременно
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', '2'))
+# Сколько незавершенных выгрузок может быть у одного пользователя
+MAX_ACTIVE_JOBS_PER_USER = 2
+# Сколько хранится готовый файл
+ARTIFACT_TTL = timedelta(hours=1)
+# Период удаления просроченных файлов
+CLEANUP_INTERVAL = timedelta(minutes=5)
+
+# Формат выгрузки -> (расширение, MIME-тип)
+EXPORT_FORMATS = {
+    'ical': ('ics', 'text/calendar'),
+    'csv': ('csv', 'text/csv'),
+}
+
+
+class ExportQuotaExceeded(Exception):
+    """У пользователя слишком много незавершенных выгрузок"""
+
+
+@dataclass
+class ExportJob:
+    id: int
+    user_id: int
+    format: str
+    start_date: Optional[datetime]
+    end_date: Optional[datetime]
+    gzip: bool
+    created_at: datetime
+    status: str = 'queued'  # queued, running, done, failed, cancelled
+    bytes_written: int = 0
+    path: Optional[str] = None
+    error: Optional[str] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    cancel_requested: bool = False
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    @property
+    def filename(self) -> str:
+        extension, _ = EXPORT_FORMATS[self.format]
+        name = f'export_{self.created_at.strftime("%Y%m%d_%H%M%S")}.{extension}'
+        return name + '.gz' if self.gzip else name
+
+    @property
+    def mimetype(self) -> str:
+        return 'application/gzip' if self.gzip else EXPORT_FORMATS[self.format][1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'format': self.format,
+            'status': self.status,
+            'bytes_written': self.bytes_written,
+            'filename': self.filename,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+
+class ExportJobService:
+    """Очередь фоновых выгрузок iCal/CSV.
+
+    Запрос только ставит задание в очередь; файл пишется пулом потоков
+    ограниченного размера во временный каталог. Клиент опрашивает состояние
+    (или получает уведомление) и скачивает готовый файл, пока не истек его
+    срок хранения - потом файл удаляется фоновой очисткой.
+    """
+
+    def __init__(self, workers: int = EXPORT_WORKERS, per_user: int = MAX_ACTIVE_JOBS_PER_USER,
+                 ttl: timedelta = ARTIFACT_TTL, directory: Optional[str] = None):
+        self.workers = workers
+        self.per_user = per_user
+        self.ttl = ttl
+        # Без явного каталога временный создается при первой выгрузке
+        self.directory = directory or os.environ.get('EXPORT_DIR')
+        self._integration = IntegrationService()
+        self._jobs: Dict[int, ExportJob] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stop_event = threading.Event()
+        self._cleaner: Optional[threading.Thread] = None
+
+    def submit(self, user_id: int, export_format: str, start_date: Optional[datetime] = None,
+               end_date: Optional[datetime] = None, gzip: bool = False) -> ExportJob:
+        """Поставить выгрузку в очередь; ExportQuotaExceeded при превышении квоты"""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+        if export_format == 'ical' and not (start_date and end_date):
+            raise ValueError("Для iCalendar нужен диапазон дат")
+
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job.user_id == user_id and job.active)
+            if active >= self.per_user:
+                raise ExportQuotaExceeded(f"Не больше {self.per_user} выгрузок одновременно")
+            job = ExportJob(
+                id=next(self._ids),
+                user_id=user_id,
+                format=export_format,
+                start_date=start_date,
+                end_date=end_date,
+                gzip=gzip,
+                created_at=datetime.now()
+            )
+            self._jobs[job.id] = job
+
+        if self._executor is None:
+            # Очередь не запущена (тесты, скрипты) - выполняем сразу
+            self._run_job(job)
+        else:
+            self._executor.submit(self._run_job, job)
+        return job
+
+    def get_job(self, user_id: int, job_id: int) -> Optional[ExportJob]:
+        job = self._jobs.get(job_id)
+        return job if job and job.user_id == user_id else None
+
+    def get_user_jobs(self, user_id: int) -> List[ExportJob]:
+        jobs = [job for job in list(self._jobs.values()) if job.user_id == user_id]
+        return sorted(jobs, key=lambda job: job.id, reverse=True)
+
+    def artifact_path(self, user_id: int, job_id: int) -> Optional[str]:
+        """Путь к готовому файлу или None, если его нет или срок хранения истек"""
+        job = self.get_job(user_id, job_id)
+        if not job or job.status != 'done' or not job.path:
+            return None
+        if job.expires_at and job.expires_at <= datetime.now():
+            return None
+        return job.path if os.path.exists(job.path) else None
+
+    def cancel(self, user_id: int, job_id: int) -> bool:
+        """Отменить выгрузку (если идет) и удалить ее файл"""
+        job = self.get_job(user_id, job_id)
+        if not job:
+            return False
+        job.cancel_requested = True
+        if not job.active:
+            self._discard(job)
+        return True
+
+    def _chunks(self, job: ExportJob) -> Iterator[str]:
+        if job.format == 'ical':
+            return self._integration.iter_ical(job.user_id, job.start_date, job.end_date)
+        return self._integration.iter_csv(job.user_id, job.start_date, job.end_date)
+
+    def _run_job(self, job: ExportJob) -> None:
+        if job.cancel_requested:
+            job.status = 'cancelled'
+            job.finished_at = datetime.now()
+            return
+
+        job.status = 'running'
+        path = os.path.join(self._ensure_directory(), f'{job.id}_{job.filename}')
+        try:
+            opener = gzip.open if job.gzip else open
+            with opener(path, 'wt', encoding='utf-8', newline='') as output:
+                for chunk in self._chunks(job):
+                    if job.cancel_requested:
+                        break
+                    output.write(chunk)
+                    job.bytes_written += len(chunk.encode('utf-8'))
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = datetime.now()
+            self._remove_file(path)
+            return
+
+        job.finished_at = datetime.now()
+        if job.cancel_requested:
+            job.status = 'cancelled'
+            self._remove_file(path)
+            return
+
+        job.path = path
+        job.expires_at = job.finished_at + self.ttl
+        job.status = 'done'
+        self._notify(job)
+
+    def _notify(self, job: ExportJob) -> None:
+        try:
+            delivery_pipeline.submit([Message(
+                id=0,
+                template_id='export_ready',
+                template_params=(job.filename, int(self.ttl.total_seconds() // 60)),
+                sent_at=datetime.now(),
+                message_type=MessageType.SYSTEM,
+                user_id=job.user_id,
+                is_read=False,
+                related_entity_id=job.id,
+                related_entity_type='export_job'
+            )])
+        except Exception as e:
+            # Уведомление не обязательно: состояние выгрузки можно опросить
+            print(f"Не удалось уведомить о выгрузке #{job.id}: {e}")
+
+    def _ensure_directory(self) -> str:
+        with self._lock:
+            if not self.directory:
+                self.directory = tempfile.mkdtemp(prefix='exports-')
+            os.makedirs(self.directory, exist_ok=True)
+            return self.directory
+
+    def _remove_file(self, path: Optional[str]) -> None:
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _discard(self, job: ExportJob) -> None:
+        self._remove_file(job.path)
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+    def cleanup(self, now: Optional[datetime] = None) -> int:
+        """Удалить просроченные файлы и завершенные задания; возвращает число удаленных"""
+        now = now or datetime.now()
+        expired = [job for job in list(self._jobs.values())
+                   if not job.active and job.finished_at
+                   and (job.expires_at or job.finished_at + self.ttl) <= now]
+        for job in expired:
+            self._discard(job)
+        return len(expired)
+
+    def start(self) -> None:
+        """Запустить пул выгрузок и фоновую очистку"""
+        if self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='export')
+        self._stop_event.clear()
+        self._cleaner = threading.Thread(target=self._run_cleanup, name='export-cleanup', daemon=True)
+        self._cleaner.start()
+
+    def stop(self, remove_files: bool = False) -> None:
+        self._stop_event.set()
+        if self._cleaner:
+            self._cleaner.join(timeout=5)
+            self._cleaner = None
+        if self._executor:
+            for job in list(self._jobs.values()):
+                if job.active:
+                    job.cancel_requested = True
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if remove_files and self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _run_cleanup(self) -> None:
+        while not self._stop_event.wait(CLEANUP_INTERVAL.total_seconds()):
+            try:
+                self.cleanup()
+            except Exception as e:
+                print(f"Ошибка очистки выгрузок: {e}")
+
+
+# Единая очередь выгрузок для всего приложения
+export_job_service = ExportJobService()
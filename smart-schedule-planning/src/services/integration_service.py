@@ -1,114 +1,607 @@
 # src/services/integration_service.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple, Union
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import csv
+import heapq
 import io
-from icalendar import Calendar, Event as ICalEvent
+import itertools
+import re
+from dateutil.rrule import rrulestr
 from src.domain.interfaces import IIntegrationService
-from src.domain.entities import Task, Event
+from src.domain.entities import Task, Event, TaskPriority, TaskStatus
 from src.repositories import task_repository, event_repository, user_repository
+from src.services.deadline_scheduler import deadline_scheduler
+from src.services.task_archive_service import task_archive_service
+from src.utils.ical import (calendar, component, escape_text, format_datetime, ical_fragments, ICalComponent,
+                            iter_components, parse_datetime, parse_duration, unescape_text)
+
+# Приоритет и статус задачи в терминах iCalendar
+_ICAL_PRIORITY = {'высокий': '1', 'средний': '5', 'низкий': '9'}
+_ICAL_STATUS = {
+    'новая': 'NEEDS-ACTION',
+    'в работе': 'IN-PROCESS',
+    'завершена': 'COMPLETED'
+}
+
+
+def task_to_vevent(task: Task, dtstamp: str) -> str:
+    return component('VEVENT', (
+        f'UID:task_{task.id}@smartschedule.local',
+        f'DTSTAMP:{dtstamp}',
+        f'DTSTART:{format_datetime(task.start_time)}',
+        f'DTEND:{format_datetime(task.end_time)}',
+        f'SUMMARY:{escape_text(task.title)}',
+        f'DESCRIPTION:{escape_text(task.description or "")}',
+        f'PRIORITY:{_ICAL_PRIORITY.get(task.priority.value, "5")}',
+        f'STATUS:{_ICAL_STATUS.get(task.status.value, "NEEDS-ACTION")}',
+    ))
+
+
+def event_to_vevent(event: Event, dtstamp: str) -> str:
+    return component('VEVENT', (
+        f'UID:event_{event.id}@smartschedule.local',
+        f'DTSTAMP:{dtstamp}',
+        f'DTSTART:{format_datetime(event.start_time)}',
+        f'DTEND:{format_datetime(event.end_time)}',
+        f'SUMMARY:{escape_text(event.title)}',
+        f'DESCRIPTION:{escape_text(event.description or "")}',
+        f'LOCATION:{"Online" if event.is_shared else "Personal"}',
+    ))
+
+
+# DTSTAMP - время последнего изменения, поэтому готовый VEVENT зависит
+# только от версии сущности и его можно кэшировать
+def _task_fragment(task: Task) -> str:
+    return task_to_vevent(task, format_datetime(task.updated_at))
+
+
+def _event_fragment(event: Event) -> str:
+    return event_to_vevent(event, format_datetime(event.created_at))
+
+
+# Окно подписки на календарь относительно текущей даты
+FEED_PAST = timedelta(days=90)
+FEED_FUTURE = timedelta(days=365)
+
+
+def feed_window(now: datetime) -> Tuple[datetime, datetime]:
+    # Границы выровнены по дням: содержимое ленты меняется не чаще раза в сутки
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - FEED_PAST, today + FEED_FUTURE
+
+
+_TASK_STATUS_BY_ICAL = {value: TaskStatus(key) for key, value in _ICAL_STATUS.items()}
+
+# Параметры импорта
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+# Повторяющиеся события разворачиваются от окна истории до горизонта и не больше лимита
+RECURRENCE_HISTORY = timedelta(days=365)
+RECURRENCE_HORIZON = timedelta(days=365)
+MAX_OCCURRENCES = 1000
+
+_RRULE_UNTIL_UTC = re.compile(r'UNTIL=(\d{8}T\d{6}Z)', re.I)
+
+
+def _local_until(match: re.Match) -> str:
+    # UNTIL в UTC - в локальное время без пояса, как DTSTART после parse_datetime
+    return 'UNTIL=' + format_datetime(parse_datetime(({}, match.group(1).upper())))
+
+
+@dataclass
+class ImportResult:
+    """Ход и итог импорта: счетчики и ошибки по отдельным записям"""
+    processed: int = 0
+    created_tasks: int = 0
+    created_events: int = 0
+    updated: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    
+    def add_error(self, line: int, error: str, uid: Optional[str] = None) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'uid': uid, 'error': error})
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'processed': self.processed,
+            'created_tasks': self.created_tasks,
+            'created_events': self.created_events,
+            'updated': self.updated,
+            'duplicates': self.duplicates,
+            'failed': self.failed,
+            'errors': self.errors
+        }
+
+
+def _ical_priority(value: Optional[str]) -> TaskPriority:
+    # RFC 5545: 1-4 высокий, 5 средний, 6-9 низкий, 0 - не задан
+    try:
+        priority = int(value or 0)
+    except ValueError:
+        priority = 0
+    if 1 <= priority <= 4:
+        return TaskPriority.HIGH
+    if priority >= 6:
+        return TaskPriority.LOW
+    return TaskPriority.MEDIUM
+
+
+def _is_task(item: ICalComponent) -> bool:
+    # Задачи - VTODO, а также VEVENT с приоритетом и статусом задачи (так их выгружает экспорт)
+    if item.name == 'VTODO':
+        return True
+    return item.get('PRIORITY') is not None and item.value('STATUS') in _TASK_STATUS_BY_ICAL
+
+
+def _occurrences(item: ICalComponent, start: datetime, now: datetime) -> Iterator[Tuple[datetime, Optional[str]]]:
+    """Начала вхождений компонента и суффикс UID (None для неповторяющихся).
+    
+    Давно идущая серия разворачивается не с DTSTART, а с начала окна
+    истории: иначе лимит вхождений исчерпали бы прошлые годы.
+    """
+    rule = item.value('RRULE')
+    if not rule:
+        yield start, None
+        return
+    
+    rules = rrulestr(_RRULE_UNTIL_UTC.sub(_local_until, rule), dtstart=start, forceset=True)
+    for params, value in item.all('EXDATE'):
+        for exdate in value.split(','):
+            rules.exdate(parse_datetime((params, exdate)))
+    
+    horizon = max(start, now) + RECURRENCE_HORIZON
+    for occurrence in rules.xafter(max(start, now - RECURRENCE_HISTORY), count=MAX_OCCURRENCES, inc=True):
+        if occurrence > horizon:
+            break
+        yield occurrence, format_datetime(occurrence)
+
+
+CSV_HEADER = [
+    'ID', 'Название', 'Описание', 'Начало', 'Окончание', 
+    'Длительность (мин)', 'Приоритет', 'Статус', 'Создано', 'Обновлено'
+]
+
+# Сколько строк CSV собирается в один кусок потока
+CSV_ROWS_PER_CHUNK = 500
+
+# Значения приоритета и статуса в CSV: как в выгрузке или имя константы (HIGH, new...)
+_CSV_PRIORITIES = {**{p.value: p for p in TaskPriority}, **{p.name.lower(): p for p in TaskPriority}}
+_CSV_STATUSES = {**{s.value: s for s in TaskStatus}, **{s.name.lower(): s for s in TaskStatus}}
+
+
+def _csv_chunks(tasks: Iterable[Task]) -> Iterator[str]:
+    """Строки CSV пачками: один маленький буфер переиспользуется для всех пачек"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+    
+    rows = 0
+    for task in tasks:
+        writer.writerow([
+            task.id,
+            task.title,
+            task.description or '',
+            task.start_time.isoformat() if task.start_time else '',
+            task.end_time.isoformat() if task.end_time else '',
+            task.duration,
+            task.priority.value,
+            task.status.value,
+            task.created_at.isoformat(),
+            task.updated_at.isoformat()
+        ])
+        rows += 1
+        if rows % CSV_ROWS_PER_CHUNK == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+    
+    yield output.getvalue()
+
+
+def _csv_times(values: List[str], column: str, errors: Dict[int, str]) -> List[Optional[datetime]]:
+    """Разбор столбца дат пачки; ошибки записываются по номеру строки в пачке"""
+    parsed: List[Optional[datetime]] = []
+    for row, value in enumerate(values):
+        if not value:
+            parsed.append(None)
+            continue
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            errors.setdefault(row, f"{column}: некорректная дата '{value[:30]}'")
+            parsed.append(None)
+            continue
+        # Время со смещением переводится в локальное без пояса, как parse_datetime для iCal:
+        # в индексах все времена наивные, сравнение с ними иначе невозможно
+        if moment.tzinfo is not None:
+            moment = moment.astimezone().replace(tzinfo=None)
+        parsed.append(moment)
+    return parsed
+
+
+def _csv_choices(values: List[str], choices: Dict[str, Any], default: Any, column: str,
+                 errors: Dict[int, str]) -> List[Any]:
+    parsed = []
+    for row, value in enumerate(values):
+        choice = choices.get(value.lower()) if value else default
+        if choice is None:
+            errors.setdefault(row, f"{column}: неизвестное значение '{value[:30]}'")
+        parsed.append(choice)
+    return parsed
+
 
 class IntegrationService(IIntegrationService):
     def __init__(self):
         pass
     
+    def iter_ical(self, user_id: int, start_date: datetime, end_date: datetime,
+                  cache: bool = True) -> Iterator[str]:
+        """Календарь .ics по частям: по одному VEVENT на задачу или событие.
+        
+        Задачи и события читаются из индексов по времени начала (архивные
+        задачи - из сегментов архива в том же порядке) и сливаются в один
+        упорядоченный поток, поэтому память не зависит от размера выгрузки.
+        cache=False - без общего кэша VEVENT (разовые массовые выгрузки).
+        """
+        user = user_repository.get_by_id(user_id)
+        if not user:
+            raise ValueError("Пользователь не найден")
+        
+        tasks = (task for task in task_repository.iter_user_tasks_in_range(user_id, start_date, end_date)
+                 if user_id in task.assigned_users)
+        events = event_repository.iter_user_events_in_range(user_id, start_date, end_date)
+        archived = (task for task in task_archive_service.iter_tasks(user_id, start_date, end_date)
+                    if user_id in task.assigned_users)
+        
+        # Неизмененные задачи и события берутся из кэша готовых VEVENT
+        items = heapq.merge(tasks, archived, events, key=lambda item: item.start_time)
+        if cache:
+            components = (
+                ical_fragments.get('task', item, _task_fragment) if isinstance(item, Task)
+                else ical_fragments.get('event', item, _event_fragment)
+                for item in items
+            )
+        else:
+            components = (_task_fragment(item) if isinstance(item, Task) else _event_fragment(item)
+                          for item in items)
+        return calendar(f'Расписание {user.name}', components)
+    
+    def feed_state(self, user_id: int, now: Optional[datetime] = None) -> Tuple[str, datetime]:
+        """ETag и Last-Modified ленты подписки без построения календаря.
+        
+        Строятся из отметок изменений задач и событий пользователя, его профиля
+        (название календаря) и окна ленты, сдвигающегося раз в сутки.
+        """
+        user = user_repository.get_by_id(user_id)
+        if not user:
+            raise ValueError("Пользователь не найден")
+        
+        now = now or datetime.now()
+        window_start, _ = feed_window(now)
+        task_change, task_time = task_repository.change_mark(user_id)
+        event_change, event_time = event_repository.change_mark(user_id)
+        
+        etag = f'{task_change}-{event_change}-{int(user.updated_at.timestamp())}-{window_start:%Y%m%d}'
+        # Окно сдвигается в полночь - содержимое ленты тоже считается измененным
+        today = window_start + FEED_PAST
+        last_modified = max(time for time in (task_time, event_time, user.updated_at, today)
+                            if time is not None)
+        return etag, last_modified
+    
+    def iter_feed(self, user_id: int, now: Optional[datetime] = None) -> Iterator[str]:
+        """Лента подписки: календарь пользователя в окне вокруг текущей даты"""
+        start_date, end_date = feed_window(now or datetime.now())
+        return self.iter_ical(user_id, start_date, end_date)
+    
     def export_to_ical(self, user_id: int, start_date: datetime, 
                       end_date: datetime) -> str:
+        return ''.join(self.iter_ical(user_id, start_date, end_date))
+    
+    def iter_csv(self, user_id: int, start_date: Optional[datetime] = None,
+                 end_date: Optional[datetime] = None) -> Iterator[str]:
+        """CSV задач по частям, без сборки файла в памяти.
+        
+        С диапазоном дат задачи читаются из индекса по времени начала,
+        без него - все задачи пользователя в порядке создания. Следом идут
+        завершенные задачи из архива.
+        """
         user = user_repository.get_by_id(user_id)
         if not user:
             raise ValueError("Пользователь не найден")
         
-        tasks = task_repository.get_by_date_range(start_date, end_date)
-        user_tasks = [task for task in tasks if user_id in task.assigned_users]
-        
-        events = event_repository.get_user_events(user_id)
-        user_events = [event for event in events 
-                      if start_date <= event.start_time <= end_date or
-                      start_date <= event.end_time <= end_date]
-        
-        # Создаем iCalendar
-        cal = Calendar()
-        cal.add('prodid', '-//Smart Schedule//RU')
-        cal.add('version', '2.0')
-        cal.add('calscale', 'GREGORIAN')
-        cal.add('method', 'PUBLISH')
-        cal.add('x-wr-calname', f'Расписание {user.name}')
-        cal.add('x-wr-timezone', 'Europe/Moscow')
-        
-        # Добавляем задачи
-        for task in user_tasks:
-            if task.start_time and task.end_time:
-                ical_event = ICalEvent()
-                ical_event.add('uid', f'task_{task.id}@smartschedule.local')
-                ical_event.add('dtstamp', datetime.now())
-                ical_event.add('dtstart', task.start_time)
-                ical_event.add('dtend', task.end_time)
-                ical_event.add('summary', task.title)
-                ical_event.add('description', task.description or '')
-                ical_event.add('priority', 
-                              {'высокий': '1', 'средний': '5', 'низкий': '9'}.get(
-                                  task.priority.value, '5'))
-                
-                status_map = {
-                    'новая': 'NEEDS-ACTION',
-                    'в работе': 'IN-PROCESS',
-                    'завершена': 'COMPLETED'
-                }
-                ical_event.add('status', status_map.get(task.status.value, 'NEEDS-ACTION'))
-                
-                cal.add_component(ical_event)
-        
-        # Добавляем события
-        for event in user_events:
-            ical_event = ICalEvent()
-            ical_event.add('uid', f'event_{event.id}@smartschedule.local')
-            ical_event.add('dtstamp', datetime.now())
-            ical_event.add('dtstart', event.start_time)
-            ical_event.add('dtend', event.end_time)
-            ical_event.add('summary', event.title)
-            ical_event.add('description', event.description or '')
-            ical_event.add('location', 'Online' if event.is_shared else 'Personal')
-            
-            cal.add_component(ical_event)
-        
-        return cal.to_ical().decode('utf-8')
+        if start_date and end_date:
+            tasks = task_repository.iter_user_tasks_in_range(user_id, start_date, end_date)
+            archived = task_archive_service.iter_tasks(user_id, start_date, end_date)
+        else:
+            tasks = task_repository.iter_user_tasks(user_id)
+            archived = task_archive_service.iter_tasks(user_id)
+        return _csv_chunks(task for task in itertools.chain(tasks, archived) if user_id in task.assigned_users)
     
     def export_to_csv(self, user_id: int, start_date: datetime, 
                      end_date: datetime) -> str:
+        return ''.join(self.iter_csv(user_id, start_date, end_date))
+    
+    def import_csv(self, user_id: int, lines: Iterable[str],
+                   progress: Optional[Callable[[ImportResult], None]] = None) -> ImportResult:
+        """Потоковый импорт задач из CSV в формате выгрузки (столбцы по заголовку).
+        
+        Строки читаются по одной и проверяются пачками по столбцам; корректные
+        строки пачки добавляются одним add_many. Дедлайн задачи - время окончания.
+        Столбец ID (ID в исходной системе) служит ключом от повторного импорта.
+        """
         user = user_repository.get_by_id(user_id)
         if not user:
             raise ValueError("Пользователь не найден")
         
-        tasks = task_repository.get_by_date_range(start_date, end_date)
-        user_tasks = [task for task in tasks if user_id in task.assigned_users]
+        reader = csv.reader(lines)
+        header = next(reader, None)
+        if not header:
+            raise ValueError("Пустой файл")
+        columns = {name.strip(): index for index, name in enumerate(header)}
+        if 'Название' not in columns:
+            raise ValueError("Нет обязательного столбца 'Название'")
         
-        output = io.StringIO()
-        writer = csv.writer(output)
+        result = ImportResult()
+        seen = set()
+        batch: List[Tuple[int, List[str]]] = []
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            batch.append((reader.line_num, row))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                self._import_csv_batch(user_id, columns, batch, seen, result)
+                batch = []
+                if progress:
+                    progress(result)
         
-        # Заголовок
-        writer.writerow([
-            'ID', 'Название', 'Описание', 'Начало', 'Окончание', 
-            'Длительность (мин)', 'Приоритет', 'Статус', 'Создано', 'Обновлено'
-        ])
+        self._import_csv_batch(user_id, columns, batch, seen, result)
+        if progress:
+            progress(result)
+        return result
+    
+    def _import_csv_batch(self, user_id: int, columns: Dict[str, int], batch: List[Tuple[int, List[str]]],
+                          seen: set, result: ImportResult) -> None:
+        if not batch:
+            return
+        rows = [row for _, row in batch]
+        
+        def column(name: str) -> List[str]:
+            index = columns.get(name)
+            if index is None:
+                return [''] * len(rows)
+            return [row[index].strip() if index < len(row) else '' for row in rows]
         
-        # Данные
-        for task in user_tasks:
-            writer.writerow([
-                task.id,
-                task.title,
-                task.description or '',
-                task.start_time.isoformat() if task.start_time else '',
-                task.end_time.isoformat() if task.end_time else '',
-                task.duration,
-                task.priority.value,
-                task.status.value,
-                task.created_at.isoformat(),
-                task.updated_at.isoformat()
-            ])
-        
-        return output.getvalue()
+        # Проверка по столбцам: ошибка строки - первая найденная
+        errors: Dict[int, str] = {}
+        ids = column('ID')
+        titles = column('Название')
+        descriptions = column('Описание')
+        starts = _csv_times(column('Начало'), 'Начало', errors)
+        ends = _csv_times(column('Окончание'), 'Окончание', errors)
+        priorities = _csv_choices(column('Приоритет'), _CSV_PRIORITIES, TaskPriority.MEDIUM, 'Приоритет', errors)
+        statuses = _csv_choices(column('Статус'), _CSV_STATUSES, TaskStatus.NEW, 'Статус', errors)
+        durations: List[Optional[int]] = []
+        for row, value in enumerate(column('Длительность (мин)')):
+            if value.isdigit():
+                durations.append(int(value))
+            else:
+                if value:
+                    errors.setdefault(row, f"Длительность (мин): ожидается целое число, получено '{value[:30]}'")
+                durations.append(None)
+        
+        now = datetime.now()
+        tasks: List[Task] = []
+        for row, (line_no, _) in enumerate(batch):
+            external_uid = f'csv:{ids[row]}' if ids[row] else None
+            if not titles[row]:
+                errors.setdefault(row, "Пустое название")
+            start, end, duration = starts[row], ends[row], durations[row]
+            if start and end and end < start:
+                errors.setdefault(row, "Окончание раньше начала")
+            if row in errors:
+                result.add_error(line_no, errors[row], external_uid)
+                continue
+            
+            # Недостающее время восстанавливается по длительности (по умолчанию час)
+            if duration is None:
+                duration = int((end - start).total_seconds() // 60) if start and end else 60
+            if end is None and start:
+                end = start + timedelta(minutes=duration)
+            if start is None and end and durations[row] is not None:
+                start = end - timedelta(minutes=duration)
+            
+            if external_uid:
+                if external_uid in seen or task_repository.get_by_external_uid(user_id, external_uid):
+                    result.duplicates += 1
+                    continue
+                seen.add(external_uid)
+            
+            tasks.append(Task(
+                id=0,
+                title=titles[row],
+                description=descriptions[row],
+                deadline=end,
+                start_time=start if start and end else None,
+                end_time=end if start and end else None,
+                duration=duration,
+                priority=priorities[row],
+                status=statuses[row],
+                created_at=now,
+                updated_at=now,
+                creator_id=user_id,
+                assigned_users=[user_id],
+                external_uid=external_uid
+            ))
+        
+        result.processed += len(batch)
+        if tasks:
+            task_repository.add_many(tasks)
+            deadline_scheduler.schedule_all(tasks)
+            result.created_tasks += len(tasks)
     
     def import_from_ical(self, user_id: int, ical_content: str) -> bool:
-        # В реальной системе здесь была бы реализация импорта из iCalendar
-        # Для простоты возвращаем успех
-        return True
\ No newline at end of file
+        result = self.import_ical(user_id, io.StringIO(ical_content))
+        return result.failed == 0
+    
+    def import_ical(self, user_id: int, lines: Iterable[str],
+                    progress: Optional[Callable[[ImportResult], None]] = None) -> ImportResult:
+        """Потоковый импорт календаря: компоненты читаются по одному.
+        
+        VTODO и VEVENT-задачи становятся задачами, остальные VEVENT - событиями;
+        повторения (RRULE/EXDATE) разворачиваются в отдельные вхождения.
+        Записи с уже известным UID пропускаются, поэтому повторный импорт
+        того же файла ничего не меняет. Новые записи добавляются пачками,
+        после каждой пачки вызывается progress.
+        """
+        user = user_repository.get_by_id(user_id)
+        if not user:
+            raise ValueError("Пользователь не найден")
+        
+        result = ImportResult()
+        now = datetime.now()
+        pending: List[Union[Task, Event]] = []
+        seen = set()
+        
+        for item in iter_components(lines):
+            result.processed += 1
+            uid = unescape_text(item.value('UID', '')) or None
+            try:
+                if item.errors:
+                    raise ValueError(item.errors[0])
+                if item.get('RECURRENCE-ID') is not None:
+                    # Измененное вхождение серии: вхождение могло еще не попасть в репозиторий
+                    self._flush_import(pending, result)
+                    pending = []
+                for entity in self._map_component(user_id, item, uid, now):
+                    if item.get('RECURRENCE-ID') is not None:
+                        changed = self._apply_override(user_id, entity)
+                        if changed is not None:
+                            if changed:
+                                result.updated += 1
+                            else:
+                                result.duplicates += 1
+                            continue
+                    key = (type(entity), entity.external_uid)
+                    if entity.external_uid and (key in seen or self._is_imported(user_id, entity)):
+                        result.duplicates += 1
+                        continue
+                    seen.add(key)
+                    pending.append(entity)
+            except Exception as e:
+                result.add_error(item.line_no, str(e), uid)
+            
+            if len(pending) >= IMPORT_BATCH_SIZE:
+                self._flush_import(pending, result)
+                pending = []
+                if progress:
+                    progress(result)
+        
+        self._flush_import(pending, result)
+        if progress:
+            progress(result)
+        return result
+    
+    def _is_imported(self, user_id: int, entity: Union[Task, Event]) -> bool:
+        repository = task_repository if isinstance(entity, Task) else event_repository
+        return repository.get_by_external_uid(user_id, entity.external_uid) is not None
+    
+    def _apply_override(self, user_id: int, entity: Union[Task, Event]) -> Optional[bool]:
+        """Перенести изменения вхождения серии на уже импортированную запись.
+        
+        None - вхождение не найдено, False - изменений нет, True - запись обновлена.
+        """
+        repository = task_repository if isinstance(entity, Task) else event_repository
+        existing = repository.get_by_external_uid(user_id, entity.external_uid)
+        if existing is None:
+            return None
+        
+        fields = ('title', 'description', 'start_time', 'end_time')
+        if isinstance(entity, Task):
+            fields += ('deadline', 'duration', 'priority', 'status')
+        if all(getattr(existing, name) == getattr(entity, name) for name in fields):
+            return False
+        for name in fields:
+            setattr(existing, name, getattr(entity, name))
+        repository.update(existing)
+        if isinstance(existing, Task):
+            deadline_scheduler.schedule(existing)
+        return True
+    
+    def _map_component(self, user_id: int, item: ICalComponent, uid: Optional[str],
+                       now: datetime) -> Iterator[Union[Task, Event]]:
+        """Сущности приложения для одного компонента (по одной на вхождение)"""
+        title = unescape_text(item.value('SUMMARY', '')) or 'Без названия'
+        description = unescape_text(item.value('DESCRIPTION', ''))
+        
+        start_prop = item.get('DTSTART')
+        end_prop = item.get('DTEND') or item.get('DUE')
+        if start_prop is None and end_prop is None:
+            raise ValueError("Нет DTSTART")
+        start = parse_datetime(start_prop) if start_prop else None
+        end = parse_datetime(end_prop) if end_prop else None
+        if end is None:
+            duration = item.value('DURATION')
+            all_day = start_prop[0].get('VALUE') == 'DATE' or len(start_prop[1].strip()) == 8
+            length = parse_duration(duration) if duration else timedelta(days=1 if all_day else 0, hours=0 if all_day else 1)
+            end = start + length
+        if start is None:
+            start = end
+        if end < start:
+            raise ValueError("DTEND раньше DTSTART")
+        length = end - start
+        
+        recurrence_id = item.get('RECURRENCE-ID')
+        if recurrence_id:
+            # Измененное вхождение серии - отдельная запись с UID вхождения
+            occurrences = [(start, format_datetime(parse_datetime(recurrence_id)))]
+        else:
+            occurrences = _occurrences(item, start, now)
+        
+        as_task = _is_task(item)
+        for occurrence_start, suffix in occurrences:
+            external_uid = f'{uid}/{suffix}' if uid and suffix else uid
+            occurrence_end = occurrence_start + length
+            if as_task:
+                yield Task(
+                    id=0,
+                    title=title,
+                    description=description,
+                    deadline=occurrence_end,
+                    start_time=occurrence_start,
+                    end_time=occurrence_end,
+                    duration=int(length.total_seconds() // 60),
+                    priority=_ical_priority(item.value('PRIORITY')),
+                    status=_TASK_STATUS_BY_ICAL.get(item.value('STATUS'), TaskStatus.NEW),
+                    created_at=now,
+                    updated_at=now,
+                    creator_id=user_id,
+                    assigned_users=[user_id],
+                    external_uid=external_uid
+                )
+            else:
+                yield Event(
+                    id=0,
+                    title=title,
+                    description=description,
+                    start_time=occurrence_start,
+                    end_time=occurrence_end,
+                    owner_id=user_id,
+                    is_shared=False,
+                    created_at=now,
+                    external_uid=external_uid
+                )
+    
+    def _flush_import(self, pending: List[Union[Task, Event]], result: ImportResult) -> None:
+        tasks = [entity for entity in pending if isinstance(entity, Task)]
+        events = [entity for entity in pending if isinstance(entity, Event)]
+        if tasks:
+            task_repository.add_many(tasks)
+            deadline_scheduler.schedule_all(tasks)
+            result.created_tasks += len(tasks)
+        if events:
+            event_repository.add_many(events)
+            result.created_events += len(events)
\ No newline at end of file
@@ -1,9 +1,91 @@
 # src/services/notification_service.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from src.domain.interfaces import INotificationService
 from src.domain.entities import Message, MessageType, Task, TaskStatus
 from src.repositories import message_repository, task_repository, user_repository
+from src.services.deadline_scheduler import deadline_scheduler
+from src.services.delivery_pipeline import DeliveryQueueFull, delivery_pipeline
+from src.services.digest_service import digest_service
+from src.utils.ttl_set import TTLSet
+from src.utils.pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE
+
+# Коды видов напоминаний в ключах идемпотентности
+_REMINDER_KINDS = {'reminder': 0, 'deadline': 1, 'urgent': 2}
+
+# Сколько помнить отправленное напоминание после дедлайна
+REMINDER_KEY_GRACE = timedelta(days=1)
+
+# Отправленные напоминания: (задача, вид, порог, дедлайн) - общий для всех экземпляров сервиса
+_sent_reminders = TTLSet(REMINDER_KEY_GRACE)
+
+
+def _reminder_key(task: Task, kind: str, threshold: int) -> Tuple[int, int, int, int]:
+    return task.id, _REMINDER_KINDS[kind], threshold, int(task.deadline.timestamp())
+
+
+def _claim_reminder(task: Task, kind: str, threshold: int) -> bool:
+    """Занять ключ напоминания; False, если оно уже отправлялось.
+    
+    Дедлайн входит в ключ, поэтому его изменение заново "взводит" напоминания.
+    """
+    return _sent_reminders.add(_reminder_key(task, kind, threshold),
+                               expires_at=task.deadline + REMINDER_KEY_GRACE)
+
+
+def _release_reminder(task: Task, kind: str, threshold: int) -> None:
+    """Освободить ключ напоминания, которое не удалось поставить в доставку"""
+    _sent_reminders.discard(_reminder_key(task, kind, threshold))
+
+
+# Шаблон напоминания -> вид (порог берется из параметров или задан явно)
+_REMINDER_TEMPLATES = {'task_reminder': ('reminder', None), 'deadline_today': ('deadline', 24),
+                       'deadline_urgent': ('urgent', None)}
+
+
+def restore_sent_reminders(messages: List[Message]) -> int:
+    """Восстановить ключи отправленных напоминаний по уже разосланным сообщениям.
+    
+    Множество ключей живет только в памяти: без этого после загрузки снимка
+    планировщик заново отправил бы все напоминания с прошедшим порогом.
+    Сообщение засчитывается текущему дедлайну задачи, если отправлено не
+    раньше порога - после переноса дедлайна напоминание снова будет отправлено.
+    """
+    now = datetime.now()
+    restored = 0
+    for message in messages:
+        reminder = _REMINDER_TEMPLATES.get(message.template_id)
+        if not reminder or message.related_entity_type != 'task':
+            continue
+        task = task_repository.get_by_id(message.related_entity_id)
+        if not task or not task.deadline or task.deadline + REMINDER_KEY_GRACE <= now:
+            continue
+        
+        kind, threshold = reminder
+        if threshold is None:
+            threshold = message.template_params[1]
+        if message.sent_at < task.deadline - timedelta(hours=threshold):
+            continue
+        if _claim_reminder(task, kind, threshold):
+            restored += 1
+    return restored
+
+
+def _without_digest(user_ids: List[int], task: Task) -> List[int]:
+    """Получатели без режима сводки: остальные увидят задачу в ежедневной сводке.
+    
+    Если сводка задачу не покажет (создана или перенесена после рассылки, а
+    дедлайн наступит раньше следующей), напоминание получают все.
+    """
+    if not digest_service.covers(task, datetime.now()):
+        return list(user_ids)
+    result = []
+    for user_id in user_ids:
+        user = user_repository.get_by_id(user_id)
+        if not user or not user.notification_digest:
+            result.append(user_id)
+    return result
+
 
 class NotificationService(INotificationService):
     def __init__(self):
@@ -14,21 +96,11 @@ class NotificationService(INotificationService):
         if not task or not task.deadline:
             return False
         
-        reminder_time = task.deadline - timedelta(hours=hours_before)
-        
-        for user_id in task.assigned_users:
-            message = Message(
-                id=0,
-                text=f"Напоминание: задача '{task.title}' через {hours_before} часа(ов)",
-                sent_at=reminder_time,
-                message_type=MessageType.TASK_REMINDER,
-                user_id=user_id,
-                is_read=False,
-                related_entity_id=task_id,
-                related_entity_type='task'
-            )
-            message_repository.add(message)
+        if not _claim_reminder(task, 'reminder', hours_before):
+            return True
         
+        self._fan_out_reminder(task, 'reminder', hours_before, _without_digest(task.assigned_users, task),
+                               'task_reminder', (task.title, hours_before), MessageType.TASK_REMINDER)
         return True
     
     def send_deadline_notification(self, task_id: int) -> bool:
@@ -36,79 +108,136 @@ class NotificationService(INotificationService):
         if not task or not task.deadline:
             return False
         
-        for user_id in task.assigned_users:
-            message = Message(
-                id=0,
-                text=f"СРОЧНО: дедлайн задачи '{task.title}' сегодня!",
-                sent_at=datetime.now(),
-                message_type=MessageType.DEADLINE,
-                user_id=user_id,
-                is_read=False,
-                related_entity_id=task_id,
-                related_entity_type='task'
-            )
-            message_repository.add(message)
+        if not _claim_reminder(task, 'deadline', 24):
+            return True
         
+        self._fan_out_reminder(task, 'deadline', 24, _without_digest(task.assigned_users, task),
+                               'deadline_today', (task.title,), MessageType.DEADLINE)
         return True
     
     def send_schedule_change_notification(self, schedule_id: int, 
                                         user_ids: List[int]) -> bool:
-        for user_id in user_ids:
-            message = Message(
+        try:
+            self.fan_out(user_ids, 'schedule_change', (schedule_id,),
+                         MessageType.SCHEDULE_CHANGE, schedule_id, 'schedule')
+        except DeliveryQueueFull as e:
+            print(f"Уведомление об изменении расписания {schedule_id} не отправлено: {e}")
+            return False
+        return True
+    
+    def _fan_out_reminder(self, task: Task, kind: str, threshold: int, user_ids: List[int],
+                          template_id: str, params: Tuple[Any, ...], message_type: MessageType) -> None:
+        """Разослать занятое напоминание; при переполненной очереди ключ освобождается.
+        
+        DeliveryQueueFull передается дальше: планировщик повторит напоминание позже.
+        """
+        try:
+            self.fan_out(user_ids, template_id, params, message_type, task.id, 'task')
+        except DeliveryQueueFull:
+            _release_reminder(task, kind, threshold)
+            raise
+    
+    def fan_out(self, user_ids: List[int], template_id: str, params: Tuple[Any, ...],
+                message_type: MessageType, related_entity_id: Optional[int] = None,
+                related_entity_type: Optional[str] = None) -> List[Message]:
+        """Разослать одно сообщение нескольким получателям одной пачкой.
+        
+        Все копии ссылаются на один кортеж параметров шаблона, текст
+        рендерится только при чтении. Доставка идет через конвейер:
+        запрос не ждет записи во входящие и внешних получателей.
+        """
+        params = tuple(params)
+        now = datetime.now()
+        messages = [
+            Message(
                 id=0,
-                text=f"Изменения в расписании #{schedule_id}",
-                sent_at=datetime.now(),
-                message_type=MessageType.SCHEDULE_CHANGE,
+                template_id=template_id,
+                template_params=params,
+                sent_at=now,
+                message_type=message_type,
                 user_id=user_id,
                 is_read=False,
-                related_entity_id=schedule_id,
-                related_entity_type='schedule'
+                related_entity_id=related_entity_id,
+                related_entity_type=related_entity_type
             )
-            message_repository.add(message)
-        
-        return True
+            for user_id in dict.fromkeys(user_ids)
+        ]
+        return delivery_pipeline.submit(messages)
     
     def get_user_notifications(self, user_id: int) -> List[Message]:
+        """Уведомления пользователя - чтение из индекса входящих.
+        
+        Сообщения о дедлайнах помечаются прочитанными в момент завершения задачи
+        (TaskService), поэтому здесь ничего не изменяется.
+        """
         user = user_repository.get_by_id(user_id)
         if not user:
             return []
         
-        messages = message_repository.get_user_messages(user_id)
+        return message_repository.get_user_messages(user_id)
+    
+    def get_notifications_page(self, user_id: int, cursor: Optional[str] = None,
+                               limit: int = DEFAULT_PAGE_SIZE, message_type: Optional[str] = None,
+                               unread_only: bool = False) -> Dict[str, Any]:
+        """Страница уведомлений от новых к старым с keyset-курсором по (sent_at, ID)"""
+        type_filter = None
+        if message_type:
+            try:
+                type_filter = MessageType(message_type)
+            except ValueError:
+                raise ValueError(f"Неизвестный тип уведомления: {message_type}")
         
-        # Помечаем сообщения о дедлайнах, если задачи уже выполнены
-        for message in messages:
-            if (message.message_type == MessageType.DEADLINE and 
-                message.related_entity_id and 
-                message.related_entity_type == 'task'):
-                task = task_repository.get_by_id(message.related_entity_id)
-                if task and task.status == TaskStatus.COMPLETED:
-                    message.is_read = True
+        before = decode_cursor(cursor, 'sent_at:desc') if cursor else None
+        messages, last_key = message_repository.get_user_messages_page(
+            user_id, limit, before, type_filter, unread_only
+        )
         
-        return messages
+        return {
+            'notifications': messages,
+            'next_cursor': encode_cursor('sent_at:desc', last_key) if last_key else None
+        }
     
-    def check_upcoming_deadlines(self):
-        """Проверяет приближающиеся дедлайны и отправляет уведомления"""
-        now = datetime.now()
-        tasks = task_repository.get_all()
+    def get_unread_count(self, user_id: int) -> int:
+        return message_repository.count_unread(user_id)
+    
+    def mark_as_read(self, user_id: int, message_id: int) -> bool:
+        """Пометить прочитанным сообщение пользователя (чужие сообщения не трогаем)"""
+        message = message_repository.get_by_id(message_id)
+        if not message or message.user_id != user_id:
+            return False
+        return message_repository.mark_as_read(message_id)
+    
+    def mark_all_as_read(self, user_id: int) -> int:
+        return message_repository.mark_all_as_read(user_id)
+    
+    def delete_notification(self, user_id: int, message_id: int) -> bool:
+        message = message_repository.get_by_id(message_id)
+        if not message or message.user_id != user_id:
+            return False
+        return message_repository.delete(message_id)
+    
+    def get_related_tasks(self, messages: List[Message]) -> Dict[int, Task]:
+        """Связанные с сообщениями задачи одним пакетным запросом"""
+        task_ids = [message.related_entity_id for message in messages
+                    if message.related_entity_type == 'task' and message.related_entity_id]
+        return task_repository.get_many(task_ids)
+    
+    def send_urgent_deadline_notification(self, task_id: int, hours_before: int = 1) -> bool:
+        task = task_repository.get_by_id(task_id)
+        if not task or not task.deadline:
+            return False
+        
+        if not _claim_reminder(task, 'urgent', hours_before):
+            return True
+        
+        self._fan_out_reminder(task, 'urgent', hours_before, [task.creator_id],
+                               'deadline_urgent', (task.title, hours_before), MessageType.DEADLINE)
+        return True
+    
+    def check_upcoming_deadlines(self) -> int:
+        """Отправляет наступившие напоминания о дедлайнах.
         
-        for task in tasks:
-            if task.status != TaskStatus.COMPLETED and task.deadline:
-                time_to_deadline = task.deadline - now
-                
-                # Если дедлайн через 24 часа
-                if timedelta(hours=0) < time_to_deadline <= timedelta(hours=24):
-                    self.send_deadline_notification(task.id)
-                
-                # Если дедлайн через 1 час
-                elif timedelta(minutes=0) < time_to_deadline <= timedelta(hours=1):
-                    urgent_message = Message(
-                        id=0,
-                        text=f"СРОЧНО: дедлайн задачи '{task.title}' через 1 час!",
-                        sent_at=datetime.now(),
-                        message_type=MessageType.DEADLINE,
-                        user_id=task.creator_id,
-                        is_read=False,
-                        related_entity_id=task.id,
-                        related_entity_type='task'
-                    )
-                    message_repository.add(urgent_message)
\ No newline at end of file
+        Напоминания планируются при создании/изменении задач, поэтому здесь
+        извлекаются только наступившие записи из кучи планировщика.
+        """
+        return deadline_scheduler.run_due()
@@ -187,7 +187,7 @@ class PlanningService(IPlanningService):
             raise ValueError("Пользователь не найден")
         
         # Создаем группу
-        group = group_repository.Group(
+        group = Group(
             id=0,
             name=name,
             description=description,
@@ -212,8 +212,8 @@ class PlanningService(IPlanningService):
         saved_group = group_repository.add(group)
         
         return {
-            'group': saved_group.to_dict(),
-            'schedule': schedule.to_dict(),
+            'group': saved_group,
+            'schedule': schedule,
             'message': 'Группа успешно создана'
         }
     
@@ -242,8 +242,8 @@ class PlanningService(IPlanningService):
         group_repository.update(group)
         
         return {
-            'group': group.to_dict(),
-            'user': user.to_dict(),
+            'group': group,
+            'user': user,
             'message': f'Вы присоединились к группе "{group.name}"'
         }
     
@@ -264,7 +264,7 @@ class PlanningService(IPlanningService):
         group_repository.update(group)
         
         return {
-            'group': group.to_dict(),
+            'group': group,
             'message': f'Вы покинули группу "{group.name}"'
         }
     
@@ -370,7 +370,7 @@ class PlanningService(IPlanningService):
         
         return common_slots[:5]  # Возвращаем максимум 5 вариантов
     
-    def get_user_groups(self, user_id: int) -> List[Dict[str, Any]]:
+    def get_user_groups(self, user_id: int) -> List[Group]:
         """Получить все группы пользователя"""
         from src.repositories import group_repository
         
@@ -379,7 +379,7 @@ class PlanningService(IPlanningService):
         
         for group in all_groups:
             if any(member.id == user_id for member in group.members):
-                user_groups.append(group.to_dict())
+                user_groups.append(group)
         
         return user_groups
     
@@ -416,7 +416,7 @@ class PlanningService(IPlanningService):
         saved_group = group_repository.add(group)
         
         return {
-            'group': saved_group.to_dict(),
-            'schedule': schedule.to_dict(),
+            'group': saved_group,
+            'schedule': schedule,
             'message': 'Группа успешно создана'
         }
\ No newline at end of file
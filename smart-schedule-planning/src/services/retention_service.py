@@ -0,0 +1,158 @@
+# src/services/retention_service.py
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.domain.entities import Message, MessageType
+from src.repositories import message_repository
+from src.repositories.segment_archive import SegmentArchive
+
+# Каталог архивов на диске
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', os.path.join('data', 'archive'))
+
+# Сколько хранить сообщение каждого типа во "входящих", даже непрочитанное
+DEFAULT_MESSAGE_TTL: Dict[MessageType, timedelta] = {
+    MessageType.TASK_REMINDER: timedelta(days=7),
+    MessageType.DEADLINE: timedelta(days=14),
+    MessageType.SCHEDULE_CHANGE: timedelta(days=30),
+    MessageType.GROUP_INVITE: timedelta(days=30),
+    MessageType.SYSTEM: timedelta(days=90),
+    MessageType.DIGEST: timedelta(days=7),
+}
+
+# Максимум сообщений в одном сегменте архива
+SEGMENT_SIZE = 10000
+
+
+@dataclass
+class RetentionPolicy:
+    ttl_by_type: Dict[MessageType, timedelta] = field(default_factory=lambda: dict(DEFAULT_MESSAGE_TTL))
+    # Прочитанные сообщения уходят в архив после этой задержки
+    read_grace: timedelta = timedelta(days=1)
+    # Период фонового уплотнения
+    interval: timedelta = timedelta(minutes=10)
+
+    @classmethod
+    def from_env(cls) -> 'RetentionPolicy':
+        """Политика с переопределениями из окружения, например MESSAGE_TTL_DAYS_SYSTEM=30"""
+        policy = cls()
+        for message_type in MessageType:
+            value = os.environ.get(f'MESSAGE_TTL_DAYS_{message_type.name}')
+            if value:
+                policy.ttl_by_type[message_type] = timedelta(days=float(value))
+        if os.environ.get('MESSAGE_READ_GRACE_HOURS'):
+            policy.read_grace = timedelta(hours=float(os.environ['MESSAGE_READ_GRACE_HOURS']))
+        return policy
+
+    def is_expired(self, message: Message, now: datetime) -> bool:
+        age = now - message.sent_at
+        if message.is_read and age >= self.read_grace:
+            return True
+        ttl = self.ttl_by_type.get(message.message_type)
+        return ttl is not None and age >= ttl
+
+
+def message_to_record(message: Message) -> Dict[str, Any]:
+    return {
+        'id': message.id,
+        'template_id': message.template_id,
+        'params': list(message.template_params),
+        'sent_at': message.sent_at.isoformat(),
+        'message_type': message.message_type.value,
+        'user_id': message.user_id,
+        'is_read': message.is_read,
+        'related_entity_id': message.related_entity_id,
+        'related_entity_type': message.related_entity_type,
+    }
+
+
+def record_to_message(record: Dict[str, Any]) -> Message:
+    return Message(
+        id=record['id'],
+        template_id=record['template_id'],
+        template_params=tuple(record['params']),
+        sent_at=datetime.fromisoformat(record['sent_at']),
+        message_type=MessageType(record['message_type']),
+        user_id=record['user_id'],
+        is_read=record['is_read'],
+        related_entity_id=record['related_entity_id'],
+        related_entity_type=record['related_entity_type']
+    )
+
+
+class RetentionService:
+    """Хранение уведомлений: перенос прочитанных и устаревших сообщений в архив"""
+
+    def __init__(self, policy: Optional[RetentionPolicy] = None,
+                 archive: Optional[SegmentArchive] = None):
+        self.policy = policy or RetentionPolicy.from_env()
+        self.archive = archive or SegmentArchive(os.path.join(ARCHIVE_DIR, 'messages'), 'messages')
+        self._compact_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """Перенести подходящие сообщения в архив; возвращает их число.
+
+        Отбор кандидатов - короткий проход под блокировкой репозитория, запись
+        сегментов идет без нее, а из памяти сообщения удаляются только после
+        того, как сегмент записан на диск.
+        """
+        now = now or datetime.now()
+        with self._compact_lock:
+            candidates = [message for message in message_repository.get_all()
+                          if self.policy.is_expired(message, now)]
+            if not candidates:
+                return 0
+
+            candidates.sort(key=lambda message: (message.sent_at, message.id))
+            archived = 0
+            for start in range(0, len(candidates), SEGMENT_SIZE):
+                chunk = candidates[start:start + SEGMENT_SIZE]
+                self.archive.append_segment([message_to_record(m) for m in chunk],
+                                            owner_field='user_id', key_field='sent_at')
+                archived += message_repository.remove_many([message.id for message in chunk])
+            return archived
+
+    def get_archive_page(self, user_id: int, cursor: Optional[str] = None,
+                         limit: int = 20) -> Tuple[List[Message], Optional[str]]:
+        """Страница архива пользователя: от последних сегментов к первым,
+        внутри сегмента - от новых сообщений к старым"""
+        position = None
+        if cursor:
+            try:
+                seq, offset = cursor.split(':')
+                position = (int(seq), int(offset))
+            except ValueError:
+                raise ValueError("Некорректный курсор")
+
+        records, next_position = self.archive.page(user_id, 'user_id', position, limit)
+        next_cursor = f'{next_position[0]}:{next_position[1]}' if next_position else None
+        return [record_to_message(record) for record in records], next_cursor
+
+    def start(self) -> None:
+        """Запустить фоновое уплотнение"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='message-retention', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.policy.interval.total_seconds()):
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Ошибка уплотнения уведомлений: {e}")
+
+
+# Единый сервис хранения для всего приложения
+retention_service = RetentionService()
@@ -4,6 +4,7 @@ from datetime import datetime
 from src.domain.interfaces import IScheduleService
 from src.domain.entities import Schedule, Task
 from src.repositories import schedule_repository, task_repository, user_repository
+from src.utils.serialization import serialize_many
 
 class ScheduleService(IScheduleService):
     def __init__(self):
@@ -57,5 +58,5 @@ class ScheduleService(IScheduleService):
         
         return {
             'schedule': schedule.to_dict(),
-            'tasks': [task.to_dict() for task in tasks]
+            'tasks': serialize_many(tasks)
         }
\ No newline at end of file
@@ -0,0 +1,414 @@
+# src/services/snapshot_service.py
+import dataclasses
+import gc
+import json
+import marshal
+import mmap
+import os
+import struct
+import threading
+import time
+import typing
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.domain.entities import Event, Group, Message, Schedule, Task, User
+from src.repositories import (event_repository, group_repository, message_repository,
+                              schedule_repository, task_repository, user_repository)
+from src.repositories.indexes import gc_paused
+
+# Файл снимка; пустое значение отключает снимки
+SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH', os.path.join('data', 'snapshot.bin'))
+
+# Формат файла:
+#   MAGIC, версия формата (uint16)
+#   блоки данных: marshal от кортежа столбцов (по BLOCK_SIZE записей)
+#   заголовок JSON: разделы, поля и кодеки, смещения блоков
+#   смещение заголовка (uint64), MAGIC
+MAGIC = b'SSPSNAP\x00'
+FORMAT_VERSION = 1
+BLOCK_SIZE = 65536
+# Сколько запрос ждет окончания фоновой загрузки снимка
+RESTORE_WAIT_SECONDS = float(os.environ.get('SNAPSHOT_RESTORE_WAIT', '30'))
+_PREFIX = struct.Struct('<8sH')
+_TRAILER = struct.Struct('<Q8s')
+
+# Ссылки между сущностями хранятся как ID и связываются заново при загрузке
+REFERENCES: Dict[Tuple[type, str], str] = {
+    (User, 'groups'): 'groups',
+    (Group, 'members'): 'users',
+    (Group, 'schedule'): 'schedules',
+    (Schedule, 'tasks'): 'tasks',
+    (Schedule, 'events'): 'events',
+}
+
+# Разделы снимка: имя -> (класс сущности, репозиторий)
+SECTIONS: Dict[str, Tuple[type, Any]] = {
+    'users': (User, user_repository),
+    'groups': (Group, group_repository),
+    'schedules': (Schedule, schedule_repository),
+    'tasks': (Task, task_repository),
+    'events': (Event, event_repository),
+    'messages': (Message, message_repository),
+}
+
+
+# Дополнение прочитанных разделов перед связыванием: (разделы, заголовок снимка)
+Replay = Callable[[Dict[str, Tuple[list, int]], Dict[str, Any]], None]
+
+
+class SnapshotError(Exception):
+    """Снимок поврежден или несовместим с текущими сущностями"""
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    if typing.get_origin(annotation) is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _field_codec(cls: type, field: dataclasses.Field) -> Tuple[str, Optional[str]]:
+    """Кодек поля: (вид, параметр) - по типу из аннотации dataclass"""
+    target = REFERENCES.get((cls, field.name))
+    if target:
+        kind = 'refs' if typing.get_origin(field.type) is list else 'ref'
+        return kind, target
+    annotation = _unwrap_optional(field.type)
+    if annotation is datetime:
+        return 'datetime', None
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return 'enum', annotation.__name__
+    return 'raw', None
+
+
+def _encoder(kind: str) -> Callable[[Any], Any]:
+    if kind == 'datetime':
+        # ISO-строка: datetime.fromisoformat при загрузке быстрее любой арифметики
+        return lambda value: None if value is None else value.isoformat()
+    if kind == 'enum':
+        return lambda value: None if value is None else value.value
+    if kind == 'ref':
+        return lambda value: None if value is None else value.id
+    if kind == 'refs':
+        return lambda values: [value.id for value in values]
+    return lambda value: value
+
+
+def _decode_column(kind: str, param: Optional[str], values: list) -> list:
+    if kind == 'datetime':
+        convert = datetime.fromisoformat
+    elif kind == 'enum':
+        members = _ENUM_VALUES.get(param)
+        if members is None:
+            raise SnapshotError(f"Неизвестное перечисление в снимке: {param}")
+        convert = members.__getitem__
+    else:
+        return values
+    # map без проверок на None заметно быстрее генератора списка
+    if None in values:
+        return [None if value is None else convert(value) for value in values]
+    return list(map(convert, values))
+
+
+def _collect_enums() -> Dict[str, type]:
+    enums = {}
+    for cls, _ in SECTIONS.values():
+        for field in dataclasses.fields(cls):
+            annotation = _unwrap_optional(field.type)
+            if isinstance(annotation, type) and issubclass(annotation, Enum):
+                enums[annotation.__name__] = annotation
+    return enums
+
+
+# Значения перечислений по имени класса: 'TaskStatus' -> {'новая': TaskStatus.NEW, ...}
+_ENUM_VALUES = {name: {member.value: member for member in enum_type}
+                for name, enum_type in _collect_enums().items()}
+
+
+def field_specs(cls: type) -> List[List[Any]]:
+    """Описание полей сущности для заголовка: [имя, вид кодека, параметр]"""
+    return [[field.name, *_field_codec(cls, field)] for field in dataclasses.fields(cls)]
+
+
+def row_encoder(cls: type) -> Callable[[Any], tuple]:
+    """Функция, превращающая сущность в кортеж значений полей (в порядке field_specs)"""
+    getters = [(field.name, _encoder(_field_codec(cls, field)[0])) for field in dataclasses.fields(cls)]
+    return lambda entity: tuple(encode(getattr(entity, name)) for name, encode in getters)
+
+
+def decode_entities(cls: type, specs: List[List[Any]], columns: Tuple[list, ...], count: int) -> list:
+    """Сущности из столбцов, записанных по specs.
+
+    Столбцы расставляются в порядке полей сущности, и сущности создаются
+    вызовом конструктора через map. Полям, которых нет в записи, - значения
+    по умолчанию; поля, удаленные из сущности, пропускаются. Ссылки остаются
+    ID - их связывает вызывающий.
+    """
+    stored = {spec[0]: position for position, spec in enumerate(specs)}
+    ordered = []
+    for field in dataclasses.fields(cls):
+        position = stored.get(field.name)
+        if position is not None:
+            _, kind, param = specs[position]
+            ordered.append(_decode_column(kind, param, columns[position]))
+        elif field.default is not dataclasses.MISSING:
+            ordered.append([field.default] * count)
+        elif field.default_factory is not dataclasses.MISSING:
+            ordered.append([field.default_factory() for _ in range(count)])
+        else:
+            raise SnapshotError(f"В записи нет обязательного поля {cls.__name__}.{field.name}")
+    return list(map(cls, *ordered))
+
+
+@dataclasses.dataclass
+class SnapshotInfo:
+    path: str
+    created_at: datetime
+    bytes: int
+    seconds: float
+    counts: Dict[str, int]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'created_at': self.created_at.isoformat(),
+            'bytes': self.bytes,
+            'seconds': round(self.seconds, 3),
+            'counts': self.counts
+        }
+
+
+class SnapshotService:
+    """Снимок всех репозиториев в компактный версионированный двоичный файл.
+
+    Данные пишутся по столбцам блоками через marshal; имена полей и кодеки
+    лежат в заголовке, поэтому снимок читается и после добавления полей в
+    сущности (новые поля получают значения по умолчанию). Загрузка читает
+    файл через mmap, создает сущности по столбцам и восстанавливает ссылки
+    (участники групп, расписания); индексы репозиториев строятся при первом
+    обращении. При запуске приложения снимок грузится в фоне.
+    """
+
+    def __init__(self, path: Optional[str] = SNAPSHOT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.last_snapshot: Optional[SnapshotInfo] = None
+        self.last_error: Optional[str] = None
+        # Загрузка при запуске не удалась: в репозиториях не те данные, что на
+        # диске, и снимок поверх файлов писать нельзя
+        self.failed = False
+        # Сброшено, пока идет фоновая загрузка: данные в репозиториях неполные
+        self._ready = threading.Event()
+        self._ready.set()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def save(self, path: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> SnapshotInfo:
+        """Записать снимок (атомарно: временный файл и переименование).
+
+        extra - дополнительные поля заголовка (например, с какого сегмента
+        журнала изменений восстанавливать данные поверх снимка).
+        """
+        path = path or self.path
+        if not path:
+            raise SnapshotError("Путь снимка не задан")
+        if not self.ready:
+            # Иначе недозагруженные данные перезапишут полный снимок
+            raise SnapshotError("Снимок еще загружается")
+        if self.failed:
+            raise SnapshotError(f"Данные не загружены при запуске, снимок не записывается: {self.last_error}")
+
+        started = time.perf_counter()
+        created_at = datetime.now()
+        counts = {}
+        with self._lock, gc_paused():
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            partial = path + '.part'
+            with open(partial, 'wb') as output:
+                output.write(_PREFIX.pack(MAGIC, FORMAT_VERSION))
+                sections = []
+                for name, (cls, repository) in SECTIONS.items():
+                    entities, next_id = repository.dump()
+                    counts[name] = len(entities)
+                    sections.append(self._write_section(output, name, cls, entities, next_id))
+
+                header = json.dumps({
+                    **(extra or {}),
+                    'format': FORMAT_VERSION,
+                    'created_at': created_at.isoformat(),
+                    'marshal_version': marshal.version,
+                    'sections': sections
+                }, ensure_ascii=False).encode('utf-8')
+                header_offset = output.tell()
+                output.write(header)
+                output.write(_TRAILER.pack(header_offset, MAGIC))
+                output.flush()
+                os.fsync(output.fileno())
+            os.replace(partial, path)
+
+        self.last_snapshot = SnapshotInfo(path, created_at, os.path.getsize(path),
+                                          time.perf_counter() - started, counts)
+        return self.last_snapshot
+
+    def _write_section(self, output, name: str, cls: type, entities: list, next_id: int) -> Dict[str, Any]:
+        specs = field_specs(cls)
+        fields = dataclasses.fields(cls)
+        encoders = [_encoder(kind) for _, kind, _ in specs]
+        blocks = []
+        for start in range(0, len(entities), BLOCK_SIZE):
+            chunk = entities[start:start + BLOCK_SIZE]
+            columns = tuple(
+                [encode(getattr(entity, field.name)) for entity in chunk]
+                for field, encode in zip(fields, encoders)
+            )
+            data = marshal.dumps(columns)
+            blocks.append([output.tell(), len(data), len(chunk)])
+            output.write(data)
+        return {
+            'name': name,
+            'next_id': next_id,
+            'count': len(entities),
+            'fields': specs,
+            'blocks': blocks
+        }
+
+    def restore(self, path: Optional[str] = None, replay: Optional[Replay] = None) -> Optional[SnapshotInfo]:
+        """Загрузить снимок в репозитории; None, если загружать нечего.
+
+        replay(разделы, заголовок) получает прочитанные разделы до связывания
+        ссылок и может дополнить их (журнал изменений после снимка); тогда
+        загрузка идет и без файла снимка.
+        """
+        path = path or self.path
+        exists = bool(path) and os.path.exists(path)
+        if not exists and replay is None:
+            return None
+
+        started = time.perf_counter()
+        # Миллионы новых объектов без циклов: сборщик мусора только тратил бы
+        # время на их повторные обходы
+        with gc_paused():
+            header: Dict[str, Any] = {}
+            loaded: Dict[str, Tuple[list, int]] = {}
+            if exists:
+                with open(path, 'rb') as source, \
+                        mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    header = self._read_header(mapped)
+                    view = memoryview(mapped)
+                    try:
+                        loaded = {section['name']: self._read_section(view, section)
+                                  for section in header['sections'] if section['name'] in SECTIONS}
+                    finally:
+                        view.release()
+            if replay:
+                replay(loaded, header)
+
+            self._relink(loaded)
+            counts = {}
+            for name, (_, repository) in SECTIONS.items():
+                entities, next_id = loaded.get(name, ([], 1))
+                repository.restore(entities, next_id)
+                counts[name] = len(entities)
+        # Загруженные данные живут до конца процесса - убираем их из обходов сборщика
+        gc.freeze()
+
+        created_at = datetime.fromisoformat(header['created_at']) if header else datetime.now()
+        self.last_snapshot = SnapshotInfo(path, created_at, os.path.getsize(path) if exists else 0,
+                                          time.perf_counter() - started, counts)
+        return self.last_snapshot
+
+    def _read_header(self, mapped: mmap.mmap) -> Dict[str, Any]:
+        if len(mapped) < _PREFIX.size + _TRAILER.size:
+            raise SnapshotError("Файл снимка поврежден")
+        magic, version = _PREFIX.unpack_from(mapped, 0)
+        header_offset, trailer_magic = _TRAILER.unpack_from(mapped, len(mapped) - _TRAILER.size)
+        if magic != MAGIC or trailer_magic != MAGIC:
+            raise SnapshotError("Файл не является снимком или записан не до конца")
+        if version > FORMAT_VERSION:
+            raise SnapshotError(f"Неподдерживаемая версия снимка: {version}")
+        header = json.loads(mapped[header_offset:len(mapped) - _TRAILER.size].decode('utf-8'))
+        if header.get('marshal_version') != marshal.version:
+            raise SnapshotError("Снимок записан несовместимой версией Python")
+        return header
+
+    def _read_section(self, view: memoryview, section: Dict[str, Any]) -> Tuple[list, int]:
+        cls, _ = SECTIONS[section['name']]
+        entities = []
+        for offset, length, count in section['blocks']:
+            columns = marshal.loads(view[offset:offset + length])
+            entities.extend(decode_entities(cls, section['fields'], columns, count))
+        return entities, section['next_id']
+
+    def _relink(self, loaded: Dict[str, Tuple[list, int]]) -> None:
+        """Заменить ID в полях-ссылках объектами из загруженных разделов"""
+        by_id = {name: {entity.id: entity for entity in entities} for name, (entities, _) in loaded.items()}
+        for (cls, field_name), target in REFERENCES.items():
+            section = next(name for name, (section_cls, _) in SECTIONS.items() if section_cls is cls)
+            targets = by_id.get(target, {})
+            entities, _ = loaded.get(section, ([], 0))
+            for entity in entities:
+                value = getattr(entity, field_name)
+                if isinstance(value, list):
+                    setattr(entity, field_name, [targets[ref] for ref in value if ref in targets])
+                elif value is not None:
+                    setattr(entity, field_name, targets.get(value))
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = RESTORE_WAIT_SECONDS) -> bool:
+        """Дождаться окончания фоновой загрузки; False по истечении timeout"""
+        return self._ready.wait(timeout)
+
+    def restore_in_background(self, on_ready: Optional[Callable[[], None]] = None,
+                              replay: Optional[Replay] = None) -> None:
+        """Загрузить снимок в фоновом потоке и затем вызвать on_ready.
+
+        Приложение запускается сразу, не дожидаясь чтения большого снимка.
+        При ошибке загрузки on_ready не вызывается и сервис помечается
+        failed: файлы снимка и журнала остаются как есть, а запросы получают
+        ошибку, пока данные не исправят и приложение не перезапустят.
+        """
+        self._ready.clear()
+        thread = threading.Thread(target=self._run_restore, args=(on_ready, replay),
+                                  name='snapshot-restore', daemon=True)
+        thread.start()
+
+    def _run_restore(self, on_ready: Optional[Callable[[], None]], replay: Optional[Replay]) -> None:
+        try:
+            restored = self.restore(replay=replay)
+            if restored:
+                print(f"Данные восстановлены из снимка за {restored.seconds:.2f} с: {restored.counts}")
+        except Exception as e:
+            self.last_error = str(e)
+            self.failed = True
+            print(f"Не удалось восстановить снимок данных: {e}")
+            self._ready.set()
+            return
+        try:
+            # Запросы пускаются после on_ready: к этому времени журнал изменений уже пишется
+            if on_ready:
+                on_ready()
+        finally:
+            self._ready.set()
+
+    def save_on_exit(self) -> None:
+        if not self.enabled or not self.ready or self.failed:
+            return
+        try:
+            info = self.save()
+            print(f"Снимок данных сохранен: {info.path} ({info.bytes} байт)")
+        except Exception as e:
+            print(f"Не удалось сохранить снимок данных: {e}")
+
+
+# Единый сервис снимков для всего приложения
+snapshot_service = SnapshotService()
@@ -0,0 +1,224 @@
+# src/services/task_archive_service.py
+import heapq
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.domain.entities import Task, TaskPriority, TaskStatus
+from src.repositories import task_repository
+from src.repositories.segment_archive import SegmentArchive, SegmentInfo
+from src.services.retention_service import ARCHIVE_DIR, SEGMENT_SIZE
+
+# Через сколько дней после последнего изменения завершенная задача уходит в архив
+TASK_ARCHIVE_AFTER = timedelta(days=float(os.environ.get('TASK_ARCHIVE_AFTER_DAYS', '30')))
+# Период фонового переноса
+TASK_ARCHIVE_INTERVAL = timedelta(hours=1)
+
+
+def task_to_record(task: Task) -> Dict[str, Any]:
+    return {
+        'id': task.id,
+        'title': task.title,
+        'description': task.description,
+        'deadline': task.deadline.isoformat() if task.deadline else None,
+        'start_time': task.start_time.isoformat() if task.start_time else None,
+        'end_time': task.end_time.isoformat() if task.end_time else None,
+        'duration': task.duration,
+        'priority': task.priority.value,
+        'status': task.status.value,
+        'created_at': task.created_at.isoformat(),
+        'updated_at': task.updated_at.isoformat(),
+        'creator_id': task.creator_id,
+        'schedule_id': task.schedule_id,
+        'assigned_users': list(task.assigned_users),
+        'external_uid': task.external_uid,
+        'version': task.version,
+        # Все, кто видит задачу: по этому полю сегменты отбираются без распаковки
+        'owners': list(dict.fromkeys([task.creator_id, *task.assigned_users])),
+    }
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def record_to_task(record: Dict[str, Any]) -> Task:
+    return Task(
+        id=record['id'],
+        title=record['title'],
+        description=record['description'],
+        deadline=_parse_time(record['deadline']),
+        start_time=_parse_time(record['start_time']),
+        end_time=_parse_time(record['end_time']),
+        duration=record['duration'],
+        priority=TaskPriority(record['priority']),
+        status=TaskStatus(record['status']),
+        created_at=datetime.fromisoformat(record['created_at']),
+        updated_at=datetime.fromisoformat(record['updated_at']),
+        creator_id=record['creator_id'],
+        schedule_id=record['schedule_id'],
+        assigned_users=record['assigned_users'],
+        external_uid=record['external_uid'],
+        version=record['version']
+    )
+
+
+class TaskArchiveService:
+    """Холодное хранение завершенных задач.
+
+    Завершенные задачи, не менявшиеся дольше archive_after, переносятся из
+    репозитория в сжатые неизменяемые сегменты архива: сегменты идут в
+    порядке переноса, задачи внутри сегмента - по времени начала. Рабочий
+    набор в памяти остается маленьким, а отчеты и выгрузки читают архив
+    через итераторы: сегменты без нужного пользователя или вне диапазона
+    дат пропускаются по метаданным, не распаковываясь.
+    """
+
+    def __init__(self, archive_after: timedelta = TASK_ARCHIVE_AFTER,
+                 interval: timedelta = TASK_ARCHIVE_INTERVAL,
+                 archive: Optional[SegmentArchive] = None):
+        self.archive_after = archive_after
+        self.interval = interval
+        self.archive = archive or SegmentArchive(os.path.join(ARCHIVE_DIR, 'tasks'), 'tasks')
+        # Сегменты не меняются: число задач по (пользователь, приоритет) считается один раз
+        self._counts: Dict[int, Counter] = {}
+        self._archive_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_archivable(self, task: Task, now: datetime) -> bool:
+        return task.status == TaskStatus.COMPLETED and now - task.updated_at >= self.archive_after
+
+    def archive_completed(self, now: Optional[datetime] = None) -> int:
+        """Перенести подходящие задачи в архив; возвращает их число.
+
+        Задачи удаляются из репозитория только после того, как их сегмент
+        записан на диск.
+        """
+        now = now or datetime.now()
+        with self._archive_lock:
+            candidates = [task for task in task_repository.get_all() if self.is_archivable(task, now)]
+            if not candidates:
+                return 0
+
+            candidates.sort(key=lambda task: (task.updated_at, task.id))
+            archived = 0
+            for start in range(0, len(candidates), SEGMENT_SIZE):
+                chunk = candidates[start:start + SEGMENT_SIZE]
+                # Внутри сегмента - по времени начала: выборка по диапазону сливает сегменты потоково
+                ordered = sorted(chunk, key=lambda task: (task.start_time or datetime.min, task.id))
+                records = [task_to_record(task) for task in ordered]
+                info = self.archive.append_segment(records, owner_field='owners', key_field='updated_at',
+                                                   span_fields=('start_time', 'end_time'))
+                self._counts[info.seq] = self._count_records(records)
+                archived += task_repository.remove_many([task.id for task in chunk])
+            return archived
+
+    def iter_tasks(self, user_id: Optional[int] = None, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> Iterator[Task]:
+        """Архивные задачи пользователя (или всех).
+
+        Без диапазона - в порядке хранения. С диапазоном - только задачи с
+        интервалом времени, пересекающимся с [start, end], как у
+        TaskRepository.iter_user_tasks_in_range, упорядоченные по времени
+        начала: читаются лишь сегменты с подходящим интервалом, и они
+        сливаются потоково, без загрузки всей выборки в память.
+        """
+        if start is None and end is None:
+            for record in self.archive.iter_records(user_id, owner_field='owners'):
+                yield record_to_task(record)
+            return
+
+        streams = [self._iter_segment_range(info, user_id, start, end)
+                   for info in self.archive.segments(user_id, start=start and start.isoformat(),
+                                                     end=end and end.isoformat())]
+        yield from heapq.merge(*streams, key=lambda task: task.start_time)
+
+    def _iter_segment_range(self, info: SegmentInfo, user_id: Optional[int], start: Optional[datetime],
+                            end: Optional[datetime]) -> Iterator[Task]:
+        """Задачи сегмента из диапазона по возрастанию времени начала"""
+        records = self.archive.stream_segment(info)
+        if info.span is None:
+            # Сегменты без интервала в метаданных могли быть записаны не по времени начала
+            records = sorted(records, key=lambda record: record['start_time'] or '')
+        for record in records:
+            if user_id is not None and user_id not in record['owners']:
+                continue
+            start_time, end_time = _parse_time(record['start_time']), _parse_time(record['end_time'])
+            if not (start_time and end_time):
+                continue
+            if end is not None and start_time > end:
+                # Дальше в сегменте задачи начинаются еще позже
+                break
+            if start is not None and end_time < start:
+                continue
+            yield record_to_task(record)
+
+    def get_archive_page(self, user_id: int, cursor: Optional[str] = None,
+                         limit: int = 20) -> Tuple[List[Task], Optional[str]]:
+        """Страница архива пользователя: от последних перенесенных задач к первым"""
+        position = None
+        if cursor:
+            try:
+                seq, offset = cursor.split(':')
+                position = (int(seq), int(offset))
+            except ValueError:
+                raise ValueError("Некорректный курсор")
+
+        records, next_position = self.archive.page(user_id, 'owners', position, limit)
+        next_cursor = f'{next_position[0]}:{next_position[1]}' if next_position else None
+        return [record_to_task(record) for record in records], next_cursor
+
+    def count_by_priority(self, user_id: int) -> Dict[str, int]:
+        """Число архивных задач пользователя по значениям приоритета"""
+        result = {priority.value: 0 for priority in TaskPriority}
+        for info in self.archive.segments(user_id):
+            counts = self._segment_counts(info)
+            for priority in TaskPriority:
+                result[priority.value] += counts[(user_id, priority.value)]
+        return result
+
+    def count_tasks(self, user_id: int) -> int:
+        return sum(self.count_by_priority(user_id).values())
+
+    def _segment_counts(self, info: SegmentInfo) -> Counter:
+        counts = self._counts.get(info.seq)
+        if counts is None:
+            # Сегмент записан до запуска - считаем один раз при первом обращении
+            counts = self._count_records(self.archive.stream_segment(info))
+            self._counts[info.seq] = counts
+        return counts
+
+    def _count_records(self, records) -> Counter:
+        counts = Counter()
+        for record in records:
+            for owner in record['owners']:
+                counts[(owner, record['priority'])] += 1
+        return counts
+
+    def start(self) -> None:
+        """Запустить фоновый перенос в архив"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='task-archive', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval.total_seconds()):
+            try:
+                self.archive_completed()
+            except Exception as e:
+                print(f"Ошибка переноса задач в архив: {e}")
+
+
+# Единый сервис архива задач для всего приложения
+task_archive_service = TaskArchiveService()
@@ -2,8 +2,13 @@
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from src.domain.interfaces import ITaskService
-from src.domain.entities import Task, TaskPriority, TaskStatus
-from src.repositories import task_repository, user_repository
+from src.domain.entities import Task, TaskPriority, TaskStatus, MessageType
+from src.repositories import task_repository, user_repository, message_repository
+from src.services.deadline_scheduler import deadline_scheduler
+from src.utils.pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE
+
+# Допустимые сортировки списка задач
+TASK_SORTS = ('deadline', 'created_at', 'priority')
 
 class TaskService(ITaskService):
     def __init__(self):
@@ -37,7 +42,9 @@ class TaskService(ITaskService):
             assigned_users=[user_id]
         )
         
-        return task_repository.add(task)
+        task = task_repository.add(task)
+        deadline_scheduler.schedule(task)
+        return task
     
     def update_task(self, task_id: int, **kwargs) -> Task:
         task = task_repository.get_by_id(task_id)
@@ -75,7 +82,12 @@ class TaskService(ITaskService):
             task.end_time = kwargs['end_time']
         
         task.updated_at = datetime.now()
-        return task_repository.update(task)
+        task = task_repository.update(task)
+        # Новый дедлайн или статус перепланирует напоминания
+        deadline_scheduler.schedule(task)
+        if task.status == TaskStatus.COMPLETED:
+            self._resolve_deadline_messages(task)
+        return task
     
     def complete_task(self, task_id: int) -> Task:
         task = task_repository.get_by_id(task_id)
@@ -88,7 +100,14 @@ class TaskService(ITaskService):
             task.start_time = datetime.now()
         
         task.updated_at = datetime.now()
-        return task_repository.update(task)
+        deadline_scheduler.cancel(task.id)
+        task = task_repository.update(task)
+        self._resolve_deadline_messages(task)
+        return task
+    
+    def _resolve_deadline_messages(self, task: Task) -> None:
+        """Сообщения о дедлайне завершенной задачи больше не актуальны"""
+        message_repository.mark_related_as_read('task', task.id, MessageType.DEADLINE)
     
     def get_user_tasks(self, user_id: int, status: Optional[str] = None) -> List[Task]:
         tasks = task_repository.get_user_tasks(user_id)
@@ -102,6 +121,37 @@ class TaskService(ITaskService):
         
         return tasks
     
+    def get_tasks_page(self, user_id: int, sort: str = 'deadline', cursor: Optional[str] = None,
+                       limit: int = DEFAULT_PAGE_SIZE, status: Optional[str] = None,
+                       descending: bool = False) -> Dict[str, Any]:
+        """Страница задач пользователя с keyset-курсором (сортировка по индексу)"""
+        if sort not in TASK_SORTS:
+            raise ValueError(f"Неизвестная сортировка: {sort}")
+        
+        task_status = None
+        if status:
+            try:
+                task_status = TaskStatus(status)
+            except ValueError:
+                pass
+        
+        # Курсор привязан к сортировке и направлению обхода
+        cursor_scope = f"{sort}:{'desc' if descending else 'asc'}"
+        after = decode_cursor(cursor, cursor_scope) if cursor else None
+        tasks, last_key = task_repository.get_user_tasks_page(
+            user_id, sort, limit, after, descending, task_status
+        )
+        
+        return {
+            'tasks': tasks,
+            'next_cursor': encode_cursor(cursor_scope, last_key) if last_key else None
+        }
+    
+    def get_upcoming_tasks(self, user_id: int, days: int = 7, limit: int = 5) -> List[Task]:
+        """Ближайшие задачи пользователя с дедлайном в ближайшие days дней"""
+        until = datetime.now() + timedelta(days=days)
+        return task_repository.get_upcoming(user_id, until, limit)
+    
     def create_task_with_time(self, user_id: int, title: str, description: str,
                          deadline: datetime, start_time: datetime, end_time: datetime,
                          duration: int, priority: str, schedule_id: Optional[int] = None) -> Task:
@@ -132,4 +182,6 @@ class TaskService(ITaskService):
             assigned_users=[user_id]
         )
         
-        return task_repository.add(task)
\ No newline at end of file
+        task = task_repository.add(task)
+        deadline_scheduler.schedule(task)
+        return task
\ No newline at end of file
@@ -2,6 +2,7 @@
 from typing import Optional, Dict, Any
 from datetime import datetime
 import hashlib
+import secrets
 from src.domain.interfaces import IUserService
 from src.domain.entities import User, UserRole, Group
 from src.repositories import user_repository, group_repository
@@ -74,9 +75,23 @@ class UserService(IUserService):
                 raise ValueError("Пароль должен содержать минимум 6 символов")
             user.password_hash = self._hash_password(kwargs['password'])
         
+        if 'notification_digest' in kwargs:
+            user.notification_digest = bool(kwargs['notification_digest'])
+        
         user.updated_at = datetime.now()
         return user_repository.update(user)
     
+    def get_feed_token(self, user_id: int, reset: bool = False) -> str:
+        """Токен подписки на календарь; при reset старая ссылка перестает работать"""
+        user = user_repository.get_by_id(user_id)
+        if not user:
+            raise ValueError("Пользователь не найден")
+        
+        if reset or not user.feed_token:
+            user.feed_token = secrets.token_urlsafe(24)
+            user_repository.update(user)
+        return user.feed_token
+    
     def create_group(self, user_id: int, name: str, description: str) -> Group:
         user = user_repository.get_by_id(user_id)
         if not user:
@@ -0,0 +1,481 @@
+# src/services/write_ahead_log.py
+import json
+import marshal
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.repositories.journal import mutation_journal
+from src.services.snapshot_service import (SECTIONS, SnapshotInfo, SnapshotService, decode_entities,
+                                           field_specs, row_encoder, snapshot_service)
+
+# Каталог сегментов журнала; пустое значение отключает журнал
+WAL_DIR = os.environ.get('WAL_DIR', os.path.join('data', 'wal'))
+# Когда данные журнала сбрасываются на диск (fsync):
+#   always   - до ответа на каждый запрос, изменивший данные (групповая фиксация);
+#   interval - раз в WAL_FSYNC_INTERVAL секунд, сбой ОС теряет не больше интервала;
+#   off      - запись в файл без fsync, на усмотрение ОС
+WAL_FSYNC = os.environ.get('WAL_FSYNC', 'interval')
+WAL_FSYNC_INTERVAL = float(os.environ.get('WAL_FSYNC_INTERVAL', '1'))
+# Задержка перед fsync в режиме always: собирает больше параллельных запросов в одну запись
+WAL_COMMIT_DELAY = float(os.environ.get('WAL_COMMIT_DELAY', '0'))
+# Размер буфера, после которого записи уходят в файл, не дожидаясь интервала
+WAL_BUFFER_BYTES = 1024 * 1024
+# Уплотнение (снимок + новый сегмент): по размеру сегмента или по времени
+WAL_COMPACT_BYTES = int(os.environ.get('WAL_COMPACT_MB', '64')) * 1024 * 1024
+WAL_COMPACT_INTERVAL = timedelta(minutes=float(os.environ.get('WAL_COMPACT_MINUTES', '10')))
+
+FSYNC_POLICIES = ('always', 'interval', 'off')
+
+# Формат сегмента:
+#   MAGIC, версия (uint16), длина заголовка (uint32), заголовок JSON
+#     (разделы и поля сущностей - как в снимке);
+#   записи: длина (uint32), CRC32 (uint32), marshal от (номер раздела, ID, значения
+#     полей или None при удалении)
+MAGIC = b'SSPWAL\x00\x00'
+FORMAT_VERSION = 1
+_SEGMENT = struct.Struct('<8sHI')
+_RECORD = struct.Struct('<II')
+
+
+class WalError(Exception):
+    """Сегмент журнала поврежден или несовместим"""
+
+
+def _fsync_directory(directory: str) -> None:
+    # Новый файл переживет сбой, только если записан и каталог с ним
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """Журнал предзаписи изменений репозиториев поверх снимков.
+
+    Каждое изменение (add/update/delete) пишется в журнал полным состоянием
+    сущности, поэтому повтор записей идемпотентен. Записи копятся в буфере;
+    отдельный поток пишет их в файл пачками и делает fsync по политике -
+    в режиме always запрос перед ответом ждет fsync своей последней записи
+    (commit), и параллельные запросы разделяют один fsync. При запуске
+    поверх снимка повторяются сегменты, записанные после него; уплотнение
+    начинает новый сегмент, пишет снимок и удаляет старые сегменты.
+    """
+
+    def __init__(self, directory: Optional[str] = WAL_DIR, policy: str = WAL_FSYNC,
+                 sync_interval: float = WAL_FSYNC_INTERVAL, commit_delay: float = WAL_COMMIT_DELAY,
+                 compact_bytes: int = WAL_COMPACT_BYTES, compact_interval: timedelta = WAL_COMPACT_INTERVAL,
+                 snapshots: SnapshotService = snapshot_service):
+        if policy not in FSYNC_POLICIES:
+            raise ValueError(f"Неизвестная политика fsync: {policy}")
+        self.directory = directory
+        self.policy = policy
+        self.sync_interval = sync_interval
+        self.commit_delay = commit_delay
+        self.compact_bytes = compact_bytes
+        self.compact_interval = compact_interval
+        self.snapshots = snapshots
+
+        self._sections = list(SECTIONS)
+        self._section_numbers = {name: number for number, name in enumerate(self._sections)}
+        self._encoders = {name: row_encoder(cls) for name, (cls, _) in SECTIONS.items()}
+
+        # Буфер и номера записей; файл - под отдельной блокировкой, чтобы
+        # добавление записей не ждало fsync
+        self._lock = threading.Lock()
+        self._has_data = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+        self._io_lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._local = threading.local()
+        self._buffer = bytearray()
+        self._appended = 0
+        self._written = 0
+
+        self._file = None
+        self._generation = 0
+        # Сегменты, которые уплотнение может удалять: покрытые загруженным снимком,
+        # примененные при восстановлении и начатые этим процессом. Появившиеся
+        # после восстановления (чужие) остаются на диске
+        self._covered: set = set()
+        self._segment_bytes = 0
+        self._dirty = False
+        self._last_sync = 0.0
+        self._running = False
+        self._stop_event = threading.Event()
+        self._compact_event = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._compactor: Optional[threading.Thread] = None
+
+        self.fsyncs = 0
+        self.batches = 0
+        self.last_error: Optional[str] = None
+        self.last_checkpoint: Optional[SnapshotInfo] = None
+        self.last_recovery: Optional[Dict[str, Any]] = None
+
+    @property
+    def enabled(self) -> bool:
+        # Уплотнение пишет снимок: без снимков журнал рос бы бесконечно
+        return bool(self.directory) and self.snapshots.enabled
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def _segment_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f'{generation:08d}.wal')
+
+    def _segments(self) -> List[int]:
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        generations = []
+        for name in os.listdir(self.directory):
+            stem, extension = os.path.splitext(name)
+            if extension == '.wal' and stem.isdigit():
+                generations.append(int(stem))
+        return sorted(generations)
+
+    # --- Восстановление ---
+
+    def replay(self, loaded: Dict[str, Tuple[list, int]], header: Dict[str, Any]) -> None:
+        """Применить к разделам снимка сегменты журнала, записанные после него.
+
+        Вызывается из SnapshotService.restore до связывания ссылок. Из
+        записей каждой сущности берется последняя; сущности строятся по
+        столбцам, как при чтении снимка. Оборванная при сбое последняя
+        запись отбрасывается, и сегмент обрезается по ней; последний сегмент
+        без полного заголовка (сбой сразу после создания файла) удаляется.
+        Повреждение в середине журнала - WalError: загрузка не удается, и
+        файлы остаются нетронутыми.
+        """
+        started = time.perf_counter()
+        first = header.get('wal_segment', 0)
+        existing = self._segments()
+        segments = [generation for generation in existing if generation >= first]
+        covered = {generation for generation in existing if generation < first}
+
+        # раздел -> ID -> (номер сегмента, значения полей) или None, если удалена
+        changes: Dict[str, Dict[int, Optional[Tuple[int, tuple]]]] = {}
+        next_ids: Dict[str, int] = {}
+        specs_by_segment: Dict[int, Dict[str, List[List[Any]]]] = {}
+        records = 0
+        truncated = 0
+        for position, generation in enumerate(segments):
+            path = self._segment_path(generation)
+            with open(path, 'rb') as source:
+                data = source.read()
+            if position == len(segments) - 1 and self._torn_header(data):
+                # Записей в нем нет: файл создан, а заголовок не дописан
+                print(f"Сегмент журнала {path} без заголовка (оборван при создании), пропущен")
+                os.remove(path)
+                break
+            sections, offset = self._read_segment_header(data, path)
+            specs_by_segment[generation] = dict(sections)
+
+            end = len(data)
+            while offset < end:
+                if offset + _RECORD.size > end:
+                    break
+                length, checksum = _RECORD.unpack_from(data, offset)
+                payload = data[offset + _RECORD.size:offset + _RECORD.size + length]
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    break
+                number, entity_id, row = marshal.loads(payload)
+                name = sections[number][0]
+                changes.setdefault(name, {})[entity_id] = None if row is None else (generation, row)
+                next_ids[name] = max(next_ids.get(name, 1), entity_id + 1)
+                records += 1
+                offset += _RECORD.size + length
+
+            if offset < end:
+                truncated += end - offset
+                if position < len(segments) - 1:
+                    # Середина журнала повреждена: следующие сегменты без нее применять нельзя,
+                    # а работа без них потеряла бы их данные при ближайшем уплотнении
+                    raise WalError(f"Журнал изменений поврежден в середине: {path}")
+                # Оборванный хвост последнего сегмента - обычное следствие сбоя
+                with open(path, 'r+b') as target:
+                    target.truncate(offset)
+            covered.add(generation)
+
+        for name, rows in changes.items():
+            cls, _ = SECTIONS[name]
+            entities, next_id = loaded.get(name, ([], 1))
+            by_id = {entity.id: entity for entity in entities}
+            rows_by_segment: Dict[int, List[tuple]] = {}
+            for entity_id, change in rows.items():
+                by_id.pop(entity_id, None)
+                if change is not None:
+                    generation, row = change
+                    rows_by_segment.setdefault(generation, []).append(row)
+            for generation, segment_rows in rows_by_segment.items():
+                columns = tuple(map(list, zip(*segment_rows)))
+                specs = specs_by_segment[generation][name]
+                for entity in decode_entities(cls, specs, columns, len(segment_rows)):
+                    by_id[entity.id] = entity
+            loaded[name] = (sorted(by_id.values(), key=attrgetter('id')), max(next_id, next_ids[name]))
+
+        self._generation = max(segments, default=first - 1 if first else 0)
+        self._covered = covered
+        self.last_recovery = {
+            'segments': len(segments),
+            'records': records,
+            'truncated_bytes': truncated,
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+
+    @staticmethod
+    def _torn_header(data: bytes) -> bool:
+        """Заголовок сегмента записан не полностью"""
+        if len(data) < _SEGMENT.size:
+            return MAGIC.startswith(data[:len(MAGIC)])
+        magic, _, length = _SEGMENT.unpack_from(data, 0)
+        return magic == MAGIC and len(data) < _SEGMENT.size + length
+
+    def _read_segment_header(self, data: bytes, path: str) -> Tuple[List[List[Any]], int]:
+        if len(data) < _SEGMENT.size:
+            raise WalError(f"Сегмент журнала поврежден: {path}")
+        magic, version, length = _SEGMENT.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise WalError(f"Файл не является сегментом журнала: {path}")
+        if version > FORMAT_VERSION:
+            raise WalError(f"Неподдерживаемая версия журнала: {version}")
+        header = json.loads(data[_SEGMENT.size:_SEGMENT.size + length].decode('utf-8'))
+        if header.get('marshal_version') != marshal.version:
+            raise WalError("Журнал записан несовместимой версией Python")
+        return header['sections'], _SEGMENT.size + length
+
+    # --- Запись ---
+
+    def _open_segment(self, generation: int) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        header = json.dumps({
+            'format': FORMAT_VERSION,
+            'segment': generation,
+            'created_at': datetime.now().isoformat(),
+            'marshal_version': marshal.version,
+            'sections': [[name, field_specs(cls)] for name, (cls, _) in SECTIONS.items()]
+        }, ensure_ascii=False).encode('utf-8')
+        # 'xb': чужой сегмент с тем же номером (второй процесс на том же каталоге) не затирается
+        output = open(self._segment_path(generation), 'xb')
+        output.write(_SEGMENT.pack(MAGIC, FORMAT_VERSION, len(header)))
+        output.write(header)
+        output.flush()
+        os.fsync(output.fileno())
+        _fsync_directory(self.directory)
+        self._file = output
+        self._generation = generation
+        self._covered.add(generation)
+        self._segment_bytes = 0
+        self._dirty = False
+
+    def _record(self, section: str, entity_id: int, entity: Optional[Any]) -> None:
+        row = self._encoders[section](entity) if entity is not None else None
+        payload = marshal.dumps((self._section_numbers[section], entity_id, row))
+        record = _RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            self._buffer += record
+            self._appended += 1
+            self._local.last = self._appended
+            if len(self._buffer) >= WAL_BUFFER_BYTES:
+                self._has_data.notify()
+
+    def last_record(self) -> int:
+        """Номер последней записи, добавленной текущим потоком (0 - не было)"""
+        return getattr(self._local, 'last', 0)
+
+    def commit(self, timeout: Optional[float] = None, upto: int = 0) -> bool:
+        """Дождаться записи изменений по политике fsync.
+
+        В режиме always ждет fsync последней записи текущего потока или записи
+        номер upto, если она позже (изменения запроса, сделанные в других
+        потоках); вызывается перед ответом на запрос. В остальных режимах
+        возвращается сразу.
+        """
+        last = max(self.last_record(), upto or 0)
+        if not last or self.policy != 'always' or not self._running:
+            return True
+        with self._lock:
+            if self._written >= last:
+                return True
+            self._has_data.notify()
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self._written < last and self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+            return self._written >= last
+
+    def _flush(self, force_sync: bool = False) -> None:
+        """Записать буфер в текущий сегмент и сделать fsync, если пора"""
+        with self._io_lock:
+            with self._lock:
+                data, self._buffer = self._buffer, bytearray()
+                appended = self._appended
+            try:
+                if data:
+                    self._file.write(data)
+                    self._file.flush()
+                    self._segment_bytes += len(data)
+                    self._dirty = True
+                    self.batches += 1
+                now = time.monotonic()
+                due = self.policy == 'always' or \
+                    (self.policy == 'interval' and now - self._last_sync >= self.sync_interval)
+                if self._dirty and (due or force_sync):
+                    os.fsync(self._file.fileno())
+                    self.fsyncs += 1
+                    self._dirty = False
+                    self._last_sync = now
+            except OSError as e:
+                # Запросы не должны зависнуть из-за диска: ошибку видно в состоянии журнала
+                self.last_error = str(e)
+                print(f"Ошибка записи журнала изменений: {e}")
+        with self._lock:
+            self._written = max(self._written, appended)
+            self._flushed.notify_all()
+        if self._segment_bytes >= self.compact_bytes:
+            self._compact_event.set()
+
+    def _run_flusher(self) -> None:
+        while True:
+            with self._lock:
+                if not self._buffer and not self._stop_event.is_set():
+                    self._has_data.wait(self.sync_interval)
+            if self.commit_delay and self.policy == 'always':
+                time.sleep(self.commit_delay)
+            self._flush()
+            if self._stop_event.is_set():
+                return
+
+    # --- Уплотнение ---
+
+    def _rotate(self) -> int:
+        """Закрыть текущий сегмент (с fsync) и начать следующий; возвращает его номер"""
+        with self._io_lock:
+            with self._lock:
+                data, self._buffer = self._buffer, bytearray()
+                appended = self._appended
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._open_segment(self._generation + 1)
+            self._last_sync = time.monotonic()
+        with self._lock:
+            self._written = max(self._written, appended)
+            self._flushed.notify_all()
+        return self._generation
+
+    def checkpoint(self) -> SnapshotInfo:
+        """Уплотнить журнал: новый сегмент, снимок, удаление старых сегментов.
+
+        Изменения во время записи снимка попадают и в снимок, и в новый
+        сегмент - повтор полных состояний сущностей дает тот же результат.
+        Удаляются только сегменты, данные которых есть в памяти (и теперь в
+        снимке); не прочитанные при восстановлении остаются на диске.
+        """
+        with self._checkpoint_lock:
+            generation = self._rotate()
+            info = self.snapshots.save(extra={'wal_segment': generation})
+            for old in self._segments():
+                if old < generation and old in self._covered:
+                    os.remove(self._segment_path(old))
+                    self._covered.discard(old)
+            self.last_checkpoint = info
+            return info
+
+    def _run_compactor(self) -> None:
+        while True:
+            self._compact_event.wait(self.compact_interval.total_seconds())
+            self._compact_event.clear()
+            if self._stop_event.is_set():
+                return
+            if self._segment_bytes or self._buffer:
+                try:
+                    self.checkpoint()
+                except Exception as e:
+                    self.last_error = str(e)
+                    print(f"Ошибка уплотнения журнала изменений: {e}")
+
+    # --- Запуск и остановка ---
+
+    def start(self) -> None:
+        """Начать новый сегмент и записывать изменения репозиториев.
+
+        Вызывается после восстановления (replay): дописывать сегменты,
+        прочитанные при запуске, нельзя - их хвост мог быть оборван.
+        """
+        if self._running or not self.enabled:
+            return
+        if self.snapshots.failed:
+            # Данные не загружены: журнал поверх них уплотнил бы пустые репозитории
+            raise WalError(f"Данные не загружены, журнал не запускается: {self.snapshots.last_error}")
+        # Существующие сегменты не перезаписываются, даже если восстановление не дошло до них
+        self._open_segment(max([self._generation, *self._segments()]) + 1)
+        self._last_sync = time.monotonic()
+        self._stop_event.clear()
+        self._running = True
+        mutation_journal.attach(self._record)
+        self._flusher = threading.Thread(target=self._run_flusher, name='wal-flusher', daemon=True)
+        self._flusher.start()
+        self._compactor = threading.Thread(target=self._run_compactor, name='wal-compactor', daemon=True)
+        self._compactor.start()
+
+    def stop(self, checkpoint: bool = False) -> None:
+        """Остановить журнал; checkpoint=True - записать снимок и уплотнить журнал"""
+        if not self._running:
+            return
+        if checkpoint:
+            try:
+                info = self.checkpoint()
+                print(f"Снимок данных сохранен: {info.path} ({info.bytes} байт)")
+            except Exception as e:
+                print(f"Не удалось сохранить снимок данных: {e}")
+        mutation_journal.detach()
+        self._stop_event.set()
+        self._compact_event.set()
+        with self._lock:
+            self._has_data.notify_all()
+        for thread in (self._flusher, self._compactor):
+            if thread:
+                thread.join(timeout=5)
+        self._flush(force_sync=True)
+        self._running = False
+        with self._lock:
+            self._flushed.notify_all()
+        with self._io_lock:
+            self._file.close()
+            self._file = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'running': self._running,
+            'policy': self.policy,
+            'segment': self._generation,
+            'segment_bytes': self._segment_bytes,
+            'appended': self._appended,
+            'written': self._written,
+            'batches': self.batches,
+            'fsyncs': self.fsyncs,
+            'error': self.last_error,
+            'last_recovery': self.last_recovery,
+            'last_checkpoint': self.last_checkpoint.to_dict() if self.last_checkpoint else None
+        }
+
+
+# Единый журнал изменений для всего приложения
+write_ahead_log = WriteAheadLog()
@@ -0,0 +1,123 @@
+# src/utils/event_bus.py
+import os
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, List, Optional, Set
+
+# Сколько событий копится для одного подключения, пока клиент их не забрал
+SUBSCRIBER_BUFFER = 100
+# Ограничение на число одновременных подписок
+MAX_SUBSCRIBERS = 5000
+
+# Потоки SSE уведомлений. Под многопоточным сервером (Werkzeug, gunicorn
+# gthread) каждое подключение занимает поток сервера на все время ожидания,
+# поэтому по умолчанию их немного. Тысячи простаивающих подключений требуют
+# кооперативного воркера (gunicorn -k gevent): там ожидание Event - это
+# зеленый поток, и предел можно поднять через SSE_MAX_STREAMS.
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', '200'))
+# Подключений одного пользователя (вкладки, устройства)
+SSE_MAX_STREAMS_PER_USER = int(os.environ.get('SSE_MAX_STREAMS_PER_USER', '5'))
+
+
+class TooManySubscribers(Exception):
+    """Достигнут предел одновременных подписок"""
+
+
+class Subscription:
+    """Подписка одного подключения: ограниченный буфер и сигнал о новых событиях.
+
+    Ожидающая подписка ничего не делает, пока не придет событие или не истечет
+    таймаут: процессор она не тратит, но занимает ожидающий поток (см.
+    SSE_MAX_STREAMS).
+    """
+
+    def __init__(self, bus: 'EventBus', topic: Hashable, buffer_size: int):
+        self.topic = topic
+        self._bus = bus
+        self._events: Deque[Any] = deque(maxlen=buffer_size)
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        # Буфер переполнялся: часть событий потеряна, клиенту нужна досинхронизация
+        self.overflowed = False
+
+    def push(self, event: Any) -> None:
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self.overflowed = True
+            self._events.append(event)
+        self._ready.set()
+
+    def wait(self, timeout: float) -> List[Any]:
+        """Забрать накопленные события, ожидая не дольше timeout секунд"""
+        self._ready.wait(timeout)
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+            self._ready.clear()
+        return events
+
+    def reset_overflow(self) -> bool:
+        with self._lock:
+            overflowed, self.overflowed = self.overflowed, False
+        return overflowed
+
+    def close(self) -> None:
+        self._bus.unsubscribe(self)
+
+
+class EventBus:
+    """Внутрипроцессная шина публикации/подписки по темам (например, ID пользователя)"""
+
+    def __init__(self, buffer_size: int = SUBSCRIBER_BUFFER, max_subscribers: int = MAX_SUBSCRIBERS,
+                 max_per_topic: Optional[int] = None):
+        self._buffer_size = buffer_size
+        self._max_subscribers = max_subscribers
+        self._max_per_topic = max_per_topic
+        self._subscribers: Dict[Hashable, Set[Subscription]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: Hashable, buffer_size: Optional[int] = None) -> Subscription:
+        with self._lock:
+            if self._count >= self._max_subscribers:
+                raise TooManySubscribers("Слишком много подключений")
+            if self._max_per_topic is not None and len(self._subscribers.get(topic, ())) >= self._max_per_topic:
+                raise TooManySubscribers("Слишком много подключений пользователя")
+            subscription = Subscription(self, topic, buffer_size or self._buffer_size)
+            self._subscribers.setdefault(topic, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if not subscribers or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            self._count -= 1
+            if not subscribers:
+                del self._subscribers[subscription.topic]
+
+    def publish(self, topic: Hashable, event: Any) -> int:
+        """Отправить событие подписчикам темы; возвращает их число.
+
+        Подписчик получает события в порядке вызовов publish: если порядок
+        важен (ID по возрастанию), издатель публикует под своей блокировкой,
+        той же, под которой выдает ID. Подписчик ничего не вызывает у издателя,
+        поэтому взаимной блокировки нет.
+        """
+        subscribers = self._subscribers.get(topic)
+        if not subscribers:
+            return 0
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            subscription.push(event)
+        return len(subscribers)
+
+    def subscriber_count(self) -> int:
+        return self._count
+
+
+# Шина новых уведомлений: тема - ID пользователя, событие - сообщение
+notification_bus = EventBus(max_subscribers=SSE_MAX_STREAMS, max_per_topic=SSE_MAX_STREAMS_PER_USER)
@@ -0,0 +1,252 @@
+# src/utils/ical.py
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dateutil import tz
+
+# Максимальная длина строки iCalendar в октетах (RFC 5545, 3.1)
+MAX_LINE_OCTETS = 75
+
+CRLF = '\r\n'
+
+
+def escape_text(value: str) -> str:
+    """Экранирование значения типа TEXT"""
+    return (value.replace('\\', '\\\\')
+                 .replace(';', '\\;')
+                 .replace(',', '\\,')
+                 .replace('\r\n', '\\n')
+                 .replace('\n', '\\n')
+                 .replace('\r', '\\n'))
+
+
+def format_datetime(value: datetime) -> str:
+    """Локальное ("плавающее") время: 20240131T093000"""
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def fold_line(line: str) -> str:
+    """Свернуть строку длиннее 75 октетов, не разрывая символы UTF-8"""
+    if len(line) <= MAX_LINE_OCTETS // 4 or len(line.encode('utf-8')) <= MAX_LINE_OCTETS:
+        return line + CRLF
+
+    parts = []
+    current = []
+    size = 0
+    # Первая строка - 75 октетов, продолжения начинаются с пробела
+    limit = MAX_LINE_OCTETS
+    for char in line:
+        char_size = len(char.encode('utf-8'))
+        if size + char_size > limit:
+            parts.append(''.join(current))
+            current = []
+            size = 0
+            limit = MAX_LINE_OCTETS - 1
+        current.append(char)
+        size += char_size
+    parts.append(''.join(current))
+    return (CRLF + ' ').join(parts) + CRLF
+
+
+def component(name: str, properties: Iterable[str]) -> str:
+    """Текст компонента (VEVENT, VTODO...) из готовых строк "ИМЯ:значение" """
+    return ''.join([f'BEGIN:{name}{CRLF}'] + [fold_line(line) for line in properties] + [f'END:{name}{CRLF}'])
+
+
+def calendar(name: str, components: Iterable[str]) -> Iterator[str]:
+    """Потоковая сборка VCALENDAR: заголовок, компоненты по одному, окончание"""
+    yield ''.join(fold_line(line) for line in (
+        'BEGIN:VCALENDAR',
+        'PRODID:-//Smart Schedule//RU',
+        'VERSION:2.0',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+        'X-WR-TIMEZONE:Europe/Moscow',
+    ))
+    yield from components
+    yield f'END:VCALENDAR{CRLF}'
+
+
+class FragmentCache:
+    """Кэш готовых компонентов (VEVENT) по (тип, ID) с проверкой версии сущности.
+
+    Как и кэш сериализации, запись валидна, пока совпадает entity.version;
+    при удалении сущности репозиторий сбрасывает запись явно.
+    """
+
+    def __init__(self, max_entries: int = 50000):
+        self._max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, int], Tuple[int, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, entity: Any, render: Callable[[Any], str]) -> str:
+        key = (kind, entity.id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == entity.version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        text = render(entity)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (entity.version, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return text
+
+    def invalidate(self, kind: str, entity_id: int) -> None:
+        with self._lock:
+            self._entries.pop((kind, entity_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Единый кэш компонентов для выгрузки и подписки на календарь
+ical_fragments = FragmentCache()
+
+
+# --- Разбор -----------------------------------------------------------------
+
+# Свойство компонента: (параметры, значение)
+Property = Tuple[Dict[str, str], str]
+
+_DURATION = re.compile(r'^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+_UNESCAPE = re.compile(r'\\([\\;,nN])')
+
+
+class ICalComponent:
+    """Разобранный компонент (VEVENT, VTODO): свойства по именам в верхнем регистре"""
+
+    def __init__(self, name: str, line_no: int):
+        self.name = name
+        self.line_no = line_no
+        self.properties: Dict[str, List[Property]] = {}
+        # Строки компонента, которые не удалось разобрать
+        self.errors: List[str] = []
+
+    def add(self, name: str, params: Dict[str, str], value: str) -> None:
+        self.properties.setdefault(name, []).append((params, value))
+
+    def get(self, name: str) -> Optional[Property]:
+        values = self.properties.get(name)
+        return values[0] if values else None
+
+    def value(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        prop = self.get(name)
+        return prop[1] if prop else default
+
+    def all(self, name: str) -> List[Property]:
+        return self.properties.get(name, [])
+
+
+def unescape_text(value: str) -> str:
+    return _UNESCAPE.sub(lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value)
+
+
+def unfold_lines(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """Склейка свернутых строк; отдает (номер первой физической строки, строка)"""
+    current: Optional[str] = None
+    start = 0
+    for line_no, raw in enumerate(lines, 1):
+        line = raw.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield start, current
+        current, start = line, line_no
+    if current:
+        yield start, current
+
+
+def parse_content_line(line: str) -> Tuple[str, Dict[str, str], str]:
+    """Разбор строки "ИМЯ;ПАРАМЕТР=значение:значение" (двоеточие в кавычках не разделяет)"""
+    in_quotes = False
+    for position, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ':' and not in_quotes:
+            head, value = line[:position], line[position + 1:]
+            break
+    else:
+        raise ValueError(f"Некорректная строка: {line[:40]}")
+
+    parts = head.split(';')
+    params = {}
+    for part in parts[1:]:
+        key, _, param_value = part.partition('=')
+        params[key.upper()] = param_value.strip('"')
+    return parts[0].upper(), params, value
+
+
+def iter_components(lines: Iterable[str], names: Tuple[str, ...] = ('VEVENT', 'VTODO')) -> Iterator[ICalComponent]:
+    """Потоковый обход компонентов календаря: в памяти только текущий компонент.
+
+    Вложенные компоненты (VALARM и т.п.) пропускаются.
+    """
+    current: Optional[ICalComponent] = None
+    nested = 0
+    for line_no, line in unfold_lines(lines):
+        if not line.strip():
+            continue
+        try:
+            name, params, value = parse_content_line(line)
+        except ValueError as e:
+            if current is not None:
+                current.errors.append(str(e))
+            continue
+
+        if name == 'BEGIN':
+            if current is None and value.upper() in names:
+                current = ICalComponent(value.upper(), line_no)
+            elif current is not None:
+                nested += 1
+        elif name == 'END':
+            if current is None:
+                continue
+            if nested:
+                nested -= 1
+            elif value.upper() == current.name:
+                yield current
+                current = None
+        elif current is not None and not nested:
+            current.add(name, params, value)
+
+
+def parse_datetime(prop: Property) -> datetime:
+    """Значение DATE/DATE-TIME в локальное время без часового пояса (как в приложении)"""
+    params, value = prop
+    value = value.strip()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime.strptime(value[:8], '%Y%m%d')
+
+    utc = value.endswith('Z')
+    parsed = datetime.strptime(value.rstrip('Z')[:15], '%Y%m%dT%H%M%S')
+    if utc:
+        return parsed.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    if 'TZID' in params:
+        zone = tz.gettz(params['TZID'])
+        if zone is not None:
+            return parsed.replace(tzinfo=zone).astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def parse_duration(value: str) -> timedelta:
+    match = _DURATION.match(value.strip())
+    if not match:
+        raise ValueError(f"Некорректная длительность: {value}")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    result = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                       minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -result if sign == '-' else result
@@ -0,0 +1,51 @@
+# src/utils/pagination.py
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(sort: str, key: Tuple) -> str:
+    """Непрозрачный курсор keyset-пагинации: имя сортировки + ключ последней строки"""
+    payload = json.dumps([sort, [_encode_value(v) for v in key]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple:
+    """Разобрать курсор; ValueError, если он поврежден или от другой сортировки"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        key = tuple(_decode_value(v) for v in key)
+    except Exception:
+        raise ValueError("Некорректный курсор")
+
+    if cursor_sort != sort:
+        raise ValueError("Курсор не соответствует сортировке")
+    return key
+
+
+def parse_page_size(value: Optional[str], default: int = DEFAULT_PAGE_SIZE) -> int:
+    """Размер страницы из параметра запроса, ограниченный MAX_PAGE_SIZE"""
+    if not value:
+        return default
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValueError("Некорректный размер страницы")
+    return max(1, min(size, MAX_PAGE_SIZE))
@@ -0,0 +1,249 @@
+# src/utils/serialization.py
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import Response, request
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def entity_kind(entity: Any) -> str:
+    return type(entity).__name__.lower()
+
+
+def _iso(value: Any) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+# Белые списки полей для проекции (?fields=): поле -> функция вычисления значения.
+# Набор полей совпадает с to_dict соответствующей сущности.
+FIELD_GETTERS: Dict[str, Dict[str, Callable[[Any], Any]]] = {
+    'task': {
+        'id': lambda t: t.id,
+        'title': lambda t: t.title,
+        'description': lambda t: t.description,
+        'deadline': lambda t: _iso(t.deadline),
+        'start_time': lambda t: _iso(t.start_time),
+        'end_time': lambda t: _iso(t.end_time),
+        'duration': lambda t: t.duration,
+        'priority': lambda t: t.priority.value,
+        'status': lambda t: t.status.value,
+        'creator_id': lambda t: t.creator_id,
+        'schedule_id': lambda t: t.schedule_id,
+        'assigned_users': lambda t: list(t.assigned_users),
+        'created_at': lambda t: _iso(t.created_at),
+        'updated_at': lambda t: _iso(t.updated_at),
+    },
+    'event': {
+        'id': lambda e: e.id,
+        'title': lambda e: e.title,
+        'description': lambda e: e.description,
+        'start_time': lambda e: _iso(e.start_time),
+        'end_time': lambda e: _iso(e.end_time),
+        'owner_id': lambda e: e.owner_id,
+        'is_shared': lambda e: e.is_shared,
+        'participants': lambda e: list(e.participants),
+        'created_at': lambda e: _iso(e.created_at),
+    },
+    'user': {
+        'id': lambda u: u.id,
+        'name': lambda u: u.name,
+        'email': lambda u: u.email,
+        'role': lambda u: u.role.value,
+        'created_at': lambda u: _iso(u.created_at),
+        'updated_at': lambda u: _iso(u.updated_at),
+        'notification_digest': lambda u: u.notification_digest,
+    },
+    'group': {
+        'id': lambda g: g.id,
+        'name': lambda g: g.name,
+        'description': lambda g: g.description,
+        'organizer_id': lambda g: g.organizer_id,
+        'member_count': lambda g: len(g.members),
+        'created_at': lambda g: _iso(g.created_at),
+    },
+    'schedule': {
+        'id': lambda s: s.id,
+        'title': lambda s: s.title,
+        'owner_id': lambda s: s.owner_id,
+        'group_id': lambda s: s.group_id,
+        'is_shared': lambda s: s.is_shared,
+        'task_count': lambda s: len(s.tasks),
+        'event_count': lambda s: len(s.events),
+        'created_at': lambda s: _iso(s.created_at),
+    },
+    'message': {
+        'id': lambda m: m.id,
+        'text': lambda m: m.text,
+        'sent_at': lambda m: _iso(m.sent_at),
+        'message_type': lambda m: m.message_type.value,
+        'user_id': lambda m: m.user_id,
+        'is_read': lambda m: m.is_read,
+        'related_entity_id': lambda m: m.related_entity_id,
+        'related_entity_type': lambda m: m.related_entity_type,
+    },
+}
+
+
+def parse_fields(raw: Optional[str], *kinds: str) -> Optional[Tuple[str, ...]]:
+    """Разобрать список полей "id,title,..."; ValueError для полей вне белого списка.
+
+    Если эндпоинт отдает несколько типов сущностей, поле должно существовать
+    хотя бы у одного из них.
+    """
+    if not raw:
+        return None
+
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    if not fields:
+        return None
+
+    allowed = set()
+    for kind in kinds:
+        allowed.update(FIELD_GETTERS[kind])
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ValueError(f"Недопустимые поля: {', '.join(unknown)}")
+    return fields
+
+
+def requested_fields(*kinds: str) -> Optional[Tuple[str, ...]]:
+    """Поля проекции из параметра ?fields= текущего запроса"""
+    return parse_fields(request.args.get('fields'), *kinds)
+
+
+def project(entity: Any, fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """Вычислить только запрошенные поля сущности"""
+    getters = FIELD_GETTERS[entity_kind(entity)]
+    return {name: getters[name](entity) for name in fields if name in getters}
+
+
+class SerializationCache:
+    """Кэш сериализованных сущностей (dict и готовый JSON), ключ - (тип, ID).
+
+    Запись валидна, пока совпадает версия сущности: репозитории увеличивают
+    entity.version при каждом изменении и явно сбрасывают запись при удалении.
+    Кэшированные dict общие для всех запросов - изменять их нельзя.
+    """
+
+    def __init__(self, max_entries: int = 50000):
+        self._max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, int], list]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, entity: Any) -> list:
+        key = (entity_kind(entity), entity.id)
+        version = getattr(entity, 'version', 0)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry
+
+        data = entity.to_dict()
+        # Списки в to_dict ссылаются на живые поля сущности - копируем их
+        for field_name, value in data.items():
+            if isinstance(value, list):
+                data[field_name] = list(value)
+        entry = [version, data, None]
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def to_dict(self, entity: Any) -> Dict[str, Any]:
+        return self._entry(entity)[1]
+
+    def to_json(self, entity: Any) -> bytes:
+        entry = self._entry(entity)
+        if entry[2] is None:
+            entry[2] = _dumps(entry[1])
+        return entry[2]
+
+    def invalidate(self, kind: str, entity_id: int) -> None:
+        with self._lock:
+            self._entries.pop((kind, entity_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Единый кэш для всего приложения
+serialization_cache = SerializationCache()
+
+
+def _cacheable(entity: Any) -> bool:
+    # Кэш проверяет свежесть по версии; пользователи, группы и расписания
+    # версии не имеют (состав группы меняется на месте) и сериализуются заново
+    return hasattr(entity, 'version')
+
+
+def serialize(entity: Any, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+    """Сериализовать сущность через кэш (результат только для чтения).
+
+    С проекцией fields вычисляются только указанные поля, кэш не используется.
+    """
+    if fields:
+        return project(entity, fields)
+    if not _cacheable(entity):
+        return entity.to_dict()
+    return serialization_cache.to_dict(entity)
+
+
+def serialize_many(entities: Iterable[Any],
+                   fields: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+    return [serialize(entity, fields) for entity in entities]
+
+
+class EntityList:
+    """Список сущностей, который json_response кодирует из кэша готового JSON"""
+
+    def __init__(self, entities: Iterable[Any], fields: Optional[Tuple[str, ...]] = None):
+        self.entities = entities
+        self.fields = fields
+
+
+def _write(buffer: bytearray, value: Any) -> None:
+    if isinstance(value, EntityList):
+        buffer += b'['
+        first = True
+        for entity in value.entities:
+            if not first:
+                buffer += b','
+            if value.fields:
+                buffer += _dumps(project(entity, value.fields))
+            elif not _cacheable(entity):
+                buffer += _dumps(entity.to_dict())
+            else:
+                buffer += serialization_cache.to_json(entity)
+            first = False
+        buffer += b']'
+    elif isinstance(value, dict):
+        buffer += b'{'
+        first = True
+        for key, item in value.items():
+            if not first:
+                buffer += b','
+            buffer += _dumps(str(key))
+            buffer += b':'
+            _write(buffer, item)
+            first = False
+        buffer += b'}'
+    else:
+        buffer += _dumps(value)
+
+
+def json_response(payload: Dict[str, Any], status: int = 200) -> Response:
+    """JSON-ответ, в который списки сущностей (EntityList) пишутся готовыми байтами"""
+    buffer = bytearray()
+    _write(buffer, payload)
+    return Response(bytes(buffer), status=status, mimetype='application/json')
@@ -0,0 +1,102 @@
+# src/utils/streaming.py
+import codecs
+import zlib
+from typing import Iterable, Iterator
+
+from flask import Response, request, send_file, stream_with_context
+
+# Минимальный размер отдаваемого куска: мелкие строки склеиваются
+CHUNK_SIZE = 16 * 1024
+
+
+def _buffered(chunks: Iterable[str]) -> Iterator[bytes]:
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    # wbits=31 - формат gzip; сжатие идет по мере генерации
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _file_chunks(path: str) -> Iterator[bytes]:
+    with open(path, 'rb') as source:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def accepts_gzip() -> bool:
+    """Клиент принимает ответ, сжатый gzip (Accept-Encoding)"""
+    return request.accept_encodings['gzip'] > 0
+
+
+def wants_gzip() -> bool:
+    """Сжимать ли передачу: клиент принимает gzip и сжатие не отключено (?gzip=0)"""
+    return request.args.get('gzip') not in ('0', 'false') and accepts_gzip()
+
+
+def _encoded_response(body: Iterable[bytes], mimetype: str, gzip: bool) -> Response:
+    if gzip:
+        body = _gzipped(body)
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if gzip:
+        # Сжатие только на время передачи: клиент сохранит исходный файл
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def stream_response(chunks: Iterable[str], mimetype: str, gzip: bool = False) -> Response:
+    """Потоковый ответ кусками (chunked), без сборки всего тела в памяти"""
+    return _encoded_response(_buffered(chunks), mimetype, gzip)
+
+
+def stream_download(chunks: Iterable[str], mimetype: str, filename: str,
+                    gzip: bool = False) -> Response:
+    """Потоковая выдача файла для скачивания"""
+    response = stream_response(chunks, mimetype, gzip)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def file_download(path: str, mimetype: str, filename: str) -> Response:
+    """Готовый файл для скачивания: сжимается на время передачи, если клиент принимает gzip"""
+    if wants_gzip():
+        response = _encoded_response(_file_chunks(path), mimetype, gzip=True)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    else:
+        response = send_file(path, mimetype=mimetype, as_attachment=True, download_name=filename)
+        response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def uploaded_lines(field: str = 'file') -> Iterator[str]:
+    """Строки загруженного файла (multipart-поле или тело запроса) по одной.
+
+    Файл не читается в память целиком; BOM в начале отбрасывается.
+    """
+    upload = request.files.get(field)
+    stream = upload.stream if upload else request.stream
+    return codecs.iterdecode(stream, 'utf-8-sig', errors='replace')
@@ -0,0 +1,55 @@
+# src/utils/ttl_set.py
+import heapq
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class TTLSet:
+    """Множество ключей с временем жизни.
+
+    Сроки хранятся в min-куче, поэтому вытеснение просроченных ключей стоит
+    O(log n) на ключ и выполняется попутно при каждой вставке.
+    """
+
+    def __init__(self, default_ttl: timedelta):
+        self._default_ttl = default_ttl
+        self._expires: Dict[Hashable, datetime] = {}
+        self._heap: List[Tuple[datetime, int, Hashable]] = []
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _evict(self, now: datetime) -> None:
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, _, key = heapq.heappop(self._heap)
+            # Ключ мог быть продлен - удаляем, только если срок совпадает
+            if self._expires.get(key) == expires_at:
+                del self._expires[key]
+
+    def add(self, key: Hashable, expires_at: Optional[datetime] = None) -> bool:
+        """Добавить ключ; False, если он уже есть и еще не истек"""
+        now = datetime.now()
+        with self._lock:
+            self._evict(now)
+            if key in self._expires:
+                return False
+
+            expires_at = expires_at if expires_at and expires_at > now else now + self._default_ttl
+            self._expires[key] = expires_at
+            self._counter += 1
+            heapq.heappush(self._heap, (expires_at, self._counter, key))
+            return True
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._expires.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            expires_at = self._expires.get(key)
+            return expires_at is not None and expires_at > datetime.now()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict(datetime.now())
+            return len(self._expires)
@@ -25,6 +25,12 @@ def validate_time(time_str: str) -> Optional[datetime]:
     except ValueError:
         return None
 
+def to_local_naive(moment: datetime) -> datetime:
+    """Время с часовым поясом - в локальное без пояса (все времена приложения наивные)."""
+    if moment.tzinfo is not None:
+        return moment.astimezone().replace(tzinfo=None)
+    return moment
+
 def validate_duration(duration: int) -> bool:
     """Проверяет валидность продолжительности (в минутах)."""
     return 0 < duration <= 24 * 60  # Максимум 24 часа
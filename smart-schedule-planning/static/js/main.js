@@ -5,8 +5,34 @@ document.addEventListener('DOMContentLoaded', function() {
     initDatePickers();
     initFormValidation();
     initTooltips();
+    initUnreadBadge();
 });
 
+function initUnreadBadge() {
+    // Счетчик непрочитанных уведомлений в меню
+    if (!document.getElementById('unread-badge')) return;
+    refreshUnreadBadge();
+    setInterval(refreshUnreadBadge, 60000);
+}
+
+function refreshUnreadBadge() {
+    fetch('/api/notifications/unread-count')
+        .then(response => response.ok ? response.json() : null)
+        .then(data => {
+            if (data && data.success) {
+                setUnreadBadge(data.count);
+            }
+        })
+        .catch(() => {});
+}
+
+function setUnreadBadge(count) {
+    const badge = document.getElementById('unread-badge');
+    if (!badge) return;
+    badge.textContent = count > 99 ? '99+' : count;
+    badge.style.display = count > 0 ? 'inline-block' : 'none';
+}
+
 function initDatePickers() {
     // Инициализация полей с датой
     const dateInputs = document.querySelectorAll('input[type="date"]');
@@ -0,0 +1,25 @@
+# tests/conftest.py
+import os
+import sys
+
+# Снимки и журнал по умолчанию отключены: тесты создают свои экземпляры во временных каталогах
+os.environ.setdefault('SNAPSHOT_PATH', '')
+os.environ.setdefault('WAL_DIR', '')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src.repositories.journal import mutation_journal
+from src.services.snapshot_service import SECTIONS
+
+
+@pytest.fixture(autouse=True)
+def empty_repositories():
+    """Каждый тест начинает с пустых репозиториев и отключенного журнала"""
+    for _, repository in SECTIONS.values():
+        repository.restore([], 1)
+    yield
+    mutation_journal.detach()
+    for _, repository in SECTIONS.values():
+        repository.restore([], 1)
@@ -0,0 +1,158 @@
+# tests/test_delivery_pipeline.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.domain.entities import Message, MessageType, Task, TaskPriority, TaskStatus
+from src.repositories import message_repository, task_repository
+from src.services import delivery_pipeline as pipeline_module
+from src.services import notification_service as notification_module
+from src.services.deadline_scheduler import RETRY_DELAY, DeadlineScheduler
+from src.services.delivery_pipeline import (DeliveryPipeline, DeliveryQueueFull, InboxSink,
+                                            NotificationSink, PartialDelivery, _SinkWorker)
+from src.utils.ttl_set import TTLSet
+
+
+def make_messages(count, user_id=1):
+    return [Message(id=0, template_id='schedule_change', template_params=(1,), sent_at=datetime.now(),
+                    message_type=MessageType.SYSTEM, user_id=user_id) for _ in range(count)]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(pipeline_module, 'BACKOFF_BASE_SECONDS', 0)
+
+
+class FlakySink(NotificationSink):
+    """Доставляет первые partial сообщений пачки, затем падает (failures раз)"""
+
+    name = 'flaky'
+
+    def __init__(self, partial, failures=1):
+        self.partial = partial
+        self.failures = failures
+        self.delivered = []
+
+    def deliver_batch(self, messages):
+        if self.failures:
+            self.failures -= 1
+            self.delivered.extend(messages[:self.partial])
+            raise PartialDelivery(self.partial, ConnectionError('обрыв соединения'))
+        self.delivered.extend(messages)
+
+
+def test_partial_delivery_retries_only_the_rest():
+    sink = FlakySink(partial=2)
+    worker = _SinkWorker(sink)
+    batch = make_messages(5)
+
+    assert worker.deliver(batch)
+    assert sink.delivered == batch
+    assert worker.metrics.delivered == 5
+    assert worker.metrics.retries == 1
+
+
+def test_partial_delivery_counts_only_the_rest_as_failed(monkeypatch):
+    monkeypatch.setattr(pipeline_module, 'MAX_RETRIES', 2)
+    sink = FlakySink(partial=1, failures=10)
+    worker = _SinkWorker(sink)
+
+    assert not worker.deliver(make_messages(5))
+    assert worker.metrics.delivered == 3
+    assert worker.metrics.failed == 2
+
+
+def test_inbox_batch_is_all_or_nothing(monkeypatch):
+    index = message_repository._sent_index
+    original_put = index.put
+    calls = []
+
+    def failing_put(*args):
+        calls.append(args)
+        if len(calls) == 3:
+            raise MemoryError('сбой индекса')
+        return original_put(*args)
+
+    monkeypatch.setattr(index, 'put', failing_put)
+    worker = _SinkWorker(InboxSink())
+    batch = make_messages(4)
+
+    assert worker.deliver(batch)
+    assert len(message_repository.get_all()) == 4
+    assert len(message_repository.get_user_messages(1)) == 4
+    assert message_repository.count_unread(1) == 4
+
+
+def test_submit_enqueues_all_or_nothing(monkeypatch):
+    monkeypatch.setattr(pipeline_module, 'QUEUE_SIZE', 4)
+    monkeypatch.setattr(pipeline_module, 'SUBMIT_TIMEOUT_SECONDS', 0.05)
+    pipeline = DeliveryPipeline()
+    # Очередь без потоков доставки: ее никто не разбирает
+    pipeline._running = True
+    queue = pipeline.workers[0].queue
+
+    pipeline.submit(make_messages(3))
+    with pytest.raises(DeliveryQueueFull):
+        pipeline.submit(make_messages(2))
+    assert queue.qsize() == 3
+    pipeline.submit(make_messages(1))
+    assert queue.qsize() == 4
+
+
+def test_stop_drains_accepted_messages():
+    pipeline = DeliveryPipeline()
+    pipeline.start()
+    pipeline.submit(make_messages(50))
+    pipeline.stop()
+    assert len(message_repository.get_all()) == 50
+
+
+def make_task(deadline):
+    now = datetime.now()
+    return task_repository.add(Task(id=0, title='Отчет', description='', deadline=deadline, start_time=None,
+                                    end_time=None, duration=60, priority=TaskPriority.HIGH,
+                                    status=TaskStatus.NEW, created_at=now, updated_at=now,
+                                    creator_id=1, assigned_users=[1, 2]))
+
+
+def test_reminder_is_released_when_queue_is_full(monkeypatch):
+    monkeypatch.setattr(notification_module, '_sent_reminders', TTLSet(timedelta(days=1)))
+    task = make_task(datetime.now() + timedelta(hours=5))
+    service = notification_module.NotificationService()
+    pipeline = notification_module.delivery_pipeline
+
+    def full(messages):
+        raise DeliveryQueueFull("Очередь уведомлений переполнена")
+
+    monkeypatch.setattr(pipeline, 'submit', full)
+    with pytest.raises(DeliveryQueueFull):
+        service.send_deadline_notification(task.id)
+
+    delivered = []
+    monkeypatch.setattr(pipeline, 'submit', delivered.extend)
+    assert service.send_deadline_notification(task.id)
+    # Повторный вызов - уже отправленное напоминание не дублируется
+    assert service.send_deadline_notification(task.id)
+    assert sorted(message.user_id for message in delivered) == [1, 2]
+
+
+def test_scheduler_retries_reminder_after_full_queue():
+    attempts = []
+
+    def dispatch(task_id, kind, hours):
+        attempts.append((task_id, kind, hours))
+        if len(attempts) == 1:
+            raise DeliveryQueueFull("Очередь уведомлений переполнена")
+
+    scheduler = DeadlineScheduler(thresholds=(('deadline', 24),), dispatch=dispatch)
+    now = datetime.now()
+    task = make_task(now + timedelta(hours=30))
+    scheduler.schedule(task, now)
+    fire_at = task.deadline - timedelta(hours=24)
+
+    assert scheduler.run_due(fire_at) == 1
+    assert scheduler.pending_count() == 1
+    assert scheduler.run_due(datetime.now()) == 0
+    assert scheduler.run_due(datetime.now() + RETRY_DELAY + timedelta(seconds=1)) == 1
+    assert attempts == [(task.id, 'deadline', 24)] * 2
+    assert scheduler.pending_count() == 0
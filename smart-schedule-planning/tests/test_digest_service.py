@@ -0,0 +1,32 @@
+# tests/test_digest_service.py
+from datetime import datetime, timedelta
+
+from src.domain.entities import Task, TaskPriority, TaskStatus
+from src.services.digest_service import DigestService
+
+# Рассылка в 8:00; "сейчас" - вечер того же дня
+NOW = datetime(2026, 3, 10, 20, 0)
+TODAY_RUN = datetime(2026, 3, 10, 8, 0)
+
+
+def make_task(deadline, updated_at):
+    return Task(id=1, title='Отчет', description='', deadline=deadline, start_time=None, end_time=None,
+                duration=60, priority=TaskPriority.MEDIUM, status=TaskStatus.NEW,
+                created_at=updated_at, updated_at=updated_at, creator_id=1)
+
+
+def test_deadline_after_next_run_is_left_to_the_digest():
+    service = DigestService(hour=8)
+    assert service.covers(make_task(NOW + timedelta(hours=13), NOW), NOW)
+
+
+def test_deadline_seen_by_todays_digest_is_covered():
+    service = DigestService(hour=8)
+    task = make_task(NOW + timedelta(hours=2), TODAY_RUN - timedelta(hours=1))
+    assert service.covers(task, NOW)
+
+
+def test_task_changed_after_todays_digest_is_not_covered():
+    service = DigestService(hour=8)
+    task = make_task(NOW + timedelta(hours=2), TODAY_RUN + timedelta(hours=3))
+    assert not service.covers(task, NOW)
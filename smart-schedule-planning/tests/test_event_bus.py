@@ -0,0 +1,33 @@
+# tests/test_event_bus.py
+import threading
+from datetime import datetime
+
+from src.domain.entities import Message, MessageType
+from src.repositories import message_repository
+from src.utils.event_bus import notification_bus
+
+
+def make_message(user_id):
+    return Message(id=0, template_id='schedule_change', template_params=(1,), sent_at=datetime.now(),
+                   message_type=MessageType.SYSTEM, user_id=user_id)
+
+
+def test_concurrent_messages_reach_subscriber_in_id_order():
+    subscription = notification_bus.subscribe(1, buffer_size=10000)
+    try:
+        def produce():
+            for _ in range(200):
+                message_repository.add(make_message(1))
+                message_repository.add_many([make_message(1), make_message(1)])
+
+        producers = [threading.Thread(target=produce) for _ in range(4)]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+
+        ids = [message.id for message in subscription.wait(1)]
+        assert len(ids) == 4 * 200 * 3
+        assert ids == sorted(ids)
+    finally:
+        subscription.close()
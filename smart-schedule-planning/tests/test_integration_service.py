@@ -0,0 +1,67 @@
+# tests/test_integration_service.py
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.services.integration_service import MAX_OCCURRENCES, RECURRENCE_HISTORY, _occurrences
+from src.utils.ical import iter_components, parse_datetime
+
+
+def component(*properties):
+    lines = ['BEGIN:VEVENT', 'UID:series@example.com', *properties, 'END:VEVENT']
+    return next(iter_components(lines))
+
+
+def occurrences(item, now):
+    start = parse_datetime(item.get('DTSTART'))
+    return [moment for moment, _ in _occurrences(item, start, now)]
+
+
+def test_single_event_has_one_occurrence():
+    item = component('DTSTART:20260105T090000')
+    start = datetime(2026, 1, 5, 9)
+    assert list(_occurrences(item, start, datetime(2026, 1, 1))) == [(start, None)]
+
+
+@pytest.fixture
+def moscow_time(monkeypatch):
+    """Локальный пояс сервера не UTC: иначе сдвиг UNTIL не виден"""
+    monkeypatch.setenv('TZ', 'Europe/Moscow')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_utc_until_is_converted_to_local_time(moscow_time):
+    # Последнее вхождение - ровно в момент UNTIL, заданного в UTC
+    until = datetime(2026, 1, 7, 9, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    item = component(f'DTSTART:{until.strftime("%Y%m%dT%H%M%S")}',
+                     'RRULE:FREQ=DAILY;UNTIL=20260107T090000Z')
+    result = occurrences(item, datetime(2026, 1, 1))
+    assert result == [until]
+
+
+def test_utc_until_keeps_every_day_up_to_the_end(moscow_time):
+    start = datetime(2026, 1, 5, 9, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    item = component(f'DTSTART:{start.strftime("%Y%m%dT%H%M%S")}',
+                     'RRULE:FREQ=DAILY;UNTIL=20260107T090000Z')
+    assert occurrences(item, datetime(2026, 1, 1)) == [start + timedelta(days=day) for day in range(3)]
+
+
+def test_exdate_is_skipped():
+    item = component('DTSTART:20260105T090000', 'RRULE:FREQ=DAILY;COUNT=3', 'EXDATE:20260106T090000')
+    assert occurrences(item, datetime(2026, 1, 1)) == [datetime(2026, 1, 5, 9), datetime(2026, 1, 7, 9)]
+
+
+def test_long_running_series_starts_at_history_window():
+    # Ежедневная серия с 2020 года: вхождения около текущей даты не должны теряться
+    now = datetime(2026, 6, 1, 12)
+    item = component('DTSTART:20200101T090000', 'RRULE:FREQ=DAILY')
+    result = occurrences(item, now)
+
+    assert result[0] >= now - RECURRENCE_HISTORY
+    assert result[0] - (now - RECURRENCE_HISTORY) < timedelta(days=1)
+    assert len(result) <= MAX_OCCURRENCES
+    assert any(moment.date() == now.date() for moment in result)
@@ -0,0 +1,93 @@
+# tests/test_task_pagination.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.domain.entities import Task, TaskPriority, TaskStatus
+from src.repositories import task_repository
+from src.services.task_service import TaskService
+
+BASE = datetime(2026, 3, 10, 12, 0)
+
+
+def add_task(title, deadline, status=TaskStatus.NEW, creator_id=1, assigned_users=()):
+    return task_repository.add(Task(
+        id=0, title=title, description='', deadline=deadline, start_time=None, end_time=None,
+        duration=60, priority=TaskPriority.MEDIUM, status=status, created_at=BASE, updated_at=BASE,
+        creator_id=creator_id, assigned_users=list(assigned_users)))
+
+
+def all_pages(limit, **kwargs):
+    """Пройти все страницы по курсорам; список ID задач по страницам"""
+    pages = []
+    after = None
+    while True:
+        page, after = task_repository.get_user_tasks_page(1, limit=limit, after=after, **kwargs)
+        pages.append([task.id for task in page])
+        if after is None:
+            return pages
+
+
+def test_pages_follow_the_index_without_gaps_or_repeats():
+    tasks = [add_task(f't{i}', BASE + timedelta(days=i % 3)) for i in range(7)]
+    undated = add_task('без дедлайна', None)
+
+    pages = all_pages(3)
+
+    assert [len(page) for page in pages] == [3, 3, 2]
+    expected = sorted(tasks, key=lambda task: (task.deadline, task.id))
+    assert sum(pages, []) == [task.id for task in expected] + [undated.id]
+
+
+def test_descending_pages_reverse_the_order():
+    tasks = [add_task(f't{i}', BASE + timedelta(days=i)) for i in range(5)]
+
+    pages = all_pages(2, descending=True)
+
+    assert sum(pages, []) == [task.id for task in reversed(tasks)]
+
+
+def test_status_filter_reads_its_own_partition():
+    new = [add_task(f'n{i}', BASE + timedelta(days=i)) for i in range(4)]
+    done = [add_task(f'd{i}', BASE + timedelta(days=i), TaskStatus.COMPLETED) for i in range(4)]
+
+    assert all_pages(3, status=TaskStatus.COMPLETED) == [[task.id for task in done[:3]], [done[3].id]]
+    assert sum(all_pages(3, status=TaskStatus.NEW), []) == [task.id for task in new]
+
+
+def test_status_change_moves_task_between_partitions():
+    task = add_task('t', BASE)
+    task.status = TaskStatus.IN_PROGRESS
+    task_repository.update(task)
+
+    assert all_pages(10, status=TaskStatus.NEW) == [[]]
+    assert all_pages(10, status=TaskStatus.IN_PROGRESS) == [[task.id]]
+
+
+def test_status_partitions_are_rebuilt_after_restore():
+    task = add_task('t', BASE, TaskStatus.COMPLETED, creator_id=2, assigned_users=[1])
+    tasks, next_id = task_repository.dump()
+    task_repository.restore(tasks, next_id)
+
+    assert all_pages(10, status=TaskStatus.COMPLETED) == [[task.id]]
+    assert all_pages(10, status=TaskStatus.NEW) == [[]]
+
+
+def test_unknown_sort_is_rejected():
+    with pytest.raises(ValueError):
+        task_repository.get_user_tasks_page(1, sort='title')
+
+
+def test_service_cursor_continues_the_filtered_page():
+    service = TaskService()
+    done = [add_task(f'd{i}', BASE + timedelta(days=i), TaskStatus.COMPLETED) for i in range(3)]
+    add_task('n', BASE)
+
+    first = service.get_tasks_page(1, sort='created_at', limit=2, status=TaskStatus.COMPLETED.value)
+    second = service.get_tasks_page(1, sort='created_at', cursor=first['next_cursor'], limit=2,
+                                    status=TaskStatus.COMPLETED.value)
+
+    assert [task.id for task in first['tasks'] + second['tasks']] == [task.id for task in done]
+    assert second['next_cursor'] is None
+    with pytest.raises(ValueError):
+        service.get_tasks_page(1, sort='deadline', cursor=first['next_cursor'])
@@ -0,0 +1,157 @@
+# tests/test_write_ahead_log.py
+import os
+from datetime import datetime
+
+import pytest
+
+from src.domain.entities import User, UserRole
+from src.repositories import user_repository
+from src.services.snapshot_service import SECTIONS, SnapshotError, SnapshotService
+from src.services.write_ahead_log import WalError, WriteAheadLog
+
+
+def make_user(name):
+    return user_repository.add(User(id=0, name=name, email=f'{name}@example.com', password_hash='x',
+                                    role=UserRole.PARTICIPANT, created_at=datetime.now(),
+                                    updated_at=datetime.now()))
+
+
+def clear_repositories():
+    for _, repository in SECTIONS.values():
+        repository.restore([], 1)
+
+
+def user_names():
+    return sorted(user.name for user in user_repository.get_all())
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Новый процесс приложения: сервис снимков и журнал над одним каталогом"""
+    def open_storage():
+        snapshots = SnapshotService(str(tmp_path / 'snapshot.bin'))
+        wal = WriteAheadLog(str(tmp_path / 'wal'), policy='always', snapshots=snapshots)
+        return snapshots, wal
+    return open_storage
+
+
+def restart(storage):
+    """Сбросить память и загрузить снимок с журналом, как при запуске"""
+    clear_repositories()
+    snapshots, wal = storage()
+    snapshots.restore(replay=wal.replay)
+    return snapshots, wal
+
+
+def segment_files(tmp_path):
+    return sorted(os.listdir(tmp_path / 'wal'))
+
+
+def test_replay_restores_changes_after_crash(storage):
+    snapshots, wal = storage()
+    wal.start()
+    make_user('ann')
+    make_user('bob')
+    wal.stop()
+
+    snapshots, wal = restart(storage)
+    assert user_names() == ['ann', 'bob']
+    assert wal.last_recovery['records'] == 2
+
+
+def test_checkpoint_writes_snapshot_and_drops_old_segments(storage, tmp_path):
+    snapshots, wal = storage()
+    wal.start()
+    make_user('ann')
+    wal.stop(checkpoint=True)
+    assert segment_files(tmp_path) == ['00000002.wal']
+
+    restart(storage)
+    assert user_names() == ['ann']
+
+
+def test_torn_record_at_tail_is_truncated(storage, tmp_path):
+    snapshots, wal = storage()
+    wal.start()
+    make_user('ann')
+    make_user('bob')
+    wal.stop()
+    path = tmp_path / 'wal' / '00000001.wal'
+    size = path.stat().st_size
+    with open(path, 'r+b') as segment:
+        segment.truncate(size - 3)
+
+    snapshots, wal = restart(storage)
+    assert user_names() == ['ann']
+    assert wal.last_recovery['truncated_bytes'] > 0
+
+
+@pytest.mark.parametrize('content', [b'', b'SSPW'])
+def test_headerless_newest_segment_is_skipped(storage, tmp_path, content):
+    snapshots, wal = storage()
+    wal.start()
+    make_user('ann')
+    wal.stop(checkpoint=True)
+    (tmp_path / 'wal' / '00000009.wal').write_bytes(content)
+
+    snapshots, wal = restart(storage)
+    assert user_names() == ['ann']
+    assert '00000009.wal' not in segment_files(tmp_path)
+    wal.start()
+    assert wal.status()['segment'] == 10
+    wal.stop()
+
+
+def test_corruption_in_the_middle_fails_restore(storage, tmp_path):
+    for name in ('ann', 'bob'):
+        snapshots, wal = restart(storage)
+        wal.start()
+        make_user(name)
+        wal.stop()
+    first = tmp_path / 'wal' / '00000001.wal'
+    data = bytearray(first.read_bytes())
+    data[-5] ^= 0xff
+    first.write_bytes(bytes(data))
+
+    with pytest.raises(WalError):
+        restart(storage)
+    assert first.read_bytes() == bytes(data)
+    assert segment_files(tmp_path) == ['00000001.wal', '00000002.wal']
+
+
+def test_failed_restore_keeps_files_and_blocks_writes(storage, tmp_path):
+    snapshots, wal = storage()
+    wal.start()
+    make_user('ann')
+    wal.stop(checkpoint=True)
+    snapshot_bytes = (tmp_path / 'snapshot.bin').read_bytes()
+    (tmp_path / 'wal' / '00000009.wal').write_bytes(b'not a journal segment')
+
+    clear_repositories()
+    snapshots, wal = storage()
+    started = []
+    snapshots.restore_in_background(on_ready=lambda: started.append(True), replay=wal.replay)
+    assert snapshots.wait_ready(5)
+
+    assert snapshots.failed and 'журнала' in snapshots.last_error
+    assert started == []
+    with pytest.raises(SnapshotError):
+        snapshots.save()
+    snapshots.save_on_exit()
+    with pytest.raises(WalError):
+        wal.start()
+    assert (tmp_path / 'snapshot.bin').read_bytes() == snapshot_bytes
+    assert segment_files(tmp_path) == ['00000002.wal', '00000009.wal']
+
+
+def test_checkpoint_keeps_segments_it_did_not_read(storage, tmp_path):
+    snapshots, wal = restart(storage)
+    wal.start()
+    make_user('ann')
+    # Сегмент другого процесса, появившийся после восстановления
+    foreign = tmp_path / 'wal' / '00000000.wal'
+    foreign.write_bytes(b'')
+    wal.checkpoint()
+    wal.stop()
+    assert foreign.exists()
+    assert '00000001.wal' not in segment_files(tmp_path)